@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom"
+
+import json
+
+from .internal import pipeline, workflow
+from .interface.cache import code_version
+from .internal.instrument import activate_from_arguments, add_profile_arguments, finish_profiling
+from .internal.pipeline import Pipeline
+from .internal.precision import add_precision_argument, set_precision
+from .internal.procedure import COMPUTE_MODULES
+from .internal.workflow import add_system
+'''
+ Run the ciACG and pathway workflow of a batch of systems as one pipeline
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Version and license information
+def get_version_str():
+    return "\n".join([
+        "allostery  Copyright (C) 2018  Robert Pilstål;",
+        "This program comes with ABSOLUTELY NO WARRANTY.",
+        "This is free software, and you are welcome to redistribute it",
+        "under certain conditions; See the supplied Apache License,",
+        "Version 2.0 for the specific language governing permissions",
+        "and limitations under the License.",
+        "    http://www.apache.org/licenses/LICENSE-2.0"
+    ])
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="Run parsing, ciACG computation, frames ingestion, " +
+                    "normalization and rendering of a batch of systems as " +
+                    "a DAG of stages; independent stages run concurrently " +
+                    "and stages with unchanged inputs are skipped.")
+    parser.add_argument(
+        "-config", nargs=1, metavar="JSONfile",
+        help="Batch to run; {\"cutoffs\": [...], \"systems\": [{\"name\", \"avg\", \"cor\", \"pdb\", " +
+             "\"frames\", \"conv\", \"tol\", \"pat\", \"norm\", \"pml\", \"png\", \"pse\", \"acg\", \"rmp\", \"cnt\", \"frq\", \"prc\"}, ...]}; " +
+             "name, avg, cor and pdb required")
+    parser.add_argument(
+        "-workers", nargs=1, default=[4], metavar="int", help="Worker processes for independent stages, default=4")
+    parser.add_argument(
+        "-cache", nargs=1, default=[None], metavar="CACHEdir", help="Directory keeping stage outputs, to skip stages with unchanged inputs")
+    parser.add_argument(
+        "-norender", action="store_true", default=False, help="Skip aligning and rendering, e.g. to only write outputs")
+    parser.add_argument(
+        "-headless", action="store_true", default=False, help="Launch PyMOL without a window (pymol -cq)")
+    add_profile_arguments(parser)
+    add_precision_argument(parser)
+    arguments = parser.parse_args(argv[1:])
+    set_precision(arguments.dtype[0])
+    profiler = activate_from_arguments(arguments)
+
+    with open(arguments.config[0], 'r') as infile:
+        config = json.load(infile)
+    cutoffs = [float(c) for c in config.get("cutoffs", [0.0])]
+    draw = not arguments.norender
+
+    # Finish pymol launch; PyMOL is only needed for rendering
+    if draw:
+        import pymol
+        pymol.finish_launching(['pymol', '-cq'] if arguments.headless else ['pymol'])
+
+    batch = Pipeline(version=code_version(COMPUTE_MODULES + [pipeline, workflow]) + arguments.dtype[0],
+                     cachedir=arguments.cache[0])
+    for system in config["systems"]:
+        add_system(batch, system, cutoffs, draw=draw)
+    batch.run(workers=int(arguments.workers[0]))
+
+    finish_profiling(profiler, arguments)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom"
+
+from os import makedirs
+
+from .internal.batch import read_batch_config, render_systems
+'''
+ Render a batch of systems offline, as PyMOL scripts run by headless
+ PyMOL processes
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Version and license information
+def get_version_str():
+    return "\n".join([
+        "allostery_batch_pymol  Copyright (C) 2018  Robert Pilstål;",
+        "This program comes with ABSOLUTELY NO WARRANTY.",
+        "This is free software, and you are welcome to redistribute it",
+        "under certain conditions; See the supplied Apache License,",
+        "Version 2.0 for the specific language governing permissions",
+        "and limitations under the License.",
+        "    http://www.apache.org/licenses/LICENSE-2.0"
+    ])
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="Record the drawing of ciACGs and pathway frequencies " +
+                    "as one PyMOL script per system, without PyMOL or a " +
+                    "display, and optionally run the scripts in headless " +
+                    "PyMOL processes to save images and sessions.")
+    parser.add_argument(
+        "-config", nargs=1, metavar="JSONfile",
+        help="Systems to render; {\"systems\": [{\"name\", \"pdb\", \"acg\", \"rmp\", \"frq\", \"pml\"}, ...]}, frq and pml optional")
+    parser.add_argument(
+        "-c", nargs='*', default=[0.0], metavar="float", help="ciACG cutoffs, default=0.0")
+    parser.add_argument(
+        "-outdir", nargs=1, default=["."], metavar="DIR", help="Directory to write NAME.pml, NAME.png and NAME.pse to, default=.")
+    parser.add_argument(
+        "-png", action="store_true", default=False, help="Save a ray traced image of every system")
+    parser.add_argument(
+        "-pse", action="store_true", default=False, help="Save a PyMOL session of every system")
+    parser.add_argument(
+        "-pymol", nargs=1, default=["pymol"], metavar="EXE", help="PyMOL executable to run scripts with, default=pymol")
+    parser.add_argument(
+        "-norun", action="store_true", default=False, help="Only write the scripts, leaving -png and -pse to a later run")
+    parser.add_argument(
+        "-workers", nargs=1, default=[1], metavar="int", help="Worker processes, one system at a time each, default=1")
+    arguments = parser.parse_args(argv[1:])
+
+    outdir = arguments.outdir[0]
+    makedirs(outdir, exist_ok=True)
+    scripts = render_systems(read_batch_config(arguments.config[0]), [float(c) for c in arguments.c], outdir,
+                             png=arguments.png, pse=arguments.pse,
+                             pymol=None if arguments.norun else arguments.pymol[0],
+                             workers=int(arguments.workers[0]))
+    print("Wrote {} scripts to {}".format(len(scripts), outdir))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,16 +5,19 @@ if __name__ == "__main__" and __package__ is None:
 import pymol
 from pymol import cmd
 
+from .interface.cache import ResultCache, code_version
 from .interface.files import dump_pyobject
-from .interface.pymol import (bond_connections_from_array, color_selections,
-                              select_clusters, show_cluster)
-from .interface.wordom import read_avg_strength, read_avg_residuemap, read_correlations
-from .internal.map import Map
-from .internal.matrix import dataframe_from_dictionary, matrix_from_interactions, matrix_from_pandas_dataframe
+from .internal.matrix import matrix_from_pandas_dataframe
+from .internal.centrality import add_centrality_arguments
+from .internal.perturbation import edge_impacts
+from .internal.query import select_top
+from .internal.histogram import suggest_cutoffs, upper_triangle_histogram, write_histogram
+from .internal.instrument import activate_from_arguments, add_profile_arguments, finish_profiling, span
+from .internal.precision import add_precision_argument, set_precision
+from .internal.procedure import COMPUTE_MODULES, ciacg_from_tables, ciacg_windows, draw_ciacg, parse_avg, parse_cor, parse_structures, parse_trajectory, residue_centrality, scan_ciacg, show_centrality
 
 import numpy
 import matplotlib.pyplot as plt
-from pandas import DataFrame
 '''
  Display the ciACG in an interactive PyMOL session
  Copyright (C) 2018  Robert Pilstål
@@ -73,8 +76,34 @@ def main():
     parser.add_argument(
         "-cor",
         nargs=1,
+        default=[None],
         metavar="CORRfile",
         help="Wordom cross-correlation file")
+    parser.add_argument(
+        "-traj", nargs=1, default=[None], metavar="TRAJfile",
+        help="Compute the cross-correlation of CA atoms from a multi-model PDB file, or of a .npy array (frames, residues, 3), instead of reading -cor")
+    parser.add_argument(
+        "-chunk", nargs=1, default=[256], metavar="int", help="Frames per covariance update with -traj, default=256")
+    parser.add_argument(
+        "-buffer", nargs=1, default=[None], metavar="BUFFERfile", help="Memory map the frame chunks of a PDB -traj to BUFFERfile, instead of keeping them in memory")
+    parser.add_argument(
+        "-psn", nargs=1, default=[None], metavar="PDBfile",
+        help="Compute interaction strengths from side chain contacts in a multi-model PDB file, instead of reading them from -avg; the residues and normalization factors are still read from -avg")
+    parser.add_argument(
+        "-dist", nargs=1, default=[4.5], metavar="float", help="Atom distance cutoff of contacts with -psn, default=4.5")
+    parser.add_argument(
+        "-imin", nargs=1, default=[0.0], metavar="float", help="Interaction strength for an interaction to be present with -psn, default=0.0")
+    parser.add_argument(
+        "-seqnb", nargs=1, default=[1], metavar="int", help="Leave out residue pairs at most this far apart in sequence with -psn, default=1")
+    parser.add_argument(
+        "-workers", nargs=1, default=[1], metavar="int", help="Worker processes with -psn and -scan, default=1")
+    parser.add_argument(
+        "-win", nargs='*', default=None, metavar="CORRfile",
+        help="Cross-correlation files of trajectory windows; compute the ciACG of every window as one stack, and print statistics and top edges of each")
+    parser.add_argument(
+        "-winout", nargs=1, default=[None], metavar="NPYfile", help="With -win, memory map the ciACG stack (windows, N, N) to NPYfile, in residue map order")
+    parser.add_argument(
+        "-wintop", nargs=1, default=[5], metavar="int", help="Top edges to print per window with -win, default=5")
     parser.add_argument(
         "-pdb", nargs=1, metavar="PDBfile", help="PDB file to draw")
     parser.add_argument("-plot", action="store_true", default=False, help="Plot ciACG value distribution")
@@ -82,7 +111,31 @@ def main():
         "-acg", nargs=1, default=[None], metavar="ACGOUTfile", help="ACG file to write (.frm)")
     parser.add_argument(
         "-rmp", nargs=1, default=[None], metavar="RESOUTfile", help="ResidueMap output file to write (.rmp)")
+    parser.add_argument(
+        "-cache", nargs=1, default=[None], metavar="CACHEdir", help="Cache directory for computed ciACGs, keyed by the content of the -avg and -cor files")
+    parser.add_argument(
+        "-cachesize", nargs=1, default=[1024], metavar="int", help="Cache size limit in MB, least recently used entries are evicted, default=1024")
+    parser.add_argument(
+        "-hist", nargs=1, default=[None], metavar="HISTfile", help="Write ciACG value histogram of the upper triangle to HISTfile (.csv, .json or .png)")
+    parser.add_argument(
+        "-bins", nargs=1, default=[50], metavar="int", help="Number of histogram bins, default=50")
+    parser.add_argument(
+        "-nonzero", action="store_true", default=False, help="Only include nonzero ciACG values in histogram")
+    parser.add_argument(
+        "-quantiles", nargs='*', default=[0.5, 0.9, 0.95, 0.99], metavar="float", help="Quantiles to suggest cutoffs for, default=0.5 0.9 0.95 0.99")
+    parser.add_argument(
+        "-npy", nargs=1, default=[None], metavar="NPYfile", help="ciACG matrix file to write (.npy), in residue map order, for memory mapped queries")
+    add_centrality_arguments(parser, ["degree", "eigenvector", "impact"])
+    parser.add_argument(
+        "-scan", nargs=1, default=[None], metavar="float",
+        help="Perturbation scan of the ciACG edges above this cutoff; the loss of communication efficiency when each residue is removed, as the impact centrality")
+    parser.add_argument(
+        "-scanedges", nargs=1, default=[0], metavar="int", help="With -scan, also scan removal of every edge and print the int edges of highest impact, default=0")
+    add_profile_arguments(parser)
+    add_precision_argument(parser)
     arguments = parser.parse_args(argv[1:])
+    set_precision(arguments.dtype[0])
+    profiler = activate_from_arguments(arguments)
 
     # Finish pymol launch
     pymol.finish_launching(['pymol'])
@@ -95,21 +148,47 @@ def main():
     ciplot = arguments.plot
     acgout = arguments.acg[0]
     rmpout = arguments.rmp[0]
-
-    interactions = {}
-    with open(avg, 'r') as infile:
-        residuemap = read_avg_residuemap(infile)
-        mapping = Map([int(i.split(':')[-1][1:]) for i in residuemap.keys()], inverse_sequence=list(range(len(residuemap))))
-        infile.seek(0)
-        interactions, frequencies = read_avg_strength(infile)
-
-    strength_table = dataframe_from_dictionary(interactions, indexmap = residuemap)
-    
-
-    with open(cor, 'r') as infile:
-        correlation_table = read_correlations(infile)
-
-    cigraph_table = strength_table.multiply(correlation_table, fill_value = 0.0)
+    histout = arguments.hist[0]
+    bins = int(arguments.bins[0])
+    nonzero = arguments.nonzero
+    quantiles = [float(q) for q in arguments.quantiles]
+    npyout = arguments.npy[0]
+    cachedir = arguments.cache[0]
+    cachesize = int(float(arguments.cachesize[0]) * (1 << 20))
+    traj = arguments.traj[0]
+    chunk = int(arguments.chunk[0])
+    buffer = arguments.buffer[0]
+    psn = arguments.psn[0]
+    psnoptions = [float(arguments.dist[0]), float(arguments.imin[0]), int(arguments.seqnb[0])]
+    workers = int(arguments.workers[0])
+
+    def parse():
+        if psn is None:
+            return parse_avg(avg)
+        return parse_structures(avg, psn, *psnoptions, workers = workers)
+
+    def compute():
+        residuemap, interactions = parse()
+        if traj is None:
+            correlations = parse_cor(cor)
+        else:
+            correlations = parse_trajectory(traj, residuemap, chunk, buffer)
+        return ciacg_from_tables(residuemap, interactions, correlations), residuemap, interactions
+
+    interactions = None
+    if cachedir is None:
+        cigraph_table, residuemap, interactions = compute()
+    else:
+        cache = ResultCache(cachedir, limit=cachesize, version=code_version(COMPUTE_MODULES) + arguments.dtype[0] +
+                            ("" if psn is None else "psn{}".format(psnoptions)))
+        key = cache.key([avg, cor if traj is None else traj] + ([] if psn is None else [psn]))
+        cached = cache.load(key)
+        if cached is None:
+            cigraph_table, residuemap, interactions = compute()
+            cache.store(key, cigraph_table, residuemap)
+        else:
+            cigraph_table, residuemap = cached
+        print(cache.report())
 
     dump_pyobject(cigraph_table, acgout, suffix = "frm")
     #  if acgout is not None:
@@ -131,27 +210,46 @@ def main():
 
     cigraph = matrix_from_pandas_dataframe(cigraph_table)
 
-    if ciplot:
-         plt.figure()
-         df = DataFrame({'a': cigraph.reshape(cigraph.shape[0] * cigraph.shape[1])}, columns=['a'])
-         df.plot.hist(stacked=True)
-         plt.show()
-
-    cmd.load(pdb)
-    cmd.hide("everything")
-    cmd.show("ribbon")
-
-    # Create bindings and selections, and color them
-    levels = []
-    for cutoff in cutoffs:
-        residues = bond_connections_from_array(cigraph, residuemap, cutoff=cutoff)
-        levels.append(residues)
-    selections = select_clusters(levels)
-    colors = color_selections(selections)
-
-    # Show clusters
-    show_cluster(levels)
-
+    if arguments.win is not None:
+        if interactions is None:
+            residuemap, interactions = parse()
+        ciacg_windows(residuemap, interactions, arguments.win, outfile = arguments.winout[0],
+                      cutoff = min(cutoffs, default = 0.0), top = int(arguments.wintop[0]))
+
+    if npyout is not None:
+        numpy.save(npyout, cigraph)
+
+    if ciplot or histout is not None:
+        with span("histogram", edges = cigraph.size // 2):
+            counts, edges = upper_triangle_histogram(cigraph, bins = bins, nonzero = nonzero)
+            suggested = suggest_cutoffs(counts, edges, quantiles)
+        print("Suggested cutoffs: {}".format(", ".join("{:.4g} (q{})".format(c, q) for q, c in zip(quantiles, suggested))))
+        if histout is not None:
+            write_histogram(counts, edges, histout, quantiles, suggested)
+        if ciplot:
+            plt.figure()
+            plt.stairs(counts, edges, fill = True)
+            plt.show()
+
+    draw_ciacg(cigraph, residuemap, pdb, cutoffs)
+
+    scancutoff = None if arguments.scan[0] is None else float(arguments.scan[0])
+    if arguments.centrality[0] == "impact" and scancutoff is None:
+        scancutoff = 0.0
+    # One scan for the node and edge impacts
+    scan = None if scancutoff is None else scan_ciacg(cigraph, cutoff = scancutoff, workers = workers)
+    if arguments.centrality[0] is not None or arguments.ctr[0] is not None or scan is not None:
+        show_centrality(residue_centrality(cigraph, scan = scan, workers = workers), residuemap, arguments.centrality[0],
+                        palette = arguments.palette[0], ctr = arguments.ctr[0], top = int(arguments.top[0]))
+
+    if scan is not None and int(arguments.scanedges[0]) > 0:
+        with span("edge impacts", edges = cigraph.size):
+            i, j, impacts = edge_impacts(scan, workers = workers)
+        residues = list(residuemap.keys())
+        for k in select_top(impacts, int(arguments.scanedges[0])):
+            print("{}\t{}\t{:.6g}".format(residues[i[k]], residues[j[k]], impacts[k]))
+
+    finish_profiling(profiler, arguments)
 
 if __name__ == '__main__':
     main()
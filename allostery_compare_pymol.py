@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom"
+
+from .interface.files import load_pyobject
+from .internal.compare import compare_all_pairs, compare_pair, format_top_edges, stack_states
+from .internal.matrix import diverging_lookup_table, matrix_to_colorarray
+from .internal.precision import add_precision_argument, set_precision
+
+import numpy
+'''
+ Compare ciACGs or pathway frequencies of several states, and display
+ the differences in an interactive PyMOL session
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Version and license information
+def get_version_str():
+    return "\n".join([
+        "allostery_compare_pymol  Copyright (C) 2018  Robert Pilstål;",
+        "This program comes with ABSOLUTELY NO WARRANTY.",
+        "This is free software, and you are welcome to redistribute it",
+        "under certain conditions; See the supplied Apache License,",
+        "Version 2.0 for the specific language governing permissions",
+        "and limitations under the License.",
+        "    http://www.apache.org/licenses/LICENSE-2.0"
+    ])
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="Compare ciACG, edge count or edge frequency outputs " +
+                    "(.frm) of several states pairwise; list the top " +
+                    "changed edges and optionally display a difference " +
+                    "in PyMOL.")
+    parser.add_argument(
+        "-frm", nargs='*', default=[], metavar="FRMfile", help="ciACG, count or frequency files (.frm), one per state")
+    parser.add_argument(
+        "-rmp", nargs='*', default=[], metavar="RMPfile", help="ResidueMap files (.rmp), one per state, or one shared by all")
+    parser.add_argument(
+        "-names", nargs='*', default=None, metavar="str", help="State names, default=the .frm filenames")
+    parser.add_argument(
+        "-k", nargs=1, default=[20], metavar="int", help="Number of top changed edges per pair, default=20")
+    parser.add_argument(
+        "-z", nargs=1, default=[3.0], metavar="float", help="Robust z-score of significant differences, default=3.0")
+    parser.add_argument(
+        "-pseudo", nargs=1, default=[1e-6], metavar="float", help="Pseudocount of log2 ratios, default=1e-6")
+    parser.add_argument(
+        "-out", nargs=1, default=[None], metavar="PREFIX", help="Write top edges of each pair to PREFIX_<ref>_<other>.tsv, default=print")
+    parser.add_argument(
+        "-pdb", nargs=1, default=[None], metavar="PDBfile", help="PDB file to draw the difference of -ref and -alt on")
+    parser.add_argument(
+        "-ref", nargs=1, default=[0], metavar="int", help="Reference state index to draw, default=0")
+    parser.add_argument(
+        "-alt", nargs=1, default=[1], metavar="int", help="Other state index to draw, default=1")
+    parser.add_argument(
+        "-c", nargs=1, default=[0.0], metavar="float", help="Absolute difference cutoff for drawn edges, default=0.0")
+    parser.add_argument(
+        "-sig", action="store_true", default=False, help="Only draw significant differences")
+    add_precision_argument(parser)
+    arguments = parser.parse_args(argv[1:])
+    set_precision(arguments.dtype[0])
+
+    frms = arguments.frm
+    rmps = arguments.rmp
+    if len(rmps) == 1:
+        rmps = rmps * len(frms)
+    if len(frms) < 2 or len(rmps) != len(frms):
+        parser.error("provide at least two -frm files and one -rmp file per -frm, or a shared one")
+    names = frms if arguments.names is None else arguments.names
+    k = int(arguments.k[0])
+    threshold = float(arguments.z[0])
+    pseudocount = float(arguments.pseudo[0])
+    out = arguments.out[0]
+    pdb = arguments.pdb[0]
+    reference = int(arguments.ref[0])
+    other = int(arguments.alt[0])
+    cutoff = float(arguments.c[0])
+    significant_only = arguments.sig
+
+    tables = [load_pyobject(frm) for frm in frms]
+    residuemaps = [load_pyobject(rmp) for rmp in rmps]
+    registry, stack = stack_states(tables, residuemaps)
+    print("Aligned {} states on {} residues".format(len(tables), len(registry)))
+
+    for (a, b), result in compare_all_pairs(stack, k, threshold, pseudocount):
+        lines = format_top_edges(result["top"], registry.labels, result["log_ratio"], result["significant"])
+        print("{} vs {}: {} significant edges".format(names[a], names[b], numpy.count_nonzero(result["significant"]) // 2))
+        if out is None:
+            print("\n".join(lines))
+        else:
+            with open("{}_{}_{}.tsv".format(out, a, b), 'w') as outfile:
+                outfile.write("resa\tresb\tdifference\tlog2ratio\tsignificant\n")
+                outfile.write("".join(line + "\n" for line in lines))
+
+    if pdb is None:
+        return
+
+    import pymol
+    from pymol import cmd
+    from .internal.procedure import draw_ciacg
+    from .interface.pymol import bond_colors_from_array
+
+    # Finish pymol launch
+    pymol.finish_launching(['pymol'])
+
+    result = compare_pair(stack, reference, other, k, threshold, pseudocount)
+    difference = result["difference"]
+    magnitude = numpy.absolute(difference)
+    if significant_only:
+        magnitude[~result["significant"]] = 0.0
+    residuemap = registry.residuemap()
+    draw_ciacg(magnitude, residuemap, pdb, [cutoff])
+
+    # Color drawn bonds on a diverging scale, symmetric around zero
+    drawn = magnitude > cutoff
+    limit = magnitude.max()
+    colors = matrix_to_colorarray(difference, lut=diverging_lookup_table(), value_range=(-limit, limit), mask=drawn)
+    bond_colors_from_array(colors, residuemap, mask=drawn)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,14 +6,20 @@ import pymol
 from pymol import cmd
 
 from .interface.files import dump_pyobject
-from .internal.procedure import draw_ciacg, highlight_pathways, normalize_pathway_counts_wrt_no_frames_and_endpoints,  process_framefiles
-from .internal.matrix import align_dataframes, matrix_from_pandas_dataframe
+from .internal.centrality import add_centrality_arguments, endpoint_counts
+from .internal.instrument import activate_from_arguments, add_profile_arguments, finish_profiling, span
+from .internal.precision import add_precision_argument, set_precision
+from .internal.pathstats import PathStatistics
+from .internal.procedure import draw_ciacg, follow_framefiles, highlight_pathways, normalize_pathway_counts, normalize_pathway_counts_wrt_no_frames_and_endpoints,  process_framefiles, process_framefiles_incremental, refresh_pathway_colors, residue_centrality, show_centrality
+from .internal.registry import ResidueRegistry
+from .internal.tensor import endpoint_edge_tensor, save_endpoint_edge_tensor
 
 import numpy
 import matplotlib.pyplot as plt
 from pandas import DataFrame
 
 import pickle
+from os import path
 '''
  Display PSNPath on a ciACG in an interactive PyMOL session
  Copyright (C) 2018  Robert Pilstål
@@ -83,8 +89,49 @@ def main():
     parser.add_argument(
         "-prc", nargs=1, metavar="PROCESSfile", default=[None], help="Processed frames and endpoints output file to write (.pyo), a tuple of Counter()s - (frames, endpoints).")
     parser.add_argument(
-        "-frames", nargs='*', metavar="FRAMEfile", help="WORDOM .frame files to process")
+        "-frames", nargs='*', metavar="FRAMEfile", help="WORDOM .frame files to process, or with -follow also directories of them")
+    parser.add_argument(
+        "-conv", nargs=1, metavar="int", default=[None], help="Check convergence of normalized edge frequencies every int frames, and stop reading frames when converged, default=read all frames")
+    parser.add_argument(
+        "-tol", nargs=1, metavar="float", default=[1e-3], help="Relative change in edge frequencies between checkpoints regarded as converged, default=1e-3")
+    parser.add_argument(
+        "-pat", nargs=1, metavar="int", default=[3], help="Number of consecutive converged checkpoints needed to stop, default=3")
+    parser.add_argument(
+        "-norm", nargs=1, metavar="l1|linf", default=["l1"], choices=["l1", "linf"], help="Distance used to check convergence, default=l1")
+    parser.add_argument(
+        "-chk", nargs=1, metavar="CHECKPOINTfile", default=[None], help="Checkpoint file (.chk) with accumulated counts; frames files already in it are skipped, new ones merged into it")
+    parser.add_argument(
+        "-ept", nargs=1, metavar="TENSORdir", default=[None], help="Directory to write endpoint pair resolved edge counts into, as memory mappable .npy arrays")
+    parser.add_argument(
+        "-follow", action="store_true", default=False, help="Follow the frames files while WORDOM writes them, reading only appended lines and refreshing the bond colors")
+    parser.add_argument(
+        "-interval", nargs=1, metavar="float", default=[10.0], help="Minimum seconds between refreshes of bond colors with -follow, default=10")
+    parser.add_argument(
+        "-poll", nargs=1, metavar="float", default=[1.0], help="Seconds between checks for appended lines with -follow, default=1")
+    parser.add_argument(
+        "-timeout", nargs=1, metavar="float", default=[None], help="Stop following after this many seconds without appended lines, default=follow until interrupted")
+    parser.add_argument(
+        "-pst", nargs=1, metavar="NPZfile", default=[None], help="Write path length, endpoint pair and residue visit statistics, collected while reading the frames, to NPZfile")
+    parser.add_argument(
+        "-pnorm", nargs=1, metavar="frames|path|pair", default=["frames"], choices=["frames", "path", "pair"],
+        help="Normalize edge counts by all frames times all endpoint pairs, by the frame and endpoint pairs with a path, " +
+             "or per endpoint pair by its frames with a path (needs -ept), default=frames")
+    add_centrality_arguments(parser, ["degree", "eigenvector", "betweenness"])
+    add_profile_arguments(parser)
+    add_precision_argument(parser)
     arguments = parser.parse_args(argv[1:])
+    set_precision(arguments.dtype[0])
+    profiler = activate_from_arguments(arguments)
+    if arguments.chk[0] is not None and arguments.conv[0] is not None:
+        parser.error("-chk can not be combined with -conv")
+    if arguments.chk[0] is not None and arguments.ept[0] is not None:
+        parser.error("-chk can not be combined with -ept")
+    if arguments.follow and (arguments.chk[0] is not None or arguments.conv[0] is not None or arguments.ept[0] is not None):
+        parser.error("-follow can not be combined with -chk, -conv or -ept")
+    if (arguments.follow or arguments.chk[0] is not None) and (arguments.pst[0] is not None or arguments.pnorm[0] != "frames"):
+        parser.error("-pst and -pnorm can not be combined with -follow or -chk")
+    if arguments.pnorm[0] == "pair" and arguments.ept[0] is None:
+        parser.error("-pnorm pair needs -ept")
 
     # Finish pymol launch
     pymol.finish_launching(['pymol'])
@@ -99,6 +146,18 @@ def main():
     frq = arguments.frq[0]
     prc = arguments.prc[0]
     frames = arguments.frames
+    check_every = None if arguments.conv[0] is None else int(arguments.conv[0])
+    tolerance = float(arguments.tol[0])
+    patience = int(arguments.pat[0])
+    norm = arguments.norm[0]
+    chk = arguments.chk[0]
+    ept = arguments.ept[0]
+    follow = arguments.follow
+    interval = float(arguments.interval[0])
+    poll = float(arguments.poll[0])
+    timeout = None if arguments.timeout[0] is None else float(arguments.timeout[0])
+    pst = arguments.pst[0]
+    pnorm = arguments.pnorm[0]
 
     with open(acg, 'rb') as infile:
         cigraph_table = pickle.load(infile)
@@ -106,9 +165,44 @@ def main():
     with open(rmp, 'rb') as infile:
         residuemap = pickle.load(infile)
 
-    counts, files_processed, frames_processed, pathways_processed = process_framefiles(frames, residuemap)
+    registry = ResidueRegistry.from_residuemap(residuemap)
+
+    if follow:
+        # Draw first, and refresh the bond colors as pathways come in
+        levels = draw_ciacg(registry.matrix_from_table(cigraph_table), residuemap, pdb, cutoffs)
+        if pml is not None:
+            for script in pml:
+                cmd.run(script)
+        coloring = {"rgb_matrix": None, "refreshes": 0}
+
+        def refresh(counts, frames_processed, pathways_processed):
+            frequencies = normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames_processed, pathways_processed)
+            coloring["refreshes"] += 1
+            coloring["rgb_matrix"], colored, colors = refresh_pathway_colors(
+                registry.matrix_from_table(frequencies), residuemap, coloring["rgb_matrix"],
+                colorprefix = "path{}_".format(coloring["refreshes"]))
+
+    statistics = None
+    tensor = None
+    with span("frames ingest", bytes = 0 if follow else sum(path.getsize(f) for f in frames)) as record:
+        if follow:
+            counts, files_processed, frames_processed, pathways_processed = follow_framefiles(frames, residuemap, refresh, interval = interval, poll = poll, timeout = timeout)
+        elif chk is not None:
+            counts, files_processed, frames_processed, pathways_processed = process_framefiles_incremental(frames, residuemap, chk)
+        else:
+            endpoint_edges = None if ept is None else {}
+            statistics = None if pst is None and pnorm == "frames" else PathStatistics(registry)
+            counts, files_processed, frames_processed, pathways_processed = process_framefiles(frames, residuemap, check_every = check_every, tolerance = tolerance, patience = patience, norm = norm, endpoint_edges = endpoint_edges, statistics = statistics)
+            if ept is not None:
+                tensor = endpoint_edge_tensor(endpoint_edges)
+                save_endpoint_edge_tensor(tensor, ept)
+        record["lines"] = sum(frames_processed.values())
 
     print("{} pathways found in {} frames from {} files".format(len(pathways_processed), len(frames_processed), len(files_processed)))
+    if statistics is not None:
+        print(statistics.summary())
+        if pst is not None:
+            statistics.save(pst)
 
     # Save counts
     dump_pyobject(counts, cnt, suffix = "frm")
@@ -117,27 +211,38 @@ def main():
     dump_pyobject((frames_processed,pathways_processed), prc, suffix = "pyo")
 
     # Normalize
-    frequencies = normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames_processed, pathways_processed)
+    with span("normalize", edges = counts.size):
+        frequencies = normalize_pathway_counts(counts, frames_processed, pathways_processed, statistics, tensor, pnorm)
 
     # Save frequencies
     dump_pyobject(frequencies, frq, suffix = "frm")
 
-    # Align tables
-    frequencies_aligned, cigraph_table_aligned = align_dataframes(frequencies, cigraph_table, fill_value = 0.0)
+    if follow:
+        # Drawn and colored while following; centrality of the final counts
+        cigraph = registry.matrix_from_table(cigraph_table)
+    else:
+        # Align tables on the residue registry
+        with span("align", edges = frequencies.size + cigraph_table.size):
+            pathways = registry.matrix_from_table(frequencies)
+            cigraph = registry.matrix_from_table(cigraph_table)
+
+        # Draw the loaded ciACG
+        levels = draw_ciacg(cigraph, residuemap, pdb, cutoffs)
 
-    pathways = matrix_from_pandas_dataframe(frequencies_aligned)
+        # Run scripts prior to coloring of bonds
+        if pml is not None:
+            for script in pml:
+                cmd.run(script)
 
-    # Draw the loaded ciACG
-    cigraph = matrix_from_pandas_dataframe(cigraph_table_aligned)
-    levels = draw_ciacg(cigraph, residuemap, pdb, cutoffs)
+        # Highlight the pathways
+        rgb_matrix, colored, colors = highlight_pathways(pathways, residuemap)
 
-    # Run scripts prior to coloring of bonds
-    if pml is not None:
-        for script in pml:
-            cmd.run(script)
+    if arguments.centrality[0] is not None or arguments.ctr[0] is not None:
+        metrics = residue_centrality(cigraph, registry.matrix_from_table(counts), endpoint_counts(pathways_processed, registry))
+        show_centrality(metrics, residuemap, arguments.centrality[0],
+                        palette = arguments.palette[0], ctr = arguments.ctr[0], top = int(arguments.top[0]))
 
-    # Highlight the pathways
-    rgb_matrix, colored, colors = highlight_pathways(pathways, residuemap)
+    finish_profiling(profiler, arguments)
 
 if __name__ == '__main__':
     main()
@@ -12,7 +12,11 @@ from pymol import cmd
 
 from .interface.pymol import (bond_connections, color_selections,
                               select_clusters, show_cluster)
-from .interface.wordom import read_avg_clusters, read_avg_strength
+from .interface.wordom import read_avg_clusters, read_avg_residuemap, read_avg_strength
+from .internal.instrument import activate_from_arguments, add_profile_arguments, finish_profiling, span
+from .internal.registry import ResidueRegistry
+from numpy import nan
+from os import path
 
 
 '''
@@ -68,7 +72,9 @@ def main():
         help="Wordom PSN avg file")
     parser.add_argument(
         "-pdb", nargs=1, metavar="PDBfile", help="PDB file to draw")
+    add_profile_arguments(parser)
     arguments = parser.parse_args(argv[1:])
+    profiler = activate_from_arguments(arguments)
 
     # Finish pymol launch
     pymol.finish_launching(['pymol'])
@@ -85,10 +91,14 @@ def main():
 
     interactions = {}
     clusters = {}
-    with open(avg, 'r') as infile:
-        interactions = read_avg_strength(infile)
-        infile.seek(0)
-        clusters = read_avg_clusters(infile)
+    with span("parse avg", bytes = path.getsize(avg)):
+        with open(avg, 'r') as infile:
+            residuemap = read_avg_residuemap(infile)
+            infile.seek(0)
+            interactions, frequencies = read_avg_strength(infile)
+            infile.seek(0)
+            clusters = read_avg_clusters(infile)
+        strength = ResidueRegistry.from_residuemap(residuemap).matrix_from_interactions(interactions, fill_value = nan)
 
     # Select the Imin cutoff
     if imin is not None:
@@ -121,9 +131,11 @@ def main():
     #pymol.cmd.show("ribbon")
 
     # Create bindings and selections, and color them
-    bond_connections(clusters, interactions)
-    selections = select_clusters(clusters)
-    colors = color_selections(selections)
+    with span("draw"):
+        bond_connections(clusters, strength, residuemap)
+    with span("color"):
+        selections = select_clusters(clusters)
+        colors = color_selections(selections)
 
     # Show clusters
     if shw is None:
@@ -131,7 +143,9 @@ def main():
     else:
         shw = [int(c) for c in shw.split(',')]
         for c in shw:
-            show_cluster(clusters[c - 1])
+            show_cluster([clusters[c - 1]])
+
+    finish_profiling(profiler, arguments)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom"
+
+from .interface.files import load_pyobject
+from .internal.contactmap import contactmap_indices, project_matrix, write_contactmap
+from .internal.query import load_query_matrix, top_edges, top_neighbours
+from .internal.registry import ResidueRegistry
+
+import numpy
+'''
+ Query the strongest edges of a ciACG, count or frequency matrix
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Version and license information
+def get_version_str():
+    return "\n".join([
+        "allostery_query  Copyright (C) 2018  Robert Pilstål;",
+        "This program comes with ABSOLUTELY NO WARRANTY.",
+        "This is free software, and you are welcome to redistribute it",
+        "under certain conditions; See the supplied Apache License,",
+        "Version 2.0 for the specific language governing permissions",
+        "and limitations under the License.",
+        "    http://www.apache.org/licenses/LICENSE-2.0"
+    ])
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="List the strongest edges of a ciACG, edge count or " +
+                    "edge frequency matrix, globally or for one residue.")
+    parser.add_argument(
+        "-m", nargs=1, metavar="MATRIXfile", help="Matrix to query; .frm table, or .npy array in residue map order (memory mapped)")
+    parser.add_argument(
+        "-rmp", nargs=1, metavar="RMPfile", help="ResidueMap file (.rmp)")
+    parser.add_argument(
+        "-k", nargs=1, default=[50], metavar="int", help="Number of edges to list, default=50")
+    parser.add_argument(
+        "-res", nargs=1, default=[None], metavar="C:AX", help="List the neighbours of this residue instead of all edges")
+    parser.add_argument(
+        "-chain", nargs='*', default=None, metavar="C", help="Only edges touching these chains (neighbours in these chains with -res)")
+    parser.add_argument(
+        "-c", nargs=1, default=[None], metavar="float", help="Only edges with values above cutoff")
+    parser.add_argument(
+        "-abs", action="store_true", default=False, help="Rank by absolute value")
+    parser.add_argument(
+        "-save", nargs=1, default=[None], metavar="NPYfile", help="Save the matrix as .npy in residue map order, for memory mapped queries")
+    parser.add_argument(
+        "-cmap", nargs=1, default=[None], metavar="CMAPfile",
+        help="Project the matrix onto contact map numbering, chains in alphabetical order and padded for residue numbers below 1; " +
+             "write .npz (the nonzero entries in coordinate form, with chain offsets) or, for any other name, a directory of PNG tiles")
+    parser.add_argument(
+        "-tile", nargs=1, default=[1024], metavar="int", help="Side of the -cmap PNG tiles, default=1024")
+    parser.add_argument(
+        "-chainlen", nargs='*', default=None, metavar="C:int", help="Chain lengths of the -cmap numbering, default=the largest residue number of each chain")
+    arguments = parser.parse_args(argv[1:])
+
+    k = int(arguments.k[0])
+    residue = arguments.res[0]
+    chains = arguments.chain
+    cutoff = None if arguments.c[0] is None else float(arguments.c[0])
+    absolute_values = arguments.abs
+    save = arguments.save[0]
+
+    residuemap = load_pyobject(arguments.rmp[0])
+    registry = ResidueRegistry.from_residuemap(residuemap)
+    matrix = load_query_matrix(arguments.m[0], registry)
+
+    if save is not None:
+        numpy.save(save, matrix)
+
+    if arguments.cmap[0] is not None:
+        chainlength = None
+        if arguments.chainlen is not None:
+            chainlength = {entry.split(':')[0]: int(entry.split(':')[1]) for entry in arguments.chainlen}
+        try:
+            indices, size, chainoffset = contactmap_indices(residuemap, chainlength)
+        except ValueError as error:
+            parser.error(str(error))
+        entries = project_matrix(numpy.asarray(matrix), indices)
+        written = write_contactmap(entries, size, arguments.cmap[0], chainoffset, tile=int(arguments.tile[0]))
+        print("Projected {} residues onto a contact map of size {}, {} files written".format(len(indices), size, written))
+
+    if residue is None:
+        i, j, values = top_edges(matrix, registry, k, cutoff, chains, absolute_values)
+        for a, b, value in zip(i, j, values):
+            print("{}\t{}\t{:.6g}".format(registry.labels[a], registry.labels[b], value))
+    else:
+        j, values = top_neighbours(matrix, registry, residue, k, cutoff, chains, absolute_values)
+        for b, value in zip(j, values):
+            print("{}\t{}\t{:.6g}".format(residue, registry.labels[b], value))
+
+
+if __name__ == '__main__':
+    main()
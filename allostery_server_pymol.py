@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom"
+
+import asyncio
+import json
+
+from .interface.client import send_commands
+'''
+ Serve parsed systems in a long-lived PyMOL session, or send it commands
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Version and license information
+def get_version_str():
+    return "\n".join([
+        "allostery_server_pymol  Copyright (C) 2018  Robert Pilstål;",
+        "This program comes with ABSOLUTELY NO WARRANTY.",
+        "This is free software, and you are welcome to redistribute it",
+        "under certain conditions; See the supplied Apache License,",
+        "Version 2.0 for the specific language governing permissions",
+        "and limitations under the License.",
+        "    http://www.apache.org/licenses/LICENSE-2.0"
+    ])
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="Load ciACGs and pathway frequencies once and keep them " +
+                    "drawn in PyMOL, accepting commands on a local socket. " +
+                    "Commands are JSON lines, e.g. " +
+                    "{\"command\": \"cutoffs\", \"cutoffs\": [0.5, 1.0]}, " +
+                    "{\"command\": \"highlight\", \"cutoff\": 0.0, \"scale\": \"log\"}, " +
+                    "{\"command\": \"system\", \"name\": \"holo\"}, " +
+                    "{\"command\": \"export\", \"png\": \"out.png\"}, " +
+                    "{\"command\": \"status\"} and {\"command\": \"shutdown\"}.")
+    parser.add_argument(
+        "-config", nargs=1, default=[None], metavar="JSONfile",
+        help="Systems to serve; {\"systems\": [{\"name\", \"pdb\", \"acg\", \"rmp\", \"frq\"}, ...]}, frq optional")
+    parser.add_argument(
+        "-c", nargs='*', default=[0.0], metavar="float", help="Initial ciACG cutoffs, default=0.0")
+    parser.add_argument(
+        "-socket", nargs=1, default=[None], metavar="SOCKETfile", help="Unix socket to serve on or send to")
+    parser.add_argument(
+        "-port", nargs=1, default=[7555], metavar="int", help="TCP port on 127.0.0.1, if no socket, default=7555")
+    parser.add_argument(
+        "-headless", action="store_true", default=False, help="Launch PyMOL without a window (pymol -cq)")
+    parser.add_argument(
+        "-send", nargs='*', default=None, metavar="JSON",
+        help="Send these commands to a running server and print the responses, instead of serving")
+    arguments = parser.parse_args(argv[1:])
+
+    socket = arguments.socket[0]
+    port = int(arguments.port[0])
+
+    if arguments.send is not None:
+        requests = [json.loads(request) for request in arguments.send]
+        for response in asyncio.run(send_commands(requests, socket, port)):
+            print(json.dumps(response))
+        return
+
+    import pymol
+    from .internal.server import RenderServer, read_server_config
+
+    # Finish pymol launch
+    pymol.finish_launching(['pymol', '-cq'] if arguments.headless else ['pymol'])
+
+    server = RenderServer(read_server_config(arguments.config[0]), [float(c) for c in arguments.c])
+    asyncio.run(server.serve(socket, port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom.benchmark"
+
+from os import makedirs, path
+import numpy
+'''
+ Synthetic WORDOM data generator
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+CHAINS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+# Library functions
+def synthetic_residues(size, chains=1, rng=None):
+    """Residue names on WORDOM format C:AX, numbered from 1 in each chain
+
+    :param size: total number of residues
+    :param chains: number of chains, residues are split evenly
+    :param rng: numpy random Generator
+    :return: list of residue names
+    """
+    rng = numpy.random.default_rng() if rng is None else rng
+    letters = rng.choice(list(AMINO_ACIDS), size)
+    residues = []
+    for chain, members in enumerate(numpy.array_split(numpy.arange(size), chains)):
+        for number, i in enumerate(members, 1):
+            residues.append("{}:{}{}".format(CHAINS[chain % len(CHAINS)], letters[i], number))
+    return residues
+
+
+def synthetic_contacts(size, density=0.02, window=4, rng=None):
+    """Random contacts, mostly between residues close in sequence
+
+    :param size: number of residues
+    :param density: fraction of all residue pairs in contact
+    :param window: sequence distance of the local contacts
+    :param rng: numpy random Generator
+    :return: numpy array of (i, j) index pairs with i < j
+    """
+    rng = numpy.random.default_rng() if rng is None else rng
+    wanted = max(1, int(density * size * (size - 1) / 2))
+    # Local contacts along the chain
+    i = numpy.repeat(numpy.arange(size), window)
+    j = i + numpy.tile(numpy.arange(1, window + 1), size)
+    local = numpy.stack([i, j], axis=1)[j < size]
+    local = local[rng.random(len(local)) < min(1.0, 0.5 * wanted / max(1, len(local)))]
+    # Long range contacts
+    remote = numpy.sort(rng.integers(0, size, (max(0, wanted - len(local)), 2)), axis=1)
+    remote = remote[remote[:, 0] != remote[:, 1]]
+    return numpy.unique(numpy.concatenate([local, remote]), axis=0)
+
+
+def write_avg(outfile, residues, contacts, imins=(2.0, 4.0), freqs=(0.5, 0.8), clusters=8, rng=None):
+    """Write an avgpsn file with Seq, Interaction Strength and Cluster
+    sections
+
+    :param outfile: file handle to write to
+    :param residues: list of residue names
+    :param contacts: numpy array of (i, j) residue index pairs
+    :param imins: Imin levels of the cluster section
+    :param freqs: Freq levels for every Imin
+    :param clusters: number of clusters per level
+    :param rng: numpy random Generator
+    """
+    rng = numpy.random.default_rng() if rng is None else rng
+    normfacts = rng.uniform(40.0, 70.0, len(residues))
+    outfile.write("*** Seq ***\n")
+    outfile.write("".join("{:>6d}  {}  {:.4f}\n".format(n, r, f) for n, (r, f) in enumerate(zip(residues, normfacts), 1)))
+    outfile.write("============\n")
+    outfile.write("*** Averaged Interaction Strength ***\n")
+    strengths = rng.gamma(2.0, 2.0, len(contacts))
+    frequencies = rng.uniform(0.01, 1.0, len(contacts))
+    outfile.write("".join("{:>8} {:>8} {:8.3f} {:8.3f}\n".format(residues[i], residues[j], s, f)
+                          for (i, j), s, f in zip(contacts, strengths, frequencies)))
+    outfile.write("===\n")
+    outfile.write("*** Stable Cluster Compositions ***\n")
+    for imin in imins:
+        outfile.write("Imin: {:.3f}\n".format(imin))
+        for freq in freqs:
+            outfile.write("Freq: {:.3f}\n".format(freq))
+            members = rng.permutation(len(residues))[:max(clusters, len(residues) // 4)]
+            for c, cluster in enumerate(numpy.array_split(members, clusters), 1):
+                outfile.write("C{:>3d}: {}\n".format(c, " ".join(residues[i] for i in sorted(cluster))))
+    outfile.write("===\n")
+
+
+def write_correlations(outfile, residues, density=1.0, rng=None):
+    """Write a WORDOM cross-correlation file
+
+    :param outfile: file handle to write to
+    :param residues: list of residue names
+    :param density: fraction of residue pairs written, 1.0 writes all
+    :param rng: numpy random Generator
+    """
+    rng = numpy.random.default_rng() if rng is None else rng
+    outfile.write("# Residue cross-correlation\n")
+    size = len(residues)
+    for i in range(size):
+        j = numpy.arange(i, size)
+        if density < 1.0:
+            j = j[(j == i) | (rng.random(len(j)) < density)]
+        correlations = numpy.where(j == i, 1.0, rng.uniform(-1.0, 1.0, len(j)) * numpy.exp(-(j - i) / 50.0))
+        outfile.write("".join("{} {} {} {} {:.4f}\n".format(i + 1, b + 1, residues[i], residues[b], c)
+                              for b, c in zip(j, correlations)))
+
+
+def write_frames(outfile, residues, contacts, frames=100, pathways=10, length=6, null_fraction=0.1, rng=None):
+    """Write a WORDOM PSNPath .frames file, with random walks over the
+    contacts as pathways
+
+    :param outfile: file handle to write to
+    :param residues: list of residue names
+    :param contacts: numpy array of (i, j) residue index pairs
+    :param frames: number of frames
+    :param pathways: number of endpoint pairs, one line each per frame
+    :param length: mean number of residues along a pathway
+    :param null_fraction: fraction of NULL_PATH lines
+    :param rng: numpy random Generator
+    """
+    rng = numpy.random.default_rng() if rng is None else rng
+    neighbours = [[] for residue in residues]
+    for i, j in contacts:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    starts = rng.choice([i for i in range(len(residues)) if neighbours[i]], pathways)
+    for frame in range(1, frames + 1):
+        lines = []
+        for start in starts:
+            if rng.random() < null_fraction:
+                lines.append("{:>8d} NULL_PATH\n".format(frame))
+                continue
+            walk = [start]
+            for step in range(max(1, rng.poisson(length - 1))):
+                walk.append(neighbours[walk[-1]][rng.integers(len(neighbours[walk[-1]]))])
+            lines.append("{:>8d} {}\n".format(frame, "=>".join(residues[i] for i in walk)))
+        outfile.write("".join(lines))
+
+
+def generate_dataset(directory, size, chains=1, density=0.02, cor_density=1.0, frames=100, files=1, pathways=10, length=6, seed=0):
+    """Write a complete synthetic data set; .avg, .cor and .frames files
+
+    :param directory: directory to write into, created if not present
+    :param size: number of residues
+    :param chains: number of chains
+    :param density: fraction of residue pairs in contact
+    :param cor_density: fraction of residue pairs in correlation file
+    :param frames: number of frames per .frames file
+    :param files: number of .frames files
+    :param pathways: number of endpoint pairs per frame
+    :param length: mean pathway length
+    :param seed: random seed
+    :return: dict of filenames; "avg", "cor" and list of "frames"
+    """
+    rng = numpy.random.default_rng(seed)
+    makedirs(directory, exist_ok=True)
+    residues = synthetic_residues(size, chains, rng)
+    contacts = synthetic_contacts(size, density, rng=rng)
+    dataset = {"avg": path.join(directory, "synthetic.avg"),
+               "cor": path.join(directory, "synthetic.cor"),
+               "frames": [path.join(directory, "synthetic_{:03d}.frames".format(f)) for f in range(files)]}
+    with open(dataset["avg"], 'w') as outfile:
+        write_avg(outfile, residues, contacts, rng=rng)
+    with open(dataset["cor"], 'w') as outfile:
+        write_correlations(outfile, residues, cor_density, rng)
+    for framefile in dataset["frames"]:
+        with open(framefile, 'w') as outfile:
+            write_frames(outfile, residues, contacts, frames, pathways, length, rng=rng)
+    return dataset
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    from sys import argv
+    parser = ArgumentParser(
+        description="Generate synthetic WORDOM avgpsn, cross-correlation " +
+                    "and PSNPath .frames files.")
+    parser.add_argument(
+        "-n", nargs=1, default=[200], metavar="int", help="Number of residues, default=200")
+    parser.add_argument(
+        "-chains", nargs=1, default=[1], metavar="int", help="Number of chains, default=1")
+    parser.add_argument(
+        "-density", nargs=1, default=[0.02], metavar="float", help="Fraction of residue pairs in contact, default=0.02")
+    parser.add_argument(
+        "-cordensity", nargs=1, default=[1.0], metavar="float", help="Fraction of residue pairs in correlation file, default=1.0")
+    parser.add_argument(
+        "-frames", nargs=1, default=[100], metavar="int", help="Frames per .frames file, default=100")
+    parser.add_argument(
+        "-files", nargs=1, default=[1], metavar="int", help="Number of .frames files, default=1")
+    parser.add_argument(
+        "-pathways", nargs=1, default=[10], metavar="int", help="Endpoint pairs per frame, default=10")
+    parser.add_argument(
+        "-length", nargs=1, default=[6], metavar="int", help="Mean pathway length, default=6")
+    parser.add_argument(
+        "-seed", nargs=1, default=[0], metavar="int", help="Random seed, default=0")
+    parser.add_argument(
+        "-out", nargs=1, default=["synthetic"], metavar="DIR", help="Output directory, default=synthetic")
+    arguments = parser.parse_args(argv[1:])
+
+    dataset = generate_dataset(arguments.out[0], int(arguments.n[0]), chains=int(arguments.chains[0]),
+                               density=float(arguments.density[0]), cor_density=float(arguments.cordensity[0]),
+                               frames=int(arguments.frames[0]), files=int(arguments.files[0]),
+                               pathways=int(arguments.pathways[0]), length=int(arguments.length[0]),
+                               seed=int(arguments.seed[0]))
+    print("\n".join([dataset["avg"], dataset["cor"]] + dataset["frames"]))
+
+
+if __name__ == '__main__':
+    main()
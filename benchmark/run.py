@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+if __name__ == "__main__" and __package__ is None:
+    __package__ = "allostery-wordom.benchmark"
+
+import json
+import platform
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+from os import path
+from time import perf_counter, process_time
+from numpy import nan
+from ..interface import pymol as pymol_interface
+from ..interface.wordom import (read_avg_clusters, read_avg_residuemap,
+                                read_avg_strength, read_correlations,
+                                read_pathway_edge_counts_blocks,
+                                read_pathway_edge_frequencies)
+from ..internal import procedure
+from ..internal.matrix import (align_dataframes, dataframe_from_dictionary,
+                               matrix_from_pandas_dataframe,
+                               matrix_to_colorarray)
+from ..internal.registry import ResidueRegistry
+from .generate import generate_dataset
+'''
+ Scaling benchmark of the parsing, processing and drawing stages
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+# Library functions
+class MockCmd(object):
+    """Stand-in for pymol.cmd, counting the calls made to it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls += 1
+        return call
+
+
+def measure(function, memory=True):
+    """Time a function call, and optionally trace its memory use
+
+    :param function: callable without arguments
+    :param memory: if True, make a second call under tracemalloc
+    :return: tuple of the function result and a dict with wall and cpu
+             time in seconds and peak traced memory in bytes
+    """
+    with redirect_stdout(StringIO()):
+        wall = perf_counter()
+        cpu = process_time()
+        result = function()
+        measurement = {"wall": perf_counter() - wall, "cpu": process_time() - cpu}
+        if memory:
+            tracemalloc.start()
+            function()
+            measurement["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, measurement
+
+
+def read_file(reader, filename, *args):
+    def call():
+        with open(filename, 'r') as infile:
+            return reader(infile, *args)
+    return call
+
+
+def read_binary_file(reader, filename, *args):
+    def call():
+        with open(filename, 'rb') as infile:
+            return reader(infile, *args)
+    return call
+
+
+def benchmark_dataset(dataset, memory=True):
+    """Run all stages on a data set
+
+    :param dataset: dict of filenames, from generate_dataset
+    :param memory: if True, trace memory use of every stage
+    :return: list of dicts, one per stage, with stage name, the
+             measurement and number of calls made to the mock cmd
+    """
+    mock = MockCmd()
+    pymol_interface.set_backend(mock)
+    results = []
+
+    def stage(name, function):
+        mock.calls = 0
+        result, measurement = measure(function, memory)
+        measurement["stage"] = name
+        measurement["cmd_calls"] = mock.calls
+        results.append(measurement)
+        return result
+
+    residuemap = stage("read_avg_residuemap", read_file(read_avg_residuemap, dataset["avg"]))
+    interactions, frequencies = stage("read_avg_strength", read_file(read_avg_strength, dataset["avg"]))
+    clusters = stage("read_avg_clusters", read_file(read_avg_clusters, dataset["avg"]))
+    correlation_table = stage("read_correlations", read_file(read_correlations, dataset["cor"]))
+    stage("read_pathway_edge_frequencies", read_file(read_pathway_edge_frequencies, dataset["frames"][0], residuemap))
+    stage("read_pathway_edge_counts_blocks", read_binary_file(read_pathway_edge_counts_blocks, dataset["frames"][0], residuemap))
+    counts, files_processed, frames_processed, pathways_processed = stage(
+        "process_framefiles", lambda: procedure.process_framefiles(dataset["frames"], residuemap))
+
+    strength_table = dataframe_from_dictionary(interactions, indexmap=residuemap)
+    cigraph_table = stage("multiply", lambda: strength_table.multiply(correlation_table, fill_value=0.0))
+    pathway_frequencies = procedure.normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames_processed, pathways_processed)
+    pathway_aligned, cigraph_aligned = stage("align_dataframes", lambda: align_dataframes(pathway_frequencies, cigraph_table, fill_value=0.0))
+    registry = ResidueRegistry.from_residuemap(residuemap)
+    stage("registry_align", lambda: (registry.matrix_from_table(pathway_frequencies), registry.matrix_from_table(cigraph_table)))
+    pathways = matrix_from_pandas_dataframe(pathway_aligned)
+    cigraph = matrix_from_pandas_dataframe(cigraph_aligned)
+    rgb_matrix = stage("matrix_to_colorarray", lambda: matrix_to_colorarray(pathways))
+
+    strength = registry.matrix_from_interactions(interactions, fill_value=nan)
+    level = min(clusters)
+    stage("bond_connections", lambda: pymol_interface.bond_connections(clusters[level][min(clusters[level])], strength, residuemap))
+    stage("bond_connections_from_array", lambda: pymol_interface.bond_connections_from_array(cigraph, residuemap, cutoff=0.0))
+    stage("bond_colors_from_array", lambda: pymol_interface.bond_colors_from_array(rgb_matrix, residuemap))
+    stage("draw_ciacg", lambda: procedure.draw_ciacg(cigraph, residuemap, "synthetic.pdb", [0.0, 1.0]))
+    return results
+
+
+# Main; for callable scripts
+def main():
+    from argparse import ArgumentParser
+    parser = ArgumentParser(
+        description="Benchmark the allostery-wordom stages on synthetic " +
+                    "data sets of increasing size, writing a JSON report.")
+    parser.add_argument(
+        "-n", nargs='*', default=[50, 100, 200], metavar="int", help="Residue counts to benchmark, default=50 100 200")
+    parser.add_argument(
+        "-density", nargs=1, default=[0.02], metavar="float", help="Fraction of residue pairs in contact, default=0.02")
+    parser.add_argument(
+        "-frames", nargs=1, default=[100], metavar="int", help="Frames per .frames file, default=100")
+    parser.add_argument(
+        "-files", nargs=1, default=[2], metavar="int", help="Number of .frames files, default=2")
+    parser.add_argument(
+        "-pathways", nargs=1, default=[10], metavar="int", help="Endpoint pairs per frame, default=10")
+    parser.add_argument(
+        "-length", nargs=1, default=[6], metavar="int", help="Mean pathway length, default=6")
+    parser.add_argument(
+        "-nomem", action="store_true", default=False, help="Skip memory tracing")
+    parser.add_argument(
+        "-dir", nargs=1, default=["synthetic"], metavar="DIR", help="Directory for the synthetic data, default=synthetic")
+    parser.add_argument(
+        "-out", nargs=1, default=[None], metavar="JSONfile", help="Report file to write, default=print to stdout")
+    arguments = parser.parse_args(sys.argv[1:])
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "runs": []}
+    for size in [int(n) for n in arguments.n]:
+        dataset = generate_dataset(path.join(arguments.dir[0], "n{}".format(size)), size,
+                                   density=float(arguments.density[0]), frames=int(arguments.frames[0]),
+                                   files=int(arguments.files[0]), pathways=int(arguments.pathways[0]),
+                                   length=int(arguments.length[0]))
+        sizes = {name: path.getsize(dataset[name]) for name in ("avg", "cor")}
+        sizes["frames"] = sum(path.getsize(f) for f in dataset["frames"])
+        print("Benchmarking {} residues".format(size), file=sys.stderr)
+        report["runs"].append({"residues": size, "bytes": sizes,
+                               "stages": benchmark_dataset(dataset, memory=not arguments.nomem)})
+
+    if arguments.out[0] is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(arguments.out[0], 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
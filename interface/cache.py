@@ -0,0 +1,149 @@
+import json
+from collections import OrderedDict
+from hashlib import sha256
+from os import listdir, makedirs, path, remove, replace, utime
+from tempfile import NamedTemporaryFile
+from numpy import array, load, savez
+from pandas import DataFrame
+from .files import file_fingerprint
+'''
+ Content addressed cache for computed results
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def code_version(modules):
+    """Fingerprint of the source code of modules
+
+    :param modules: iterable of imported modules
+    :return: hexadecimal SHA-256 digest over the module sources
+    """
+    digest = sha256()
+    for module in modules:
+        digest.update(file_fingerprint(module.__file__).encode())
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    def __init__(self, directory, limit=1 << 30, version=""):
+        """Cache of ciACG tables and residue maps, stored as uncompressed
+        .npz files named by a hash of the input file contents and the
+        code version. Least recently used entries are evicted when the
+        cache grows beyond limit bytes.
+
+        :param directory: cache directory, created if not present
+        :param limit: maximum total size of cache entries in bytes
+        :param version: code version string, part of every key
+        """
+        self.directory = directory
+        self.limit = limit
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.recorded = (0, 0)
+        makedirs(directory, exist_ok=True)
+
+    def key(self, filenames):
+        """Cache key of a set of input files
+
+        :param filenames: list of input filenames, order matters
+        :return: hexadecimal key
+        """
+        digest = sha256(self.version.encode())
+        for filename in filenames:
+            digest.update(file_fingerprint(filename).encode())
+        return digest.hexdigest()
+
+    def entry(self, key):
+        return path.join(self.directory, "{}.npz".format(key))
+
+    def load(self, key):
+        """Load a cached table and residue map
+
+        :param key: cache key
+        :return: tuple of pandas DataFrame and residue map OrderedDict,
+                 or None on a cache miss
+        """
+        filename = self.entry(key)
+        if not path.isfile(filename):
+            self.misses += 1
+            return None
+        with load(filename) as data:
+            table = DataFrame(data["values"], index=data["index"], columns=data["columns"])
+            residuemap = OrderedDict(zip(data["labels"].tolist(), data["serials"].tolist()))
+        # Mark as recently used
+        utime(filename)
+        self.hits += 1
+        return table, residuemap
+
+    def store(self, key, table, residuemap):
+        """Store a table and residue map, then evict old entries
+
+        :param key: cache key
+        :param table: pandas DataFrame with integer index and columns
+        :param residuemap: OrderedDict of residue names to serials
+        """
+        with NamedTemporaryFile('wb', dir=self.directory, suffix=".tmp", delete=False) as output:
+            savez(output,
+                  values=table.values,
+                  index=array(table.index),
+                  columns=array(table.columns),
+                  labels=array(list(residuemap.keys())),
+                  serials=array(list(residuemap.values())))
+        replace(output.name, self.entry(key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until within the limit
+
+        :param keep: key of an entry never to remove, such as the one
+                     just stored, even if it alone exceeds the limit
+        """
+        kept = None if keep is None else self.entry(keep)
+        entries = [path.join(self.directory, f) for f in listdir(self.directory) if f.endswith(".npz")]
+        # The kept entry first, then the most recently used
+        entries.sort(key=lambda entry: (entry == kept, path.getmtime(entry)), reverse=True)
+        total = 0
+        for entry in entries:
+            total += path.getsize(entry)
+            if total > self.limit and entry != kept:
+                remove(entry)
+
+    def update_statistics(self):
+        """Add the hits and misses of this session to the statistics
+        kept in the cache directory
+
+        :return: dict of total hits and misses
+        """
+        filename = path.join(self.directory, "statistics.json")
+        statistics = {"hits": 0, "misses": 0}
+        if path.isfile(filename):
+            with open(filename, 'r') as infile:
+                statistics = json.load(infile)
+        statistics["hits"] += self.hits - self.recorded[0]
+        statistics["misses"] += self.misses - self.recorded[1]
+        self.recorded = (self.hits, self.misses)
+        with open(filename, 'w') as outfile:
+            json.dump(statistics, outfile)
+        return statistics
+
+    def report(self):
+        """Update the statistics kept in the cache directory
+
+        :return: str, hits and misses of this session and in total
+        """
+        total = self.update_statistics()
+        return "Cache {}: {} hits, {} misses ({} hits, {} misses in total)".format(
+            self.directory, self.hits, self.misses, total["hits"], total["misses"])
@@ -0,0 +1,40 @@
+import asyncio
+import json
+'''
+ Client of the local render server
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+async def send_commands(requests, socket=None, port=None):
+    """Send commands to a render server
+
+    :param requests: list of dicts, one per command
+    :param socket: Unix socket filename
+    :param port: TCP port on 127.0.0.1, if no socket
+    :return: list of response dicts
+    """
+    if socket is not None:
+        reader, writer = await asyncio.open_unix_connection(socket)
+    else:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for request in requests:
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+    writer.close()
+    await writer.wait_closed()
+    return responses
@@ -1,4 +1,7 @@
-from pickle import dump, HIGHEST_PROTOCOL
+from hashlib import sha256
+from os import fsync, path, replace, unlink
+from pickle import dump, load, HIGHEST_PROTOCOL
+from tempfile import NamedTemporaryFile
 '''
  File IO
  Copyright (C) 2018  Robert Pilstål
@@ -31,3 +34,48 @@ def dump_pyobject(data, filename, suffix="frm"):
             outfilename += ".{}".format(suffix)
         with open(outfilename, 'wb') as output:
             dump(data, output, HIGHEST_PROTOCOL)
+
+
+def dump_pyobject_atomic(data, filename):
+    """Pickles a python object atomically; the data is written to a
+    temporary file in the same directory, which then replaces filename
+
+    :param data: data to dump
+    :param filename: filename to dump into
+    """
+    directory = path.dirname(path.abspath(filename))
+    output = NamedTemporaryFile('wb', dir=directory, prefix=".{}.".format(path.basename(filename)), delete=False)
+    try:
+        with output:
+            dump(data, output, HIGHEST_PROTOCOL)
+            output.flush()
+            fsync(output.fileno())
+        replace(output.name, filename)
+    except BaseException:
+        # Leave no temporary file behind
+        unlink(output.name)
+        raise
+
+
+def load_pyobject(filename):
+    """Unpickles a python object
+
+    :param filename: filename to load from
+    :return: the unpickled object
+    """
+    with open(filename, 'rb') as infile:
+        return load(infile)
+
+
+def file_fingerprint(filename, blocksize=1 << 20):
+    """Content fingerprint of a file
+
+    :param filename: file to fingerprint
+    :param blocksize: number of bytes read at a time
+    :return: hexadecimal SHA-256 digest of the file content
+    """
+    digest = sha256()
+    with open(filename, 'rb') as infile:
+        for block in iter(lambda: infile.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
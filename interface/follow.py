@@ -0,0 +1,74 @@
+from os import listdir, path
+'''
+ Follow growing WORDOM .frames files, reading only appended lines
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class FramesFollower(object):
+    def __init__(self, sources, suffix=".frames"):
+        """Tail .frames files while they are written
+
+        A byte offset is kept per file, just past the last complete line
+        read, so no line is read twice and a partially written last line
+        is left for the next poll.
+
+        :param sources: list of .frames filenames and directories; files
+                        appearing in a directory later are also followed
+        :param suffix: suffix of the files followed in directories
+        """
+        self.sources = list(sources)
+        self.suffix = suffix
+        self.offsets = {}
+
+    def files(self):
+        """Current files to follow, in source order"""
+        files = []
+        for source in self.sources:
+            if path.isdir(source):
+                files.extend(path.join(source, f) for f in sorted(listdir(source)) if f.endswith(self.suffix))
+            elif path.isfile(source):
+                files.append(source)
+        return files
+
+    def poll(self, block=1 << 26):
+        """Read the complete lines appended since the last poll, in blocks
+        of bounded size; the incomplete last line of a block is carried
+        over to the next
+
+        :param block: number of bytes read at a time
+        :return: yields tuples (filename, lines), one per block with
+                 complete lines, as they are read
+        """
+        for filename in self.files():
+            offset = self.offsets.get(filename, 0)
+            size = path.getsize(filename)
+            if size < offset:
+                raise ValueError("{} was truncated while followed".format(filename))
+            if size == offset:
+                continue
+            with open(filename, 'rb') as infile:
+                infile.seek(offset)
+                position = offset
+                carry = b""
+                while position < size:
+                    data = carry + infile.read(min(block, size - position))
+                    position = infile.tell()
+                    end = data.rfind(b"\n") + 1
+                    carry = data[end:]
+                    if end == 0:
+                        continue
+                    self.offsets[filename] = offset = offset + end
+                    yield filename, data[:end].decode().splitlines()
@@ -0,0 +1,80 @@
+from numpy import array, float64
+'''
+ PDB file parsing interface, for multi-model coordinate files
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Residue letters of WORDOM residue names, C:AX
+THREE_TO_ONE = {"ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C",
+                "GLN": "Q", "GLU": "E", "GLY": "G", "HIS": "H", "ILE": "I",
+                "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P",
+                "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+                "HSD": "H", "HSE": "H", "HSP": "H", "HID": "H", "HIE": "H",
+                "HIP": "H", "CYX": "C", "MSE": "M"}
+
+
+def residue_label(chain, resn, resi):
+    """Residue name on format C:AX, as in WORDOM output
+
+    :param chain: chain identifier
+    :param resn: three letter residue name
+    :param resi: residue number
+    :return: str
+    """
+    return "{}:{}{}".format(chain, THREE_TO_ONE.get(resn, "X"), resi)
+
+
+def read_pdb_models(infile, select=None):
+    """Read the models of a multi-model PDB file, one at a time
+
+    A file without MODEL records is read as a single model.
+
+    :param infile: PDB file handle
+    :param select: optional callable taking (chain, resn, resi, name)
+                   and returning True for the atoms to read
+    :return: generator of tuples (atoms, coordinates), where atoms is a
+             list of (chain, resn, resi, name) tuples and coordinates a
+             numpy array of shape (atoms, 3)
+    """
+    atoms = []
+    coordinates = []
+    for line in infile:
+        record = line[0:6]
+        if record == "ATOM  " or record == "HETATM":
+            atom = (line[21], line[17:20].strip(), int(line[22:26]), line[12:16].strip())
+            if select is None or select(*atom):
+                atoms.append(atom)
+                coordinates.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+        elif record == "ENDMDL" or (record[0:3] == "END" and atoms):
+            yield atoms, array(coordinates, dtype=float64).reshape(-1, 3)
+            atoms = []
+            coordinates = []
+    if atoms:
+        yield atoms, array(coordinates, dtype=float64).reshape(-1, 3)
+
+
+def is_alpha_carbon(chain, resn, resi, name):
+    return name == "CA"
+
+
+# Backbone atoms, left out of side chain contacts
+BACKBONE = {"N", "C", "O", "OXT", "OT1", "OT2"}
+
+
+def is_side_chain_heavy_atom(chain, resn, resi, name):
+    # Glycine side chain contacts are counted on its CA
+    if name == "CA":
+        return resn == "GLY"
+    return name not in BACKBONE and not name.lstrip("0123456789").startswith("H")
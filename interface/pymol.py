@@ -2,7 +2,11 @@
 # import pymol
 import numpy
 from colorsys import hsv_to_rgb
-from pymol import cmd
+try:
+    from pymol import cmd
+except ImportError:
+    # Without PyMOL, drawing needs a backend, see set_backend
+    cmd = None
 '''
  PyMOL interface, accessing API but not redistributing PyMOL source
  Allostery-WORDOM PyMOL interface Copyright (C) 2015-2018  Robert Pilstål
@@ -23,6 +27,60 @@ from pymol import cmd
 
 
 # Library functions
+def set_backend(backend):
+    """Direct the drawing functions to another cmd, such as a
+    ScriptRecorder of interface.recorder
+
+    :param backend: object with the methods of pymol.cmd used here
+    :return: the previous backend
+    """
+    global cmd
+    previous = cmd
+    cmd = backend
+    return previous
+
+
+def new_session():
+    """Start from an empty session, so that systems drawn one after
+    another share no objects, selections or settings"""
+    cmd.reinitialize()
+
+
+def load_structure(pdb):
+    cmd.load(pdb)
+    cmd.hide("everything")
+    cmd.show("ribbon")
+
+
+def hide_residues(residues):
+    """Hide the sticks and spheres of residues, as shown by show_cluster
+
+    :param residues: iterable of residue names
+    """
+    for residue in residues:
+        cmd.hide("sticks", residue_selection(residue))
+        cmd.hide("spheres", residue_selection(residue))
+
+
+def export_png(png, width=0, height=0, dpi=-1, ray=0):
+    cmd.png(png, width=width, height=height, dpi=dpi, ray=ray)
+
+
+def run_scripts(scripts):
+    for script in scripts:
+        cmd.run(script)
+
+
+def save_session(png=None, pse=None):
+    """Write the session as an image and/or a session file
+
+    :param png: optional image filename, ray traced
+    :param pse: optional PyMOL session filename
+    """
+    if png is not None:
+        cmd.png(png, ray=1)
+    if pse is not None:
+        cmd.save(pse)
 
 
 # Colors a range of selections (need to be created first)
@@ -39,7 +97,8 @@ def color_selections(selections):
         colornames.append(selection)
         cmd.color(colornames[-1], selection)
     return colornames
-cmd.extend("color_selections", color_selections)
+if cmd is not None:
+    cmd.extend("color_selections", color_selections)
 
 
 def select_clusters(clusters):
@@ -57,45 +116,54 @@ def select_clusters(clusters):
     return clusternames
 
 
-def bond_connections(clusters, interactions):
-    # Quickfix - find min and max
-    # this filtering should be done before supplying to this function
-    # That is, the "interactions" data should be already formatted
-    # as a float in a way that makes it look nice with bond 
-    # stick_radius
-    minimum = None
-    maximum = None
-    for cluster in clusters:
-        for i in range(len(cluster)):
-            for j in range(i, len(cluster)):
-                resa = cluster[i]
-                resb = cluster[j]
-                if resa in interactions:
-                    if resb in interactions[resa]:
-                        strength = interactions[resa][resb][0]
-                        if minimum is None:
-                            minimum = strength
-                        else:
-                            minimum = strength if minimum > strength else minimum
-                        if maximum is None:
-                            maximum = strength
-                        else: 
-                            maximum = strength if maximum < strength else maximum
+def cluster_pairs(clusters, ids):
+    """Index arrays of the residue pairs within clusters
+
+    :param clusters: list of clusters, each a list of residue names
+    :param ids: dict of residue names to matrix indices
+    :return: tuple of numpy arrays (i, j), i < j, of the unique pairs
+    """
+    i = [numpy.empty(0, dtype=numpy.intp)]
+    j = [numpy.empty(0, dtype=numpy.intp)]
     for cluster in clusters:
-        for i in range(len(cluster)):
-            for j in range(i, len(cluster)):
-                resa = cluster[i]
-                resb = cluster[j]
-                # Only draw bonds if interaction strength at all present
-                if resa in interactions:
-                    if resb in interactions[resa]:
-                        a = "chain {} and resi {} and name CA".format(
-                            resa.split(':')[0], resa.split(':')[1][1:])
-                        b = "chain {} and resi {} and name CA".format(
-                            resb.split(':')[0], resb.split(':')[1][1:])
-                        cmd.bond(a, b)
-                        strength = 1.0 if maximum == minimum else 0.1 + (0.9 * ((interactions[resa][resb][0] - minimum) / (maximum - minimum)))
-                        cmd.set_bond("stick_radius", strength, a, b)
+        members = numpy.unique(numpy.array([ids[resi] for resi in cluster], dtype=numpy.intp))
+        a, b = numpy.triu_indices(members.size, 1)
+        i.append(members[a])
+        j.append(members[b])
+    pairs = numpy.unique(numpy.stack([numpy.concatenate(i), numpy.concatenate(j)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def bond_connections(clusters, strength, residuemap, selections=None):
+    """Bond the interacting residues within clusters, with stick radius
+    min-max scaled by interaction strength over the bonded pairs
+
+    :param clusters: list of clusters, each a list of residue names
+    :param strength: numpy array of interaction strengths in residue map
+                     order, NaN where residues do not interact
+    :param residuemap: OrderedDict of residue names to serials
+    :param selections: residue_selections of the residue map; pass them
+                       to reuse between calls for several cluster levels
+    :return: tuple of numpy arrays (i, j) of the bonded pairs
+    """
+    if selections is None:
+        selections = residue_selections(residuemap)
+    ids = {residue: k for k, residue in enumerate(residuemap)}
+    i, j = cluster_pairs(clusters, ids)
+    values = strength[i, j]
+    # Only draw bonds if interaction strength at all present
+    present = ~numpy.isnan(values)
+    i, j, values = i[present], j[present], values[present]
+    if values.size == 0:
+        return i, j
+    minimum = values.min()
+    maximum = values.max()
+    if maximum == minimum:
+        radii = numpy.ones(values.size)
+    else:
+        radii = 0.1 + 0.9 * ((values - minimum) / (maximum - minimum))
+    bond_edges(zip(i.tolist(), j.tolist()), radii.tolist(), selections)
+    return i, j
 
 
 def bond_connections_from_array(interactiongraph, residuemap, cutoff=0.0):
@@ -124,40 +192,110 @@ def bond_connections_from_array(interactiongraph, residuemap, cutoff=0.0):
     return shown
 
 
-def bond_colors_from_array(colorarray, residuemap, cutoff=0.0, colorprefix="path_"):
+def residue_selection(residue):
+    # Expect residues on format C:AX, with C & A char and X int
+    return "chain {} and resi {} and name CA".format(
+        residue.split(':')[0], residue.split(':')[1][1:])
+
+
+def residue_selections(residues):
+    """CA atom selections of residues, formatted once to be reused
+
+    :param residues: iterable of residue names
+    :return: list of selection strings
+    """
+    return [residue_selection(residue) for residue in residues]
+
+
+def bond_edges(edges, radii, selections):
+    """Draw bonds between residue pairs
+
+    :param edges: iterable of (i, j) residue index pairs
+    :param radii: stick radius of each bond
+    :param selections: list of residue selections, indexed by i and j
+    """
+    for (i, j), radius in zip(edges, radii):
+        cmd.bond(selections[i], selections[j])
+        cmd.set_bond("stick_radius", radius, selections[i], selections[j])
+
+
+def unbond_edges(edges, selections):
+    """Remove bonds between residue pairs
+
+    :param edges: iterable of (i, j) residue index pairs
+    :param selections: list of residue selections, indexed by i and j
+    """
+    for i, j in edges:
+        cmd.unbond(selections[i], selections[j])
+
+
+def unset_bond_colors(edges, selections):
+    """Reset the stick color of bonds between residue pairs
+
+    :param edges: iterable of (i, j) residue index pairs
+    :param selections: list of residue selections, indexed by i and j
+    """
+    for i, j in edges:
+        cmd.unset_bond("stick_color", selections[i], selections[j])
+
+
+def bond_colors_from_array(colorarray, residuemap, cutoff=0.0, colorprefix="path_", mask=None, verbose=True):
     residues = list(residuemap.keys())
     colored = []
     colors = {}
     colorindex = 0
     numcolors = 0
-    # Expect rgb channels over first dimension
-    for i in range(colorarray.shape[1]):
-        for j in range(i, colorarray.shape[2]):
-            # Only draw bonds if interaction strength over cutoff threshold
-            resa = residues[i]
-            resb = residues[j]
-            colored.append((resa, resb))
-            a = "chain {} and resi {} and name CA".format(
-                resa.split(':')[0], resa.split(':')[1][1:])
-            b = "chain {} and resi {} and name CA".format(
-                resb.split(':')[0], resb.split(':')[1][1:])
-            #cmd.bond(a, b)
-            color = tuple(colorarray[0:3,i,j])
-            if color not in colors:
-                colorindex = numcolors + 1
-                numcolors += 1
-                colors[color] = colorindex
-                cmd.set_color("{}{}".format(colorprefix, colorindex), color)
-            else:
-                colorindex = colors[color]
-            colorname = "{}{}".format(colorprefix, colorindex)
+    # Expect rgb channels over first dimension; only color the masked
+    # bonds, if a mask is given, visiting only those
+    if mask is None:
+        mask = numpy.ones(colorarray.shape[1:], dtype=bool)
+    for i, j in zip(*numpy.nonzero(numpy.triu(mask))):
+        resa = residues[i]
+        resb = residues[j]
+        colored.append((resa, resb))
+        a = "chain {} and resi {} and name CA".format(
+            resa.split(':')[0], resa.split(':')[1][1:])
+        b = "chain {} and resi {} and name CA".format(
+            resb.split(':')[0], resb.split(':')[1][1:])
+        #cmd.bond(a, b)
+        color = tuple(colorarray[0:3,i,j].tolist())
+        if color not in colors:
+            colorindex = numcolors + 1
+            numcolors += 1
+            colors[color] = colorindex
+            cmd.set_color("{}{}".format(colorprefix, colorindex), color)
+        else:
+            colorindex = colors[color]
+        colorname = "{}{}".format(colorprefix, colorindex)
+        if verbose:
             print("Applying color {}, named as {}, to residues {}".format(color, colorname, colored[-1]))
-            cmd.set_bond("stick_color", colorname, a, b)
+        cmd.set_bond("stick_color", colorname, a, b)
 
-    print(colors)
+    if verbose:
+        print(colors)
     return colored, colors
 
 
+def color_by_values(values, residues, palette="blue_white_red", selection="all"):
+    """Color residues by a value each, through their b-factors; one alter
+    and one spectrum call, whatever the number of residues
+
+    :param values: numpy array of residue values
+    :param residues: list of residue names, on format C:AX, in values
+                     order
+    :param palette: PyMOL spectrum palette
+    :param selection: atoms to color; atoms of residues without a value
+                      get the minimum value
+    """
+    minimum = float(values.min())
+    bfactors = {}
+    for residue, value in zip(residues, values.tolist()):
+        bfactors[(residue.split(':')[0], residue.split(':')[1][1:])] = value
+    cmd.alter(selection, "b = bfactors.get((chain, resi), minimum)",
+              space={"bfactors": bfactors, "minimum": minimum})
+    cmd.spectrum("b", palette, selection, minimum, float(values.max()))
+
+
 def show_cluster(clusters):
     for cluster in clusters:
         for resi in cluster:
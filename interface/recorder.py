@@ -0,0 +1,192 @@
+from subprocess import run
+'''
+ Recorder of PyMOL commands to .pml scripts, standing in for pymol.cmd
+ to draw without a display
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Longest selection of a batched show or hide command
+BATCH_LENGTH = 4000
+
+
+def parenthesized(expression):
+    # Parenthesize, so that and/or bind within and commas stay in place
+    return "({})".format(expression)
+
+
+class ScriptRecorder(object):
+    def __init__(self):
+        """Record the pymol.cmd calls of interface.pymol as PyMOL script
+        commands; install with interface.pymol.set_backend
+
+        Consecutive show and hide commands of a representation are
+        batched into one command over the joined selections, repeated
+        commands are dropped and colors are defined once. Bonds and bond
+        settings are emitted once per atom pair and value, until unbond,
+        unset_bond, load, delete or reinitialize make them stale.
+        """
+        self.lines = []
+        self.colors = {}
+        # Emitted bonds and bond settings, {pair: {name: value}}, with
+        # name None for the bond itself
+        self.bonds = {}
+        # Pending show/hide selections, by (command, representation)
+        self.pending = {}
+
+    def write_line(self, line):
+        self.flush()
+        if not self.lines or self.lines[-1] != line:
+            self.lines.append(line)
+
+    def flush(self):
+        for (command, representation), selections in self.pending.items():
+            batch = []
+            length = 0
+            for expression in selections:
+                if batch and length + len(expression) > BATCH_LENGTH:
+                    self.lines.append("{} {}, {}".format(command, representation, " or ".join(batch)))
+                    batch = []
+                    length = 0
+                batch.append(expression)
+                length += len(expression) + 4
+            self.lines.append("{} {}, {}".format(command, representation, " or ".join(batch)))
+        self.pending = {}
+
+    def batch(self, command, representation, expression):
+        opposite = ("hide" if command == "show" else "show", representation)
+        # Show and hide of a representation do not commute
+        if opposite in self.pending or (representation == "everything" and self.pending):
+            self.flush()
+        selections = self.pending.setdefault((command, representation), {})
+        selections[parenthesized(expression)] = None
+
+    def bonded(self, atom1, atom2, name=None, value=None):
+        """Record a bond command; True if already emitted"""
+        settings = self.bonds.setdefault(frozenset((parenthesized(atom1), parenthesized(atom2))), {})
+        if name in settings and settings[name] == value:
+            return True
+        settings[name] = value
+        return False
+
+    def forget_bonds(self, atom1, atom2, name=None):
+        """Forget the bond commands of an atom pair; name None forgets
+        the bond and all its settings"""
+        pair = frozenset((parenthesized(atom1), parenthesized(atom2)))
+        if name is None:
+            self.bonds.pop(pair, None)
+        else:
+            self.bonds.get(pair, {}).pop(name, None)
+
+    # Commands of pymol.cmd
+    def load(self, filename, object=None):
+        self.bonds = {}
+        self.write_line("load {}".format(filename) if object is None else "load {}, {}".format(filename, object))
+
+    def show(self, representation="everything", selection="all"):
+        self.batch("show", representation, selection)
+
+    def hide(self, representation="everything", selection="all"):
+        self.batch("hide", representation, selection)
+
+    def bond(self, atom1, atom2):
+        if self.bonded(atom1, atom2):
+            return
+        self.write_line("bond {}, {}".format(parenthesized(atom1), parenthesized(atom2)))
+
+    def unbond(self, atom1, atom2):
+        self.forget_bonds(atom1, atom2)
+        self.write_line("unbond {}, {}".format(parenthesized(atom1), parenthesized(atom2)))
+
+    def set_bond(self, name, value, selection1, selection2=None):
+        if self.bonded(selection1, selection1 if selection2 is None else selection2, name, value):
+            return
+        self.write_line("set_bond {}, {}, {}, {}".format(
+            name, value, parenthesized(selection1), parenthesized(selection1 if selection2 is None else selection2)))
+
+    def unset_bond(self, name, selection1, selection2=None):
+        self.forget_bonds(selection1, selection1 if selection2 is None else selection2, name)
+        self.write_line("unset_bond {}, {}, {}".format(
+            name, parenthesized(selection1), parenthesized(selection1 if selection2 is None else selection2)))
+
+    def set_color(self, name, rgb):
+        rgb = [float(c) for c in rgb]
+        if self.colors.get(name) != rgb:
+            self.colors[name] = rgb
+            self.write_line("set_color {}, {}".format(name, rgb))
+
+    def color(self, color, selection="all"):
+        self.write_line("color {}, {}".format(color, parenthesized(selection)))
+
+    def select(self, name, selection="", **kwargs):
+        self.write_line("select {}, {}".format(name, parenthesized(selection)))
+
+    def alter(self, selection, expression, space=None, **kwargs):
+        if space is None:
+            self.write_line("alter {}, {}".format(parenthesized(selection), expression))
+        else:
+            # Names of the space can only be passed through Python
+            self.write_line("\n".join([
+                "python",
+                "cmd.alter({!r}, {!r}, space={!r})".format(selection, expression, space),
+                "python end"]))
+
+    def spectrum(self, expression="count", palette="rainbow", selection="(all)", minimum=None, maximum=None, **kwargs):
+        line = "spectrum {}, {}, {}".format(expression, palette, parenthesized(selection))
+        if minimum is not None and maximum is not None:
+            line += ", {}, {}".format(minimum, maximum)
+        self.write_line(line)
+
+    def set(self, name, value, selection=""):
+        self.write_line("set {}, {}".format(name, value) if not selection else "set {}, {}, {}".format(name, value, selection))
+
+    def run(self, filename):
+        self.write_line("run {}".format(filename))
+
+    def png(self, filename, width=0, height=0, dpi=-1, ray=0, **kwargs):
+        self.write_line("png {}, width={}, height={}, dpi={}, ray={}".format(filename, width, height, dpi, int(ray)))
+
+    def save(self, filename, selection="(all)", **kwargs):
+        self.write_line("save {}".format(filename))
+
+    def delete(self, name):
+        self.bonds = {}
+        self.write_line("delete {}".format(name))
+
+    def reinitialize(self):
+        self.colors = {}
+        self.bonds = {}
+        self.write_line("reinitialize")
+
+    def extend(self, name, function):
+        pass
+
+    # Output
+    def script(self):
+        self.flush()
+        return "\n".join(self.lines) + "\n"
+
+    def write(self, filename):
+        with open(filename, 'w') as outfile:
+            outfile.write(self.script())
+
+
+def run_headless(script, pymol="pymol"):
+    """Run a PyMOL script in a PyMOL process without a window, e.g. to
+    write the images and sessions it saves
+
+    :param script: .pml filename
+    :param pymol: PyMOL executable
+    """
+    run([pymol, "-cq", script], check=True)
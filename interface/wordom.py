@@ -1,7 +1,10 @@
 import re
+import numpy
 import pandas as pd
 from collections import Counter, OrderedDict
+from itertools import accumulate
 from ..internal.map import Map
+from ..internal.precision import count_dtype, value_dtype
 '''
  WORDOM file parsing interface
  Copyright (C) 2015-2018  Robert Pilstål
@@ -114,6 +117,33 @@ def read_avg_residuemap(infile):
     return residuemap
 
 
+def read_avg_normfactors(infile):
+    """ Read residue normalization factors from the "Seq" section of a
+    PSN avg file
+
+    :param infile: File handle pointing to WORDOM avgpsn output file
+    :return: OrderedDict of residue names to normalization factors
+    """
+    m_start = re.compile("^\*\*\* Seq \*\*\*")
+    m_end = re.compile("^============")
+    m_entry = re.compile("^\s*\d+\s+.:.\d+\s+\d+\.\d+\s*$")
+    normfactors = OrderedDict()
+    reading = False
+    for line in infile:
+        if reading:
+            # Stop reading if end of sequence section
+            if m_end.search(line):
+                break
+            else:
+                if m_entry.search(line):
+                    [num, resname, normfact] = line.split()
+                    normfactors[resname] = float(normfact)
+        # Start reading when header found
+        elif m_start.search(line):
+            reading = True
+    return normfactors
+
+
 def read_correlations(infile):
     """read correlations from WORDOM cross-correlation analysis file
     written by B.W., edited by R.P.
@@ -143,27 +173,21 @@ def read_correlations(infile):
         # Assign
         corr_dict[i][j] = corr_dict[j][i] = float(corr)
 
-    df = pd.DataFrame.from_dict(corr_dict,orient='index')
+    df = pd.DataFrame.from_dict(corr_dict,orient='index').astype(value_dtype())
 
     return(df)
 
 
-def read_pathway_edge_frequencies(frame_file, residuemap):
-    """Process a WORDOM .frames file, returning raw edge counts
-    Based on initial work done by Björn Wallner, complemented and
-    almost completely rewritten by Robert Pilstål to consider edge
-    counts.
+def read_pathway_frames(frame_file, residuemap):
+    """Iterate over the pathways in a WORDOM .frames file, one line at
+    a time
 
     :param frame_file: file handle to WORDOM .frame-file
     :param residuemap: dict mapping residue names to serial integers
-    :return: Pandas dataframe of raw edge counts, 
-             Counter of frames discovered and processed,
-             Counter of unique start and endpoints discovered & proc.
+    :return: generator of tuples (frame, residues), where residues is
+             a list of residue serials along the pathway, or None if
+             no pathway was found (the NULL_PATH)
     """
-    frequencies = {}
-    frames_processed = Counter()
-    pathways_processed = Counter()
-
     m_framespec = re.compile('(\d+)\s+(\S+$)')
     m_pathspec = re.compile("(.+=>.+$)")
 
@@ -173,9 +197,7 @@ def read_pathway_edge_frequencies(frame_file, residuemap):
         # Look for frame
         framefound = m_framespec.search(line)
         if framefound:
-            # Count frame
             frame = int(framefound.group(1))
-            frames_processed[frame] +=1
 
             # Look for path (not the NULL_PATH)
             pathfound = m_pathspec.search(framefound.group(2))
@@ -183,33 +205,212 @@ def read_pathway_edge_frequencies(frame_file, residuemap):
                 pathway = pathfound.group(1)
 
                 # Identify residues
-                residues = [residuemap[resname] for resname in pathway.split('=>')]
-
-                # Count endpoint tuples
-                pathways_processed[(residues[0], residues[-1])] += 1
-                
-                # Count edges along pathway
-                for i in range(len(residues) - 1):
-                    resa = residues[i]
-                    resb = residues[i + 1]
-
-                    # Create new counters if edge nodes not present
-                    if resa not in frequencies:
-                        frequencies[resa] = Counter()
-                    if resb not in frequencies:
-                        frequencies[resb] = Counter()
-
-                    # Count edge symmetrically
-                    frequencies[resa][resb] += 1
-                    frequencies[resb][resa] += 1
+                yield frame, [residuemap[resname] for resname in pathway.split('=>')]
+            else:
+                yield frame, None
 
-    # Convert dictionary to DataFrame
+
+def count_pathway_edges(residues, frequencies):
+    """Count the edges along a pathway, symmetrically
+
+    :param residues: list of residue serials along the pathway
+    :param frequencies: dict of Counters to count edges in, modified
+                        in place
+    """
+    for i in range(len(residues) - 1):
+        resa = residues[i]
+        resb = residues[i + 1]
+
+        # Create new counters if edge nodes not present
+        if resa not in frequencies:
+            frequencies[resa] = Counter()
+        if resb not in frequencies:
+            frequencies[resb] = Counter()
+
+        # Count edge symmetrically
+        frequencies[resa][resb] += 1
+        frequencies[resb][resa] += 1
+
+
+def edge_counts_to_dataframe(frequencies):
+    """Convert a dict of edge Counters into a dataframe of edge counts
+
+    :param frequencies: dict of Counters, as by count_pathway_edges
+    :return: Pandas dataframe of raw edge counts
+    """
     df = pd.DataFrame.from_dict(frequencies,orient='index')
-    df = df.fillna(value = 0.0)
+    df = df.fillna(value = 0.0).astype(count_dtype())
+    return df
+
+
+def count_endpoint_edges(residues, endpoint_edges):
+    """Count the edges along a pathway, resolved on its endpoint pair
+
+    :param residues: list of residue serials along the pathway
+    :param endpoint_edges: dict mapping (start, end) tuples to Counters
+                           of (i, j) edges with i <= j, modified in
+                           place
+    """
+    endpoints = (residues[0], residues[-1])
+    if endpoints not in endpoint_edges:
+        endpoint_edges[endpoints] = Counter()
+    edges = endpoint_edges[endpoints]
+    for i in range(len(residues) - 1):
+        resa = residues[i]
+        resb = residues[i + 1]
+        edges[(resa, resb) if resa <= resb else (resb, resa)] += 1
+
+
+def read_pathway_edge_frequencies(frame_file, residuemap, endpoint_edges = None, statistics = None):
+    """Process a WORDOM .frames file, returning raw edge counts
+    Based on initial work done by Björn Wallner, complemented and
+    almost completely rewritten by Robert Pilstål to consider edge
+    counts.
+
+    :param frame_file: file handle to WORDOM .frame-file
+    :param residuemap: dict mapping residue names to serial integers
+    :param endpoint_edges: if not None, a dict in which to also count
+                           edges per endpoint pair, see
+                           count_endpoint_edges
+    :param statistics: if not None, an object whose add(frame, residues)
+                       is called for every line, see
+                       internal.pathstats.PathStatistics
+    :return: Pandas dataframe of raw edge counts, 
+             Counter of frames discovered and processed,
+             Counter of unique start and endpoints discovered & proc.
+    """
+    frequencies = {}
+    frames_processed = Counter()
+    pathways_processed = Counter()
+
+    for frame, residues in read_pathway_frames(frame_file, residuemap):
+        # Count frame
+        frames_processed[frame] +=1
+        if statistics is not None:
+            statistics.add(frame, residues)
+
+        if residues is not None:
+            # Count endpoint tuples
+            pathways_processed[(residues[0], residues[-1])] += 1
+
+            # Count edges along pathway
+            count_pathway_edges(residues, frequencies)
+            if endpoint_edges is not None:
+                count_endpoint_edges(residues, endpoint_edges)
+
+    # Convert dictionary to DataFrame
+    df = edge_counts_to_dataframe(frequencies)
 
     return df, frames_processed, pathways_processed
 
 
+def read_pathway_edge_counts_blocks(frame_file, residuemap, block = 1 << 26, batch = 1 << 20):
+    """Process a WORDOM .frames file as read_pathway_edge_frequencies,
+    with the same counts, reading large binary blocks
+
+    Lines are split in bulk and parsed with bytes split instead of
+    regular expressions, residue names are looked up as bytes, and the
+    residue serials of batches of pathways are counted with numpy.
+    Lines not on the plain "frame path" form fall back to the regular
+    expressions of read_pathway_frames.
+
+    :param frame_file: binary file handle to WORDOM .frame-file
+    :param residuemap: dict mapping residue names to serial integers
+    :param block: number of bytes read at a time
+    :param batch: number of residues along pathways counted at a time
+    :return: Pandas dataframe of raw edge counts,
+             Counter of frames discovered and processed,
+             Counter of unique start and endpoints discovered & proc.
+    """
+    m_framespec = re.compile(rb'(\d+)\s+(\S+$)')
+    serials = {name.encode(): serial for name, serial in residuemap.items()}
+    lookup = serials.__getitem__
+    width = max(residuemap.values(), default = 0) + 1
+    frames_processed = Counter()
+    pathways_processed = Counter()
+    edge_keys = []
+    edge_counts = []
+    frames = []
+    residues = []
+    lengths = []
+
+    def count():
+        found, numbers = numpy.unique(numpy.array(frames, dtype = numpy.int64), return_counts = True)
+        frames_processed.update(dict(zip(found.tolist(), numbers.tolist())))
+        if lengths:
+            ids = numpy.array(residues, dtype = numpy.int64)
+            ends = numpy.cumsum(lengths)
+            starts = ends - numpy.array(lengths, dtype = numpy.int64)
+            found, numbers = numpy.unique(ids[starts] * width + ids[ends - 1], return_counts = True)
+            pathways_processed.update(dict(zip(zip((found // width).tolist(), (found % width).tolist()), numbers.tolist())))
+            # Consecutive residues, leaving out steps between pathways
+            within = numpy.ones(ids.size - 1, dtype = bool)
+            within[starts[1:] - 1] = False
+            a = ids[:-1][within]
+            b = ids[1:][within]
+            found, numbers = numpy.unique(numpy.concatenate([a * width + b, b * width + a]), return_counts = True)
+            edge_keys.append(found)
+            edge_counts.append(numbers)
+        del frames[:], residues[:], lengths[:]
+
+    def parse(lines):
+        add_frame = frames.append
+        add_residues = residues.extend
+        add_length = lengths.append
+        for line in lines:
+            parts = line.split()
+            if len(parts) == 2 and parts[0].isdigit():
+                frame, pathway = parts
+            else:
+                framefound = m_framespec.search(line.rstrip())
+                if not framefound:
+                    continue
+                frame, pathway = framefound.groups()
+            add_frame(int(frame))
+            # A path has residues on both sides of "=>"; else the NULL_PATH
+            if b"=>" in pathway[1:-1]:
+                path = pathway.split(b"=>")
+                add_residues(map(lookup, path))
+                add_length(len(path))
+
+    tail = b""
+    while True:
+        data = frame_file.read(block)
+        if not data:
+            break
+        lines = (tail + data).split(b"\n")
+        tail = lines.pop()
+        parse(lines)
+        if len(residues) >= batch:
+            count()
+    parse([tail])
+    count()
+
+    if not edge_keys:
+        return pd.DataFrame(), frames_processed, pathways_processed
+    keys = numpy.concatenate(edge_keys)
+    keys, inverse = numpy.unique(keys, return_inverse = True)
+    numbers = numpy.bincount(inverse, weights = numpy.concatenate(edge_counts))
+    present = numpy.unique(keys // width)
+    counts = numpy.zeros((present.size, present.size), dtype = count_dtype())
+    counts[numpy.searchsorted(present, keys // width), numpy.searchsorted(present, keys % width)] = numbers
+    df = pd.DataFrame(counts, index = present.tolist(), columns = present.tolist())
+
+    return df, frames_processed, pathways_processed
+
+
+def residue_chain_number(residue):
+    """Chain and residue number of a residue name
+
+    :param residue: str on format C:AX or C:X, X an int
+    :return: tuple of chain (str) and residue number (int)
+    """
+    chain, num = residue.split(':')
+    if num[:1].isalpha():
+        num = num[1:]
+    return chain, int(num)
+
+
 def get_chain_offsets(chainlist, chainlength, chainpadding):
     """Generates chain offsets
 
@@ -218,45 +419,52 @@ def get_chain_offsets(chainlist, chainlength, chainpadding):
     :param chainpadding: chain padding dictionary
     :return: dictionary of chain offsets
     """
-    chainoffset = {}
-    for a in range(len(chainlist)):
-        if a > 0:
-            chainoffset[chainlist[a]] = sum([0] + [chainlength[chainlist[b]] +
-                                                   chainpadding[chainlist[b]]
-                                                   for b in range(a)])
-        else:
-            chainoffset[chainlist[a]] = 0
-    return chainoffset
+    # Each chain starts where the previous ones end; one cumulative sum
+    sizes = [chainlength[chain] + chainpadding[chain] for chain in chainlist]
+    return dict(zip(chainlist, accumulate([0] + sizes[:-1])))
 
 
 def wordom_to_map(residuemap, chainlength=None):
     """Generates a WORDOM sequence to contact map sequence
 
 
-    :param residuemap: OrderedDict, mapping entries of type "A:21" to int
+    :param residuemap: OrderedDict, mapping entries of type "A:21" or
+                       "A:K21" to int
     :param chainlength: dictionary with chain letters as keys and int lengths
-                        as items
+                        as items, at least the largest residue number of
+                        every chain; chains starting below residue 1 are
+                        still padded
     :return: tuple of; Map for WORDOM sequence to contact map numbering, total
              contact map size, chainpadding dict, chainoffset dict, chainlength
              dict.
     """
     chainstart = {}
-    # Get chain sizes, maximum and minimum PDB residue number
+    chainend = {}
+    # Get maximum and minimum PDB residue number of chains
+    for entry in residuemap:
+        chain, num = residue_chain_number(entry)
+        # Initialize empty entries
+        if not chain in chainend:
+            chainend[chain] = num
+            chainstart[chain] = num
+        # get maximum and minimum
+        chainend[chain] = max(num, chainend[chain])
+        chainstart[chain] = min(num, chainstart[chain])
+    # Chain sizes as the maximum residue number, unless given
     if chainlength is None:
-        chainlength = {}
-        for entry in residuemap:
-            [chain, num] = entry.split(':')
-            # Initialize empty entries
-            if not chain in chainlength:
-                chainlength[chain] = int(num)
-                chainstart[chain] = int(num)
-            # get maximum and minimum
-            chainlength[chain] = max([int(num), chainlength[chain]])
-            chainstart[chain] = min([int(num), chainlength[chain]])
+        chainlength = chainend
+    else:
+        missing = sorted(set(chainend) - set(chainlength))
+        if missing:
+            raise ValueError("No chain length given for chain(s) {}".format(", ".join(missing)))
+        for chain in sorted(chainend):
+            if chainlength[chain] < chainend[chain]:
+                raise ValueError("Chain {} length {} is shorter than its largest residue number {}".format(
+                    chain, chainlength[chain], chainend[chain]))
     # Calculate chain padding for negative PDB indices
     chainpadding = {}
-    for chain in chainstart:
-        if chainstart[chain] < 1:
+    for chain in chainlength:
+        if chainstart.get(chain, 1) < 1:
             chainpadding[chain] = 1 - chainstart[chain]
         else:
             chainpadding[chain] = 0
@@ -276,9 +484,9 @@ def wordom_to_map(residuemap, chainlength=None):
     # Generate the residuemap to map mapping
     cmapseq = []
     for entry in residuemap:
-        [chain, num] = entry.split(':')
+        chain, num = residue_chain_number(entry)
         # Consider the chain padding and offset; numbering 1 in PDB as 0
-        cmapseq.append(chainpadding[chain] + chainoffset[chain] + int(num) - 1)
+        cmapseq.append(chainpadding[chain] + chainoffset[chain] + num - 1)
     # Return the map, padding and contact map size
     cmapsize = sum([chainpadding[i] for i in chainpadding]) + sum(
         [chainlength[j] for j in chainlength])
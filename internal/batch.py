@@ -0,0 +1,92 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from os import path
+from ..interface.files import load_pyobject
+from ..interface.pymol import set_backend
+from ..interface.recorder import ScriptRecorder, run_headless
+from .workflow import align, render
+'''
+ Batch rendering of systems to PyMOL scripts, images and sessions,
+ without a display
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def read_batch_config(filename):
+    """Read the systems of a batch, as the server configuration; a JSON
+    file with a list of systems, each an object with "name", "pdb",
+    "acg", "rmp" and optionally "frq" and "pml", a list of PyMOL scripts
+
+    :param filename: JSON configuration file
+    :return: list of dicts
+    """
+    with open(filename, 'r') as infile:
+        return json.load(infile)["systems"]
+
+
+def record_system(system, cutoffs, outdir, png=False, pse=False):
+    """Record the drawing of a system to a PyMOL script
+
+    :param system: dict of a system, see read_batch_config
+    :param cutoffs: list of ciACG cutoffs
+    :param outdir: directory to write NAME.pml, and for the script to
+                   save NAME.png and NAME.pse to
+    :param png: if True, the script saves a ray traced image
+    :param pse: if True, the script saves a session
+    :return: filename of the script
+    """
+    name = system["name"]
+    residuemap = load_pyobject(system["rmp"])
+    frequencies = None if system.get("frq") is None else load_pyobject(system["frq"])
+    cigraph, pathways = align(residuemap, load_pyobject(system["acg"]), frequencies)
+    recorder = ScriptRecorder()
+    previous = set_backend(recorder)
+    try:
+        render(cigraph, residuemap, path.abspath(system["pdb"]), cutoffs, pathways, pml=system.get("pml"),
+               png=path.abspath(path.join(outdir, name + ".png")) if png else None,
+               pse=path.abspath(path.join(outdir, name + ".pse")) if pse else None)
+    finally:
+        set_backend(previous)
+    script = path.join(outdir, name + ".pml")
+    recorder.write(script)
+    return script
+
+
+def render_system(system, cutoffs, outdir, png=False, pse=False, pymol=None):
+    """Record a system, and run the script in a headless PyMOL if images
+    or sessions are to be saved
+
+    :param pymol: PyMOL executable; if None, only write the script
+    :return: filename of the script
+    """
+    script = record_system(system, cutoffs, outdir, png, pse)
+    if pymol is not None and (png or pse):
+        run_headless(script, pymol)
+    return script
+
+
+def render_systems(systems, cutoffs, outdir, png=False, pse=False, pymol=None, workers=1):
+    """Render systems in a pool of worker processes, one system per task
+
+    :param systems: list of dicts, see read_batch_config
+    :param workers: number of worker processes; 1 runs in this process
+    :return: list of script filenames, in systems order
+    """
+    arguments = (cutoffs, outdir, png, pse, pymol)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_system, system, *arguments) for system in systems]
+            return [future.result() for future in futures]
+    return [render_system(system, *arguments) for system in systems]
@@ -0,0 +1,125 @@
+from numpy import (abs as absolute, array, bincount, float64, full, int64,
+                   nonzero, sqrt, zeros)
+'''
+ Residue centrality metrics of the ciACG and of pathway edge counts
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def weighted_degree(matrix):
+    """Sum of absolute edge weights of every residue, self edges left out
+
+    :param matrix: symmetric numpy array of shape (N, N)
+    :return: numpy array of length N
+    """
+    weights = absolute(matrix).sum(axis=1, dtype=float64)
+    weights -= absolute(matrix.diagonal())
+    return weights
+
+
+def eigenvector_centrality(matrix, tolerance=1e-9, iterations=1000):
+    """Eigenvector centrality of the absolute edge weights, by power
+    iteration on the nonzero edges only
+
+    The iterated matrix is shifted by the identity, which leaves the
+    leading eigenvector unchanged but lets the iteration converge on
+    bipartite graphs too.
+
+    :param matrix: symmetric numpy array of shape (N, N)
+    :param tolerance: largest change of the normalized vector to stop at
+    :param iterations: maximum number of iterations
+    :return: numpy array of length N, of unit Euclidean norm
+    """
+    size = matrix.shape[0]
+    i, j = nonzero(matrix)
+    keep = i != j
+    i = i[keep]
+    j = j[keep]
+    weights = absolute(matrix[i, j]).astype(float64)
+    vector = full(size, 1.0 / sqrt(max(size, 1)))
+    for iteration in range(iterations):
+        product = vector + bincount(i, weights=weights * vector[j], minlength=size)
+        product /= sqrt((product * product).sum())
+        change = absolute(product - vector).max()
+        vector = product
+        if change < tolerance:
+            break
+    return vector
+
+
+def pathway_betweenness(counts, endpoints):
+    """Fraction of pathways passing through every residue, not counting
+    the pathways it is an endpoint of
+
+    A pathway adds one count to both directions of each of its edges, so
+    a residue inside it gains two counts in its row and an endpoint one.
+
+    :param counts: symmetric numpy array of pathway edge counts, in
+                   residue map order
+    :param endpoints: numpy array of the number of pathways every residue
+                      is an endpoint of
+    :return: numpy array of length N
+    """
+    passing = (counts.sum(axis=1, dtype=float64) - endpoints) / 2.0
+    total = endpoints.sum() / 2.0
+    return passing / total if total > 0 else passing
+
+
+def endpoint_counts(pathways_processed, registry):
+    """Number of pathways every residue is an endpoint of
+
+    :param pathways_processed: Counter of (start, end) serial pairs
+    :param registry: ResidueRegistry of the residues
+    :return: numpy array of length N
+    """
+    if not pathways_processed:
+        return zeros(len(registry), dtype=float64)
+    pairs = array(list(pathways_processed.keys()), dtype=int64)
+    numbers = array(list(pathways_processed.values()), dtype=float64)
+    ids = registry.ids_from_serials(pairs.ravel())
+    known = ids >= 0
+    return bincount(ids[known], weights=numbers.repeat(2)[known], minlength=len(registry))
+
+
+def format_centrality(labels, metrics, top=None):
+    """Lines of residue centralities, ranked by the first metric
+
+    :param labels: residue names, indexed by registry id
+    :param metrics: list of tuples (name, numpy array of length N)
+    :param top: number of residues to list, default=all
+    :return: list of str, tab separated, with a header line
+    """
+    order = (-metrics[0][1]).argsort(kind="stable")[:top]
+    lines = ["\t".join(["residue"] + [name for name, values in metrics])]
+    for k in order:
+        lines.append("\t".join([labels[k]] + ["{:.6g}".format(values[k]) for name, values in metrics]))
+    return lines
+
+
+def add_centrality_arguments(parser, metrics):
+    """Add the centrality options to an ArgumentParser
+
+    :param parser: argparse.ArgumentParser of a script
+    :param metrics: names of the metrics the script computes
+    """
+    parser.add_argument(
+        "-centrality", nargs=1, default=[None], choices=list(metrics), metavar="|".join(metrics),
+        help="Color residues by this centrality, through their b-factors")
+    parser.add_argument(
+        "-palette", nargs=1, default=["blue_white_red"], metavar="PALETTE", help="PyMOL spectrum palette of -centrality, default=blue_white_red")
+    parser.add_argument(
+        "-ctr", nargs=1, default=[None], metavar="TSVfile", help="Write all residue centralities, ranked, to TSVfile")
+    parser.add_argument(
+        "-top", nargs=1, default=[0], metavar="int", help="Print the top int residues by -centrality, default=0")
@@ -0,0 +1,170 @@
+from itertools import combinations
+from numpy import (abs as absolute, argpartition, argsort,
+                   log2, median, triu_indices, zeros)
+from .precision import value_dtype
+from .registry import ResidueRegistry
+'''
+ Differential comparison of ciACGs and pathway frequencies of several
+ states, e.g. apo/holo or wild type/mutant
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def union_registry(residuemaps):
+    """Registry of all residues in several residue maps, aligned on the
+    residue names; serials are renumbered from 1 in order of appearance
+
+    :param residuemaps: list of OrderedDicts of residue names to serials
+    :return: ResidueRegistry
+    """
+    labels = []
+    seen = set()
+    for residuemap in residuemaps:
+        for label in residuemap:
+            if label not in seen:
+                seen.add(label)
+                labels.append(label)
+    return ResidueRegistry(labels, range(1, len(labels) + 1))
+
+
+def stack_states(tables, residuemaps, dtype=None):
+    """Align the tables of several states on residue names
+
+    :param tables: list of pandas DataFrames indexed by WORDOM serials,
+                   e.g. ciACG (.frm) or pathway frequency outputs
+    :param residuemaps: list of residue maps, one per table
+    :param dtype: numpy dtype of the stack, default by the precision
+                  policy
+    :return: tuple of the union ResidueRegistry and a numpy array of
+             shape (states, N, N), zero where a residue is missing
+    """
+    if dtype is None:
+        dtype = value_dtype()
+    union = union_registry(residuemaps)
+    stack = zeros((len(tables), len(union), len(union)), dtype=dtype)
+    for state, (table, residuemap) in enumerate(zip(tables, residuemaps)):
+        registry = ResidueRegistry.from_residuemap(residuemap)
+        ids = union.ids_from_labels(registry.labels)
+        stack[state][ids[:, None], ids[None, :]] = registry.matrix_from_table(table, dtype=dtype)
+    return union, stack
+
+
+def log_ratio(reference, other, pseudocount=1e-6):
+    """Elementwise log2 ratio of absolute values, other over reference
+
+    :param reference: numpy array
+    :param other: numpy array of same shape
+    :param pseudocount: added to both absolute values before the ratio
+    :return: numpy array of log2 ratios
+    """
+    ratio = absolute(other) + pseudocount
+    ratio /= absolute(reference) + pseudocount
+    return log2(ratio, out=ratio)
+
+
+def significance_mask(difference, threshold=3.0):
+    """Mask edges whose difference is an outlier among all changed edges,
+    by a robust z-score; the median and the median absolute deviation
+    of the nonzero differences above the diagonal
+
+    :param difference: symmetric numpy array of differences
+    :param threshold: robust z-score needed to be significant
+    :return: boolean numpy array of difference shape
+    """
+    values = difference[triu_indices(difference.shape[0], 1)]
+    values = values[values != 0]
+    if values.size == 0:
+        return zeros(difference.shape, dtype=bool)
+    center = median(values)
+    scale = 1.4826 * median(absolute(values - center))
+    changed = difference != 0
+    if scale == 0:
+        return changed
+    return changed & (absolute(difference - center) > threshold * scale)
+
+
+def top_changed_edges(difference, k=20, mask=None):
+    """The k edges with the largest absolute difference, by partial sort
+
+    :param difference: symmetric numpy array of differences
+    :param k: number of edges
+    :param mask: optional boolean array, only consider masked edges
+    :return: tuple of numpy arrays (i, j, difference), with i < j, in
+             order of decreasing absolute difference
+    """
+    i, j = triu_indices(difference.shape[0], 1)
+    if mask is not None:
+        keep = mask[i, j]
+        i = i[keep]
+        j = j[keep]
+    values = difference[i, j]
+    k = min(k, values.size)
+    if k == 0:
+        return i[:0], j[:0], values[:0]
+    top = argpartition(-absolute(values), k - 1)[:k]
+    top = top[argsort(-absolute(values[top]), kind="stable")]
+    return i[top], j[top], values[top]
+
+
+def compare_pair(stack, reference, other, k=20, threshold=3.0, pseudocount=1e-6):
+    """Compare two states of a stack
+
+    :param stack: numpy array of shape (states, N, N)
+    :param reference: index of the reference state
+    :param other: index of the other state
+    :param k: number of top changed edges
+    :param threshold: robust z-score of significant differences
+    :param pseudocount: pseudocount of the log ratio
+    :return: dict with "difference", "log_ratio", "significant" arrays
+             and "top", a tuple (i, j, difference) of the top changed
+             edges, significant or not
+    """
+    difference = stack[other] - stack[reference]
+    significant = significance_mask(difference, threshold)
+    return {"difference": difference,
+            "log_ratio": log_ratio(stack[reference], stack[other], pseudocount),
+            "significant": significant,
+            "top": top_changed_edges(difference, k)}
+
+
+def compare_all_pairs(stack, k=20, threshold=3.0, pseudocount=1e-6):
+    """Compare all pairs of states of a stack
+
+    :param stack: numpy array of shape (states, N, N)
+    :return: generator of ((reference, other), result of compare_pair)
+    """
+    for reference, other in combinations(range(stack.shape[0]), 2):
+        yield (reference, other), compare_pair(stack, reference, other, k, threshold, pseudocount)
+
+
+def format_top_edges(top, labels, log_ratios=None, significant=None):
+    """Lines of top changed edges, with residue names
+
+    :param top: tuple of arrays (i, j, difference)
+    :param labels: residue names, indexed by registry id
+    :param log_ratios: optional array of log ratios to include
+    :param significant: optional significance mask, to include as 1 for
+                        significant edges and 0 for the others
+    :return: list of str, tab separated
+    """
+    lines = []
+    for i, j, difference in zip(*top):
+        line = "{}\t{}\t{:.6g}".format(labels[i], labels[j], difference)
+        if log_ratios is not None:
+            line += "\t{:.4g}".format(log_ratios[i, j])
+        if significant is not None:
+            line += "\t{:d}".format(int(significant[i, j]))
+        lines.append(line)
+    return lines
@@ -0,0 +1,94 @@
+from os import makedirs, path
+from numpy import argsort, array, full, intp, nonzero, savez_compressed, unique
+from ..interface.wordom import wordom_to_map
+'''
+ Projection of residue matrices onto the padded contact map numbering of
+ wordom_to_map, for comparison with predicted contact maps
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def contactmap_indices(residuemap, chainlength=None):
+    """Contact map position of every residue
+
+    :param residuemap: OrderedDict of residue names to serials
+    :param chainlength: optional dict of chain lengths, see wordom_to_map
+    :return: tuple of numpy array of positions, in residue map order,
+             contact map size and dict of chain offsets
+    """
+    cmap, size, chainpadding, chainoffset, chainlength = wordom_to_map(residuemap, chainlength)
+    return array(list(cmap.values()), dtype=intp), size, chainoffset
+
+
+def project_matrix(matrix, indices, fill_value=0.0):
+    """Entries of a matrix in residue map order at their contact map
+    positions, in coordinate form; the full map is never built
+
+    :param matrix: numpy array of shape (N, N), e.g. a ciACG, interaction
+                   strengths or pathway frequencies
+    :param indices: contact map position of every residue
+    :param fill_value: value of positions left out
+    :return: tuple of numpy arrays of rows, columns and values of the
+             entries other than fill_value
+    """
+    a, b = nonzero(matrix != fill_value)
+    return indices[a], indices[b], matrix[a, b]
+
+
+def write_contactmap(entries, size, filename, chainoffset=None, tile=1024, fill_value=0.0):
+    """Write a projected contact map
+
+    .npz files hold the entries in coordinate form, rows, columns and
+    values, with the map size and the chain offsets. Any other filename
+    is a directory of PNG tiles, rROW_cCOL.png of tile by tile positions
+    on a common color scale; only tiles holding entries are written,
+    one at a time.
+
+    :param entries: tuple of rows, columns and values, from project_matrix
+    :param size: contact map size
+    :param filename: .npz or tile directory
+    :param chainoffset: dict of chain offsets, for .npz
+    :param tile: tile side in positions
+    :param fill_value: value of positions without an entry
+    :return: number of files written
+    """
+    rows, columns, values = entries
+    if filename.endswith(".npz"):
+        chains = sorted(chainoffset or {})
+        savez_compressed(filename, rows=rows, columns=columns, values=values, size=size,
+                         fill_value=fill_value, chains=array(chains, dtype=str),
+                         offsets=array([chainoffset[chain] for chain in chains], dtype=intp))
+        return 1
+    from matplotlib.image import imsave
+    makedirs(filename, exist_ok=True)
+    if values.size == 0:
+        return 0
+    minimum = min(float(values.min()), fill_value)
+    maximum = max(float(values.max()), fill_value)
+    # Group the entries by tile
+    tiles = (size + tile - 1) // tile
+    keys = (rows // tile) * tiles + columns // tile
+    order = argsort(keys, kind="stable")
+    occupied, starts = unique(keys[order], return_index=True)
+    ends = list(starts[1:]) + [order.size]
+    for key, start, end in zip(occupied.tolist(), starts.tolist(), ends):
+        row = key // tiles * tile
+        column = key % tiles * tile
+        block = full((min(tile, size - row), min(tile, size - column)), fill_value, dtype=values.dtype)
+        members = order[start:end]
+        block[rows[members] - row, columns[members] - column] = values[members]
+        imsave(path.join(filename, "r{}_c{}.png".format(row // tile, column // tile)), block,
+               vmin=minimum, vmax=maximum, cmap="viridis", origin="upper")
+    return occupied.size
@@ -0,0 +1,153 @@
+from numpy import (clip, einsum, float64, load, memmap, outer, sqrt, zeros)
+from pandas import DataFrame
+from ..interface.pdb import is_alpha_carbon, read_pdb_models, residue_label
+from .precision import value_dtype
+'''
+ Dynamic cross-correlation (DCCM) of residue positions, accumulated in a
+ single pass over the frames
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class CovarianceAccumulator(object):
+    def __init__(self, size):
+        """Mean positions and displacement co-moments of residues
+
+        Chunks of frames are merged with the pairwise update of Chan et
+        al., the chunked form of Welford's algorithm; the co-moment of a
+        chunk is taken around the chunk mean and shifted by the
+        difference of means, avoiding the cancellation of raw sums.
+        Memory is bounded by N^2, independent of the number of frames.
+
+        :param size: number of residues, N
+        """
+        self.frames = 0
+        self.mean = zeros((size, 3), dtype=float64)
+        # Sum over frames and x, y, z of products of displacements
+        self.comoment = zeros((size, size), dtype=float64)
+
+    def update(self, chunk):
+        """Merge a chunk of frames
+
+        :param chunk: numpy array of shape (frames, N, 3)
+        """
+        frames = chunk.shape[0]
+        if frames == 0:
+            return
+        chunk_mean = chunk.mean(axis=0, dtype=float64)
+        centered = chunk - chunk_mean
+        total = self.frames + frames
+        delta = chunk_mean - self.mean
+        self.comoment += einsum("tik,tjk->ij", centered, centered, optimize=True)
+        self.comoment += (self.frames * frames / float(total)) * einsum("ik,jk->ij", delta, delta)
+        self.mean += delta * (frames / float(total))
+        self.frames = total
+
+    def correlation(self):
+        """Normalized cross-correlation of residue displacements
+
+        :return: numpy array of shape (N, N), in [-1, 1]
+        """
+        scale = sqrt(self.comoment.diagonal())
+        scale[scale == 0.0] = 1.0
+        return clip(self.comoment / outer(scale, scale), -1.0, 1.0)
+
+
+def chunk_buffer(chunk, size, filename=None):
+    """Buffer for a chunk of frames
+
+    :param chunk: number of frames per chunk
+    :param size: number of residues, N
+    :param filename: if given, back the buffer by a memory mapped file
+    :return: numpy array or memmap of shape (chunk, N, 3)
+    """
+    if filename is None:
+        return zeros((chunk, size, 3), dtype=float64)
+    return memmap(filename, dtype=float64, mode="w+", shape=(chunk, size, 3))
+
+
+def dccm_from_frames(frames, size, chunk=256, buffer=None):
+    """Cross-correlation of residue positions over an iterable of frames
+
+    :param frames: iterable of numpy arrays of shape (N, 3)
+    :param size: number of residues, N
+    :param chunk: number of frames buffered between updates
+    :param buffer: optional filename of a memory mapped chunk buffer
+    :return: numpy array of shape (N, N)
+    """
+    accumulator = CovarianceAccumulator(size)
+    frames_buffer = chunk_buffer(chunk, size, buffer)
+    filled = 0
+    for coordinates in frames:
+        if coordinates.shape != (size, 3):
+            raise ValueError("Frame with {} residues, expected {}".format(coordinates.shape[0], size))
+        frames_buffer[filled] = coordinates
+        filled += 1
+        if filled == chunk:
+            accumulator.update(frames_buffer)
+            filled = 0
+    accumulator.update(frames_buffer[:filled])
+    return accumulator.correlation()
+
+
+def dccm_from_array(coordinates, chunk=256):
+    """Cross-correlation of residue positions in a coordinate array
+
+    :param coordinates: numpy array or memmap of shape (frames, N, 3)
+    :param chunk: number of frames read per update
+    :return: numpy array of shape (N, N)
+    """
+    accumulator = CovarianceAccumulator(coordinates.shape[1])
+    for start in range(0, coordinates.shape[0], chunk):
+        accumulator.update(coordinates[start:start + chunk].astype(float64))
+    return accumulator.correlation()
+
+
+def dccm_table(matrix):
+    """Label a cross-correlation matrix as read_correlations does
+
+    :param matrix: numpy array of shape (N, N), in sequence order
+    :return: Pandas dataframe indexed by WORDOM serials, 1..N
+    """
+    serials = range(1, matrix.shape[0] + 1)
+    return DataFrame(matrix, index=serials, columns=serials).astype(value_dtype())
+
+
+def dccm_from_file(filename, chunk=256, buffer=None):
+    """Cross-correlation of CA atoms in a multi-model PDB file, or of
+    residue positions in a .npy array of shape (frames, N, 3), which is
+    memory mapped
+
+    :param filename: .pdb or .npy file
+    :param chunk: number of frames per update
+    :param buffer: optional filename of a memory mapped chunk buffer,
+                   for PDB files
+    :return: tuple of Pandas dataframe, as from read_correlations, and
+             list of residue names on format C:AX, or None for .npy
+    """
+    if filename.endswith(".npy"):
+        return dccm_table(dccm_from_array(load(filename, mmap_mode='r'), chunk)), None
+    with open(filename, 'r') as infile:
+        models = read_pdb_models(infile, select=is_alpha_carbon)
+        atoms, first = next(models)
+
+        def frames():
+            yield first
+            for _, coordinates in models:
+                yield coordinates
+
+        matrix = dccm_from_frames(frames(), len(atoms), chunk, buffer)
+    labels = [residue_label(chain, resn, resi) for chain, resn, resi, name in atoms]
+    return dccm_table(matrix), labels
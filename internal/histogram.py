@@ -0,0 +1,117 @@
+import json
+from numpy import (arange, asarray, concatenate, cumsum, histogram, inf,
+                   interp, linspace, zeros)
+'''
+ Streaming histograms over the upper triangle of symmetric matrices
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def upper_triangle_chunks(matrix, nonzero=False, chunk_rows=1024):
+    """Iterate over the values above the diagonal, a block of rows at a
+    time, so that memory mapped matrices are read piecewise
+
+    :param matrix: square numpy array, may be memory mapped
+    :param nonzero: if True, only yield the nonzero values
+    :param chunk_rows: number of rows per block
+    :return: generator of 1-D numpy arrays of values
+    """
+    size = matrix.shape[0]
+    columns = arange(size)
+    for start in range(0, size, chunk_rows):
+        stop = min(size, start + chunk_rows)
+        block = asarray(matrix[start:stop])
+        values = block[columns[None, :] > arange(start, stop)[:, None]]
+        if nonzero:
+            values = values[values != 0]
+        yield values
+
+
+def upper_triangle_histogram(matrix, bins=50, value_range=None, nonzero=False, chunk_rows=1024):
+    """Histogram of the values above the diagonal of a symmetric matrix
+
+    :param matrix: square numpy array, may be memory mapped
+    :param bins: number of bins
+    :param value_range: (min, max) tuple, if None found in a first pass
+    :param nonzero: if True, only bin the nonzero values
+    :param chunk_rows: number of rows binned at a time
+    :return: tuple of numpy arrays; bin counts and bin edges
+    """
+    if value_range is None:
+        minimum = inf
+        maximum = -inf
+        for values in upper_triangle_chunks(matrix, nonzero, chunk_rows):
+            if values.size > 0:
+                minimum = min(minimum, values.min())
+                maximum = max(maximum, values.max())
+        value_range = (0.0, 0.0) if minimum > maximum else (minimum, maximum)
+    edges = linspace(value_range[0], value_range[1], bins + 1)
+    counts = zeros(bins, dtype=int)
+    for values in upper_triangle_chunks(matrix, nonzero, chunk_rows):
+        counts += histogram(values, edges)[0]
+    return counts, edges
+
+
+def suggest_cutoffs(counts, edges, quantiles=(0.5, 0.9, 0.95, 0.99)):
+    """Approximate value quantiles from a histogram, as cutoff suggestions
+
+    :param counts: bin counts
+    :param edges: bin edges
+    :param quantiles: quantiles to suggest cutoffs for
+    :return: list of cutoff values, one per quantile
+    """
+    cumulative = concatenate([[0], cumsum(counts)])
+    if cumulative[-1] == 0:
+        return [float(edges[0]) for q in quantiles]
+    return [float(interp(q * cumulative[-1], cumulative, edges)) for q in quantiles]
+
+
+def write_histogram(counts, edges, filename, quantiles=(), cutoffs=()):
+    """Write a histogram as .csv, .json or .png, by filename suffix; the
+    image is drawn with the non-interactive Agg backend
+
+    :param counts: bin counts
+    :param edges: bin edges
+    :param filename: file to write
+    :param quantiles: quantiles of the suggested cutoffs
+    :param cutoffs: suggested cutoffs, marked in the image
+    """
+    suffix = filename.split('.')[-1].lower()
+    if suffix == "csv":
+        with open(filename, 'w') as outfile:
+            outfile.write("bin_start,bin_end,count\n")
+            for start, end, count in zip(edges[:-1], edges[1:], counts):
+                outfile.write("{},{},{}\n".format(start, end, count))
+    elif suffix == "json":
+        with open(filename, 'w') as outfile:
+            json.dump({"edges": [float(e) for e in edges],
+                       "counts": [int(c) for c in counts],
+                       "cutoffs": dict(zip([str(q) for q in quantiles], cutoffs))},
+                      outfile, indent=2)
+    elif suffix == "png":
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(1, 1, 1)
+        axes.stairs(counts, edges, fill=True)
+        for cutoff in cutoffs:
+            axes.axvline(cutoff, color="red", linestyle="--", linewidth=0.8)
+        axes.set_yscale("log")
+        axes.set_xlabel("value")
+        axes.set_ylabel("count")
+        figure.savefig(filename)
+    else:
+        raise ValueError("Unknown histogram format '{}', use .csv, .json or .png".format(suffix))
@@ -0,0 +1,186 @@
+import json
+import resource
+import tracemalloc
+from contextlib import contextmanager
+from cProfile import Profile
+from time import perf_counter, process_time
+'''
+ Stage level timing and memory instrumentation
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Counters that get a throughput, per second of wall time, in the spans
+THROUGHPUT_COUNTERS = ("lines", "bytes", "edges")
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes"""
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler(object):
+    def __init__(self, enabled=True, trace_memory=False, cprofile_stage=None, cprofile_file=None):
+        """Records spans of wall time, cpu time, memory and throughput of
+        named stages
+
+        :param enabled: if False, spans are not recorded
+        :param trace_memory: if True, also record the tracemalloc peak
+                             of each span, above its start
+        :param cprofile_stage: name of a stage to run under cProfile
+        :param cprofile_file: file to dump the cProfile statistics to
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_file = cprofile_file
+        self.spans = []
+        # Running tracemalloc peaks of the open spans, innermost last
+        self.peaks = []
+
+    def settings(self):
+        """Profiler of the same settings, without recorded spans; for
+        worker processes, whose spans are merged back with merge"""
+        return Profiler(self.enabled, self.trace_memory, self.cprofile_stage, self.cprofile_file)
+
+    def merge(self, spans):
+        """Add spans recorded by another profiler, e.g. in a worker
+
+        :param spans: list of span records
+        """
+        self.spans.extend(spans)
+
+    @contextmanager
+    def span(self, name, **counters):
+        """Context manager recording a stage
+
+        :param name: stage name
+        :param counters: counters of processed data; lines, bytes or
+                         edges, may also be set on the yielded record
+        :return: yields the span record, a dict
+        """
+        record = {"stage": name}
+        record.update(counters)
+        if not self.enabled:
+            yield record
+            return
+        profile = None
+        if name == self.cprofile_stage:
+            profile = Profile()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            traced, peak = tracemalloc.get_traced_memory()
+            # Keep the peak of the enclosing span before resetting it
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            self.peaks.append(traced)
+            tracemalloc.reset_peak()
+        wall = perf_counter()
+        cpu = process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.cprofile_file or "{}.prof".format(name.replace(" ", "_")))
+            record["wall"] = perf_counter() - wall
+            record["cpu"] = process_time() - cpu
+            record["peak_rss"] = peak_rss()
+            if self.trace_memory:
+                peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["traced_peak"] = peak - traced
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+            for counter in THROUGHPUT_COUNTERS:
+                if counter in record and record["wall"] > 0.0:
+                    record["{}_per_s".format(counter)] = record[counter] / record["wall"]
+            self.spans.append(record)
+
+    def write(self, filename):
+        """Write the recorded spans as JSON
+
+        :param filename: JSON file to write
+        """
+        with open(filename, 'w') as outfile:
+            json.dump({"spans": self.spans}, outfile, indent=2)
+
+    def summary(self):
+        """Summary of the recorded spans, one line per span"""
+        return "\n".join("{:<12} wall {:9.3f} s  cpu {:9.3f} s  peak RSS {:8.1f} MB".format(
+            record["stage"], record["wall"], record["cpu"], record["peak_rss"] / float(1 << 20))
+            for record in self.spans)
+
+
+# The active profiler, disabled until a script activates one
+active = Profiler(enabled=False)
+
+
+def activate(profiler):
+    """Set the profiler recording the spans of span()
+
+    :param profiler: Profiler instance
+    """
+    global active
+    active = profiler
+
+
+def span(name, **counters):
+    """Record a stage with the active profiler, see Profiler.span"""
+    return active.span(name, **counters)
+
+
+def add_profile_arguments(parser):
+    """Add the profiling options to an ArgumentParser
+
+    :param parser: argparse.ArgumentParser of a script
+    """
+    parser.add_argument(
+        "-profile", "--profile", nargs=1, default=[None], metavar="JSONfile",
+        help="Write wall time, cpu time, memory and throughput of each stage to JSONfile")
+    parser.add_argument(
+        "-tracemem", action="store_true", default=False,
+        help="Also trace memory allocations of each stage with tracemalloc (slow)")
+    parser.add_argument(
+        "-cprofile", nargs=1, default=[None], metavar="STAGE",
+        help="Run the named stage under cProfile, dumping statistics to STAGE.prof")
+
+
+def activate_from_arguments(arguments):
+    """Activate a profiler if requested by the profiling options
+
+    :param arguments: parsed arguments, see add_profile_arguments
+    :return: the activated Profiler, or None if profiling not requested
+    """
+    if arguments.profile[0] is None and arguments.cprofile[0] is None:
+        return None
+    profiler = Profiler(trace_memory=arguments.tracemem, cprofile_stage=arguments.cprofile[0])
+    activate(profiler)
+    return profiler
+
+
+def finish_profiling(profiler, arguments):
+    """Print a summary and write the spans of an activated profiler
+
+    :param profiler: Profiler from activate_from_arguments, or None
+    :param arguments: parsed arguments, see add_profile_arguments
+    """
+    if profiler is None:
+        return
+    print(profiler.summary())
+    if arguments.profile[0] is not None:
+        profiler.write(arguments.profile[0])
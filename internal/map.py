@@ -103,8 +103,8 @@ class Map(OrderedDict):
 
     def guess_inverse(self, sequence):
         # Guess the inverse from sequence
-        # Create template of same length as sequence
-        reordered = [None] * max(sequence)
+        # Template covering the largest mapped position
+        reordered = [None] * (max((s for s in sequence if s is not None), default=-1) + 1)
         for pos in enumerate(sequence):
             if pos[1] is not None:
                 reordered[pos[1]] = pos[0]
@@ -1,5 +1,8 @@
-from numpy import add, around, divide, multiply, ones, subtract, zeros
+from numpy import (around, asarray, clip, concatenate, empty, float32, float64, intp,
+                   linspace, log1p, maximum, multiply, quantile, rint,
+                   searchsorted, subtract, zeros)
 from pandas import DataFrame
+from .precision import value_dtype
 
 '''
  <Decription here>
@@ -47,7 +50,7 @@ def dataframe_from_dictionary(data, indexmap = None, fillna = None):
     :return: pandas dataframe
     """
     # Convert dictionary to DataFrame
-    df = DataFrame.from_dict(data,orient='index')
+    df = DataFrame.from_dict(data,orient='index').astype(value_dtype())
     if indexmap is not None:
         df = df.rename(index = indexmap, columns = indexmap)
     if fillna is not None:
@@ -65,8 +68,8 @@ def matrix_from_interactions(interactions, mapping, default=0.0):
     """
     # Expecting symmetric dictionary
     size = len(mapping)
-    strength = zeros((size, size)) + default
-    frequency = zeros((size, size)) + default
+    strength = zeros((size, size), dtype = value_dtype()) + default
+    frequency = zeros((size, size), dtype = value_dtype()) + default
     # Populera strength och frequency via mappings från interactions
     for resa, inter in interactions.items():
         for resb, (strng, freq) in inter.items():
@@ -85,10 +88,49 @@ def matrix_from_pandas_dataframe(pddframe):
     return pddframe.values
 
 
-def matrix_to_colorarray(matrix, hue_from = (1.0, 1.0, 1.0), hue_to = (1.0, 0.0, 0.0), channel_max = 255.0):
+def color_lookup_table(hue_from = (1.0, 1.0, 1.0), hue_to = (1.0, 0.0, 0.0), channel_max = 255.0, levels = 256, dtype = float32):
+    """Precompute a color lookup table interpolating between two colors
+
+    :param hue_from: tuple of channel values for the first level
+    :param hue_to: tuple of channel values for the last level
+    :param channel_max: Maximum level of channel, default 255.0
+    :param levels: number of colors in the table, default 256
+    :param dtype: numpy dtype of the table, default float32
+    :return: array of shape (channels, levels), rounded channel values
+    """
+    steps = linspace(0.0, 1.0, levels)
+    lut = empty((len(hue_to), levels), dtype = float64)
+    for i in range(len(hue_to)):
+        lut[i] = (hue_from[i] + steps * (hue_to[i] - hue_from[i])) * channel_max
+    return around(lut).astype(dtype)
+
+
+def diverging_lookup_table(negative = (0.0, 0.0, 1.0), middle = (1.0, 1.0, 1.0), positive = (1.0, 0.0, 0.0), channel_max = 255.0, levels = 257, dtype = float32):
+    """Precompute a diverging color lookup table, negative to positive
+    through a middle color at the center level
+
+    :param negative: tuple of channel values for the first level
+    :param middle: tuple of channel values for the center level
+    :param positive: tuple of channel values for the last level
+    :param channel_max: Maximum level of channel, default 255.0
+    :param levels: number of colors in the table, odd, default 257
+    :param dtype: numpy dtype of the table, default float32
+    :return: array of shape (channels, levels), rounded channel values
+    """
+    half = levels // 2 + 1
+    lower = color_lookup_table(negative, middle, channel_max, half, dtype)
+    upper = color_lookup_table(middle, positive, channel_max, levels - half + 1, dtype)
+    return concatenate([lower, upper[:, 1:]], axis = 1)
+
+
+def matrix_to_colorarray(matrix, hue_from = (1.0, 1.0, 1.0), hue_to = (1.0, 0.0, 0.0), channel_max = 255.0, scale = "linear", levels = 256, dtype = float32, mask = None, value_range = None, lut = None):
     """Converts a matrix into a color channel array
 
-    :param matrix: matrix to convert
+    Values are normalized once into color table indices, and mapped
+    through a precomputed lookup table with a single take.
+
+    :param matrix: matrix to convert, or any array such as the values
+                   of a sparse matrix
     :param hue_from: tuple of hue-values, starting color for null
                      strength. Default three with first channel
                     1.0 and the rest 0.
@@ -96,25 +138,63 @@ def matrix_to_colorarray(matrix, hue_from = (1.0, 1.0, 1.0), hue_to = (1.0, 0.0,
                    Coloring will be interpolated between hue_from
                    and hue_to.
     :param channel_max: Maximum level of channel, default 255.0
+    :param scale: "linear", "log" (log1p of the value above minimum)
+                  or "quantile" (levels spaced by value quantiles)
+    :param levels: number of colors in the lookup table, default 256
+    :param dtype: numpy dtype of the output, e.g. float32 or uint8
+    :param mask: boolean array of matrix shape, if not None only the
+                 masked elements are colored, the others get hue_from
+    :param value_range: (min, max) tuple to normalize with, default
+                        the min and max of the colored values
+    :param lut: precomputed lookup table of shape (channels, levels),
+                e.g. from diverging_lookup_table, used instead of
+                interpolating between hue_from and hue_to
     :return: array with first dimension being number of channels,
              providing one matrix per channel over the other
              dimensions
     """
-    rgb_matrix = zeros((len(hue_to), matrix.shape[0], matrix.shape[1]))
+    if lut is None:
+        lut = color_lookup_table(hue_from, hue_to, channel_max, levels, dtype)
+    levels = lut.shape[1]
+    values = asarray(matrix) if mask is None else asarray(matrix)[mask]
 
     # Find max, min and span
-    element_min = matrix.min()
-    element_max = matrix.max()
+    if value_range is not None:
+        element_min, element_max = value_range
+    elif values.size > 0:
+        element_min = values.min()
+        element_max = values.max()
+    else:
+        element_min = element_max = 0.0
     element_range = element_max - element_min
 
     print("Minimum = {}, Maximum = {}, span = {}".format(element_min, element_max, element_range))
 
-    # Normalize matrix between 0.0 and 1.0
-    normed_matrix = divide(subtract(matrix, element_min), element_range)
-
-    # Calculate rgb channels using specified "hue", rounding off
-    for i in range(len(hue_to)):
-        rgb_matrix[i,:,:] = around(multiply(add(multiply(normed_matrix, hue_to[i] - hue_from[i]), multiply(ones((matrix.shape[0], matrix.shape[1])), hue_from[i])), channel_max))
-        #rgb_matrix[i,:,:] = around(multiply(normed_matrix, hue[i] * channel_max))
-
+    # Normalize into lookup table indices, in place
+    normed = subtract(values, element_min, dtype = float32)
+    if scale == "linear":
+        if element_range > 0:
+            multiply(normed, (levels - 1) / element_range, out = normed)
+    elif scale == "log":
+        maximum(normed, 0.0, out = normed)
+        log1p(normed, out = normed)
+        if element_range > 0:
+            multiply(normed, (levels - 1) / log1p(element_range), out = normed)
+    elif scale == "quantile":
+        edges = quantile(values, linspace(0.0, 1.0, levels)) - element_min
+        normed = searchsorted(edges, normed, side = "right").astype(float32) - 1.0
+    else:
+        raise ValueError("Unknown scale '{}', use 'linear', 'log' or 'quantile'".format(scale))
+    if element_range <= 0:
+        normed[...] = 0.0
+    clip(normed, 0, levels - 1, out = normed)
+    indices = rint(normed, out = normed).astype(intp)
+
+    colors = lut.take(indices, axis = 1)
+    if mask is None:
+        return colors
+
+    rgb_matrix = empty((lut.shape[0],) + mask.shape, dtype = lut.dtype)
+    rgb_matrix[...] = lut[:, :1].reshape((lut.shape[0],) + (1,) * mask.ndim)
+    rgb_matrix[:, mask] = colors
     return rgb_matrix
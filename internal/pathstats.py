@@ -0,0 +1,156 @@
+from collections import Counter
+from itertools import chain
+from numpy import (array, bincount, cumsum, diff, float64, int64, minimum,
+                   repeat, savez, unique, zeros)
+'''
+ Pathway length, endpoint pair and residue visit statistics, collected
+ in the same pass over .frames files as the edge counts
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class PathStatistics(object):
+    def __init__(self, registry, max_length=64, batch=65536):
+        """Fixed size accumulators of pathway statistics
+
+        Pathways are buffered and counted in batches with numpy; a batch
+        is only counted at the start of a new frame, so that the lines
+        of a frame, which WORDOM writes contiguously, end up in one
+        batch. Frame numbers restart in every .frames file, so flush
+        at the end of every file.
+
+        :param registry: ResidueRegistry of the residues
+        :param max_length: longest path length, in edges, of its own
+                           bin; longer paths share the last bin
+        :param batch: number of pathways buffered between counts
+        """
+        size = len(registry)
+        self.registry = registry
+        self.batch = batch
+        # Number of paths of each length in edges, last bin for longer
+        self.lengths = zeros(max_length + 2, dtype=int64)
+        # Paths and frames with a path, per (start, end) registry id pair
+        self.pair_paths = Counter()
+        self.pair_frames = Counter()
+        # Number of paths through, or ending at, every residue
+        self.visits = zeros(size, dtype=int64)
+        self.null_paths = 0
+        self.frame = None
+        self.frames = []
+        self.paths = []
+
+    def add(self, frame, residues):
+        """Count a pathway, as from interface.wordom.read_pathway_frames
+
+        :param frame: frame number
+        :param residues: list of residue serials, None for a NULL_PATH
+        """
+        if residues is None:
+            self.null_paths += 1
+            return
+        if frame != self.frame:
+            if len(self.paths) >= self.batch:
+                self.flush()
+            self.frame = frame
+        self.frames.append(frame)
+        self.paths.append(residues)
+
+    def flush(self):
+        """Count the buffered pathways"""
+        if not self.paths:
+            return
+        size = len(self.registry)
+        lengths = array([len(residues) for residues in self.paths], dtype=int64)
+        ids = self.registry.ids_from_serials(list(chain.from_iterable(self.paths))).astype(int64)
+        ends = cumsum(lengths)
+        pairs = ids[ends - lengths] * size + ids[ends - 1]
+
+        self.lengths += bincount(minimum(lengths - 1, self.lengths.size - 1), minlength=self.lengths.size)
+        self.visits += bincount(ids, minlength=size)
+        self.pair_paths.update(self.pair_counts(pairs))
+        # Each (frame, pair) once
+        framepairs = unique(array(self.frames, dtype=int64) * (size * size) + pairs)
+        self.pair_frames.update(self.pair_counts(framepairs % (size * size)))
+        self.frames = []
+        self.paths = []
+
+    def pair_counts(self, pairs):
+        """Counts of flat pair indices, keyed by (start, end) id pair"""
+        size = len(self.registry)
+        found, counts = unique(pairs, return_counts=True)
+        return {(start, end): count for start, end, count in
+                zip((found // size).tolist(), (found % size).tolist(), counts.tolist())}
+
+    def pairs(self):
+        """Pair counts in coordinate form
+
+        :return: tuple of numpy arrays of start ids, end ids, paths and
+                 frames with a path, one entry per pair with a path
+        """
+        keys = sorted(self.pair_paths)
+        return (array([start for start, end in keys], dtype=int64),
+                array([end for start, end in keys], dtype=int64),
+                array([self.pair_paths[key] for key in keys], dtype=int64),
+                array([self.pair_frames[key] for key in keys], dtype=int64))
+
+    def summary(self):
+        """Line of path count, mean length and NULL_PATH count"""
+        paths = self.lengths.sum()
+        mean = (self.lengths * range(self.lengths.size)).sum() / paths if paths > 0 else 0.0
+        return "{} paths of mean length {:.3g} edges, in {} frame and endpoint pairs; {} NULL_PATHs".format(
+            paths, mean, sum(self.pair_frames.values()), self.null_paths)
+
+    def save(self, filename):
+        starts, ends, paths, frames = self.pairs()
+        savez(filename, lengths=self.lengths, pair_starts=starts, pair_ends=ends, pair_paths=paths,
+              pair_frames=frames, visits=self.visits, null_paths=self.null_paths, serials=self.registry.serials)
+
+
+def frequencies_per_path_frame(counts, statistics):
+    """Normalize edge counts by the number of frame and endpoint pair
+    combinations in which a path was found, leaving out the pairs
+    without a path in a frame
+
+    :param counts: numpy array of edge counts, in registry order
+    :param statistics: PathStatistics of the same pass
+    :return: numpy array of edge frequencies
+    """
+    total = sum(statistics.pair_frames.values())
+    return counts.astype(float64) / max(total, 1)
+
+
+def frequencies_per_pair(tensor, statistics):
+    """Normalize the edge counts of every endpoint pair by the frames in
+    which the pair had a path, and average over the pairs
+
+    :param tensor: dict of arrays, from internal.tensor.endpoint_edge_tensor
+    :param statistics: PathStatistics of the same pass
+    :return: symmetric numpy array of edge frequencies, in registry order
+    """
+    registry = statistics.registry
+    size = len(registry)
+    pairs = registry.ids_from_serials(tensor["pairs"].ravel()).reshape(-1, 2)
+    if pairs.shape[0] == 0:
+        return zeros((size, size), dtype=float64)
+    frames = array([statistics.pair_frames[pair] for pair in map(tuple, pairs.tolist())], dtype=float64)
+    # Pair of every stored edge
+    weights = repeat(1.0 / frames.clip(min=1.0), diff(tensor["indptr"])) * tensor["count"]
+    i = registry.ids_from_serials(tensor["i"]).astype(int64)
+    j = registry.ids_from_serials(tensor["j"]).astype(int64)
+    upper = bincount(i * size + j, weights=weights, minlength=size * size).reshape(size, size)
+    # Edges are stored once, with i <= j
+    matrix = upper + upper.T
+    matrix[range(size), range(size)] = upper.diagonal()
+    return matrix / pairs.shape[0]
@@ -0,0 +1,219 @@
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappop, heappush
+from numpy import (abs as absolute, array, exp, float64, inf, intp,
+                   log, nonzero, zeros)
+'''
+ Perturbation scan of the ciACG; the loss of communication efficiency
+ when residues or edges are removed, recomputing only the shortest paths
+ that pass through them
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class CommunicationGraph(object):
+    def __init__(self, matrix, cutoff=0.0):
+        """Graph of the ciACG edges with absolute weight above cutoff; the
+        length of an edge is -log(|w| / max |w|), so the communication of
+        a path, exp(-length), is the product of its normalized weights
+
+        :param matrix: symmetric numpy array of shape (N, N)
+        :param cutoff: edges with absolute weight above cutoff are kept
+        """
+        self.size = matrix.shape[0]
+        weights = absolute(matrix).astype(float64)
+        weights[range(self.size), range(self.size)] = 0.0
+        i, j = nonzero(weights > cutoff)
+        lengths = -log(weights[i, j] / weights.max()) if i.size > 0 else zeros(0)
+        self.neighbours = [[] for _ in range(self.size)]
+        for a, b, length in zip(i.tolist(), j.tolist(), lengths.tolist()):
+            self.neighbours[a].append((b, length))
+
+    def shortest_paths(self, source, removed_node=-1, removed_edge=None):
+        """Dijkstra shortest path tree from a source
+
+        :param source: source residue index
+        :param removed_node: residue index left out, -1 for none
+        :param removed_edge: tuple (a, b) of an edge left out, both ways
+        :return: tuple of lists, path lengths (inf if unreachable) and
+                 predecessors (-1 for the source and unreachable)
+        """
+        distance = [inf] * self.size
+        predecessor = [-1] * self.size
+        distance[source] = 0.0
+        queue = [(0.0, source)]
+        while queue:
+            d, a = heappop(queue)
+            if d > distance[a]:
+                continue
+            for b, length in self.neighbours[a]:
+                if b == removed_node or (removed_edge is not None and (a, b) in (removed_edge, removed_edge[::-1])):
+                    continue
+                if d + length < distance[b]:
+                    distance[b] = d + length
+                    predecessor[b] = a
+                    heappush(queue, (d + length, b))
+        return distance, predecessor
+
+
+# State of worker processes, set once by the pool initializer
+_scan = None
+
+
+class PerturbationScan(object):
+    def __init__(self, graph, workers=1):
+        """All-pairs shortest paths of a graph, and the shortest path trees
+        they come from
+
+        :param graph: CommunicationGraph
+        :param workers: number of worker processes
+        """
+        self.graph = graph
+        size = graph.size
+        sources = list(range(size))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                trees = list(executor.map(graph.shortest_paths, sources, chunksize=max(1, size // (4 * workers))))
+        else:
+            trees = [graph.shortest_paths(source) for source in sources]
+        self.communication = exp(-array([distance for distance, predecessor in trees], dtype=float64))
+        self.communication[range(size), range(size)] = 0.0
+        self.predecessors = array([predecessor for distance, predecessor in trees], dtype=intp)
+        self.rowsums = self.communication.sum(axis=1)
+        # inner[s, r] if r is an inner node of the shortest path tree of s
+        self.inner = zeros((size, size), dtype=bool)
+        for source in sources:
+            parents = self.predecessors[source]
+            self.inner[source, parents[parents >= 0]] = True
+            self.inner[source, source] = False
+
+    def edges(self):
+        """Edges of the graph
+
+        :return: tuple of numpy arrays (i, j), i < j
+        """
+        edges = [(a, b) for a in range(self.graph.size) for b, length in self.graph.neighbours[a] if a < b]
+        return array([a for a, b in edges], dtype=intp), array([b for a, b in edges], dtype=intp)
+
+    def efficiency(self):
+        """Mean communication over all ordered residue pairs"""
+        pairs = self.graph.size * (self.graph.size - 1)
+        return self.communication.sum() / pairs if pairs > 0 else 0.0
+
+    def node_impact(self, node):
+        """Relative loss of mean communication among the other residues
+        when a residue is removed; only the sources whose shortest path
+        tree passes through it are recomputed
+
+        :param node: residue index
+        :return: float, 0 if unaffected, 1 if all communication is lost
+        """
+        size = self.graph.size
+        pairs = (size - 1) * (size - 2)
+        column = self.communication[:, node]
+        before = self.communication.sum() - self.rowsums[node] - column.sum()
+        if pairs <= 0 or before <= 0.0:
+            return 0.0
+        after = before
+        for source in nonzero(self.inner[:, node])[0].tolist():
+            distance, predecessor = self.graph.shortest_paths(source, removed_node=node)
+            communication = exp(-array(distance, dtype=float64))
+            communication[source] = 0.0
+            communication[node] = 0.0
+            after += communication.sum() - (self.rowsums[source] - column[source])
+        return (before - after) / before
+
+    def edge_impact(self, edge):
+        """Relative loss of mean communication when an edge is removed;
+        only the sources whose shortest path tree uses it are recomputed
+
+        :param edge: tuple (a, b) of residue indices
+        :return: float
+        """
+        a, b = edge
+        before = self.communication.sum()
+        if before <= 0.0:
+            return 0.0
+        after = before
+        using = (self.predecessors[:, b] == a) | (self.predecessors[:, a] == b)
+        for source in nonzero(using)[0].tolist():
+            distance, predecessor = self.graph.shortest_paths(source, removed_edge=(a, b))
+            communication = exp(-array(distance, dtype=float64))
+            communication[source] = 0.0
+            after += communication.sum() - self.rowsums[source]
+        return (before - after) / before
+
+
+def _initialize(scan):
+    global _scan
+    _scan = scan
+
+
+def _node_impact(node):
+    return _scan.node_impact(node)
+
+
+def _edge_impact(edge):
+    return _scan.edge_impact(edge)
+
+
+def scan_impacts(scan, function, items, workers=1):
+    """Map an impact function of PerturbationScan over items, in a pool
+    of worker processes that each receive the scan once
+
+    :param scan: PerturbationScan
+    :param function: _node_impact or _edge_impact
+    :param items: residue indices or edges
+    :param workers: number of worker processes
+    :return: numpy array of impacts, in items order
+    """
+    items = list(items)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialize, initargs=(scan,)) as executor:
+            return array(list(executor.map(function, items, chunksize=max(1, len(items) // (4 * workers)))), dtype=float64)
+    _initialize(scan)
+    return array([function(item) for item in items], dtype=float64)
+
+
+def perturbation_scan(matrix, cutoff=0.0, workers=1):
+    """Shortest paths of a ciACG, to be shared by node_impacts and
+    edge_impacts
+
+    :param matrix: ciACG, a symmetric numpy array
+    :param cutoff: edges with absolute weight above cutoff are kept
+    :param workers: number of worker processes
+    :return: PerturbationScan
+    """
+    return PerturbationScan(CommunicationGraph(matrix, cutoff), workers)
+
+
+def node_impacts(scan, workers=1):
+    """Impact of removing every residue on the communication of the rest
+
+    :param scan: PerturbationScan, see perturbation_scan
+    :param workers: number of worker processes
+    :return: numpy array of relative efficiency losses, one per residue
+    """
+    return scan_impacts(scan, _node_impact, range(scan.graph.size), workers)
+
+
+def edge_impacts(scan, workers=1):
+    """Impact of removing every edge of the scanned graph
+
+    :param scan: PerturbationScan, see perturbation_scan
+    :param workers: number of worker processes
+    :return: tuple of numpy arrays (i, j, impact), i < j
+    """
+    i, j = scan.edges()
+    return i, j, scan_impacts(scan, _edge_impact, zip(i.tolist(), j.tolist()), workers)
@@ -0,0 +1,251 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from hashlib import sha256
+from multiprocessing import get_context
+from os import makedirs, path
+from ..interface.files import dump_pyobject_atomic, file_fingerprint, load_pyobject
+from . import instrument, precision
+'''
+ Declarative pipeline of stages with named inputs and outputs, run as a
+ DAG with concurrent execution of independent stages
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class Stage(object):
+    def __init__(self, name, function, inputs=None, outputs=(), parameters=None, files=(), serial=False, cache=True):
+        """A stage of a pipeline
+
+        :param name: unique stage name
+        :param function: module level callable taking the inputs and
+                         parameters as keyword arguments, returning a
+                         tuple of the outputs, the single output, or
+                         None; run in a worker process unless serial
+        :param inputs: dict of argument names to names of values output
+                       by other stages
+        :param outputs: names of the values returned by function
+        :param parameters: dict of argument names to constant values
+        :param files: filenames read by the stage, fingerprinted by
+                      content to decide if the stage must run again
+        :param serial: if True, run in the calling process, one serial
+                       stage at a time; for stages driving PyMOL
+        :param cache: if False, always run; for stages with side effects
+        """
+        self.name = name
+        self.function = function
+        self.inputs = dict(inputs or {})
+        self.outputs = tuple(outputs)
+        self.parameters = dict(parameters or {})
+        self.files = list(files)
+        self.serial = serial
+        self.cache = cache
+
+    def key(self, version, upstream):
+        """Key of the stage outputs
+
+        :param version: code version string
+        :param upstream: keys of the stages producing the inputs
+        :return: hexadecimal SHA-256 digest
+        """
+        digest = sha256()
+        digest.update(version.encode())
+        digest.update(self.name.encode())
+        digest.update(repr(sorted(self.parameters.items())).encode())
+        for filename in self.files:
+            digest.update(file_fingerprint(filename).encode())
+        for key in upstream:
+            digest.update(key.encode())
+        return digest.hexdigest()
+
+    def arguments(self, values):
+        arguments = {argument: values[name] for argument, name in self.inputs.items()}
+        arguments.update(self.parameters)
+        return arguments
+
+    def run(self, arguments):
+        print("Running stage {}".format(self.name))
+        result = self.function(**arguments)
+        if len(self.outputs) == 1:
+            result = (result,)
+        elif len(self.outputs) == 0:
+            result = ()
+        return dict(zip(self.outputs, result))
+
+
+def initialize_worker(name, profiler):
+    """Give a worker process the precision policy and profiler settings
+    of the pipeline process
+
+    :param name: precision policy name
+    :param profiler: Profiler, see Profiler.settings
+    """
+    precision.set_precision(name)
+    instrument.activate(profiler)
+
+
+def run_in_worker(stage, arguments):
+    """Run a stage in a worker process
+
+    :return: tuple of the stage outputs and the spans recorded by it
+    """
+    recorded = len(instrument.active.spans)
+    outputs = stage.run(arguments)
+    return outputs, instrument.active.spans[recorded:]
+
+
+class Pipeline(object):
+    def __init__(self, version="", cachedir=None):
+        """A DAG of stages, connected by the names of their inputs and
+        outputs
+
+        :param version: code version string, part of every stage key
+        :param cachedir: directory keeping the outputs of stages; stages
+                         whose files, parameters and upstream stages are
+                         unchanged are then skipped, default=no skipping
+        """
+        self.version = version
+        self.cachedir = cachedir
+        self.stages = []
+        if cachedir is not None:
+            makedirs(cachedir, exist_ok=True)
+
+    def add(self, stage):
+        if any(s.name == stage.name for s in self.stages):
+            raise ValueError("Stage '{}' already in pipeline".format(stage.name))
+        self.stages.append(stage)
+        return stage
+
+    def producers(self):
+        producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError("Value '{}' output by both '{}' and '{}'".format(
+                        output, producers[output].name, stage.name))
+                producers[output] = stage
+        for stage in self.stages:
+            for name in stage.inputs.values():
+                if name not in producers:
+                    raise ValueError("Stage '{}' needs '{}', output by no stage".format(stage.name, name))
+        return producers
+
+    def order(self):
+        """Stages in topological order
+
+        :return: list of Stages, each after the stages it depends on
+        """
+        producers = self.producers()
+        order = []
+        state = {}
+
+        def visit(stage):
+            if state.get(stage.name) == "done":
+                return
+            if state.get(stage.name) == "visiting":
+                raise ValueError("Pipeline has a cycle through stage '{}'".format(stage.name))
+            state[stage.name] = "visiting"
+            for name in stage.inputs.values():
+                visit(producers[name])
+            state[stage.name] = "done"
+            order.append(stage)
+
+        for stage in self.stages:
+            visit(stage)
+        return order
+
+    def entry(self, key):
+        return path.join(self.cachedir, "{}.pyo".format(key))
+
+    def plan(self):
+        """Decide which stages to run and which outputs to load from the
+        cache; cached stages are loaded only if a running stage needs them
+
+        :return: tuple of topological order, dict of stage keys, set of
+                 stage names to run and set of stage names to load
+        """
+        producers = self.producers()
+        order = self.order()
+        keys = {}
+        for stage in order:
+            keys[stage.name] = stage.key(self.version, [keys[producers[name].name] for name in stage.inputs.values()])
+        cached = set()
+        if self.cachedir is not None:
+            cached = set(s.name for s in order if s.cache and path.isfile(self.entry(keys[s.name])))
+        run = set()
+        load = set()
+
+        def require(stage, needed):
+            if stage.name in cached:
+                if needed:
+                    load.add(stage.name)
+                return
+            if stage.name in run:
+                return
+            run.add(stage.name)
+            for name in stage.inputs.values():
+                require(producers[name], True)
+
+        for stage in reversed(order):
+            require(stage, False)
+        return order, keys, run, load
+
+    def run(self, workers=1):
+        """Run the pipeline; independent stages run concurrently in a
+        process pool, inputs and outputs are passed to and from the
+        workers pickled
+
+        Workers are spawned, not forked, so that they inherit neither a
+        running PyMOL nor other threads of this process; the spans they
+        record are merged into the active profiler.
+
+        :param workers: number of worker processes
+        :return: dict of all values output by run or loaded stages
+        """
+        order, keys, run, load = self.plan()
+        values = {}
+        for stage in order:
+            if stage.name in load:
+                print("Skipping stage {}, inputs unchanged".format(stage.name))
+                values.update(load_pyobject(self.entry(keys[stage.name])))
+            elif stage.name not in run:
+                print("Skipping stage {}, not needed".format(stage.name))
+
+        def finish(stage, outputs):
+            values.update(outputs)
+            if self.cachedir is not None and stage.cache:
+                dump_pyobject_atomic(outputs, self.entry(keys[stage.name]))
+
+        pending = [stage for stage in order if stage.name in run]
+        futures = {}
+        # Workers follow the precision policy and profiling of this process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=initialize_worker,
+                                 initargs=(precision.precision, instrument.active.settings())) as executor:
+            while pending or futures:
+                ready = [stage for stage in pending if all(name in values for name in stage.inputs.values())]
+                for stage in ready:
+                    pending.remove(stage)
+                    if not stage.serial:
+                        futures[executor.submit(run_in_worker, stage, stage.arguments(values))] = stage
+                # Serial stages run here, while the pool keeps working
+                for stage in ready:
+                    if stage.serial:
+                        finish(stage, stage.run(stage.arguments(values)))
+                if futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = futures.pop(future)
+                        outputs, spans = future.result()
+                        instrument.active.merge(spans)
+                        finish(stage, outputs)
+        return values
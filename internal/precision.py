@@ -0,0 +1,62 @@
+from numpy import float32, float64, int32
+'''
+ Numeric precision policy of the matrix pipeline
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# dtypes of (strengths, correlations and ciACGs; edge counts) per policy;
+# "double" keeps the float64 tables the scripts have always produced
+PRECISIONS = {"double": (float64, float64),
+              "single": (float32, int32)}
+
+precision = "double"
+
+
+def set_precision(name):
+    """Set the precision policy used from parsing to serialization
+
+    :param name: "double" or "single"; single keeps strengths,
+                 correlations and ciACGs as float32 and edge counts as
+                 int32
+    """
+    global precision
+    if name not in PRECISIONS:
+        raise ValueError("Unknown precision '{}', use {}".format(name, " or ".join(PRECISIONS)))
+    precision = name
+
+
+def value_dtype():
+    """dtype of strengths, correlations, ciACGs and frequencies"""
+    return PRECISIONS[precision][0]
+
+
+def count_dtype():
+    """dtype of edge counts"""
+    return PRECISIONS[precision][1]
+
+
+def accumulator_dtype():
+    """dtype of sums and normalizations, wide regardless of policy"""
+    return float64
+
+
+def add_precision_argument(parser):
+    """Add the -dtype option to an ArgumentParser
+
+    :param parser: argparse.ArgumentParser of a script
+    """
+    parser.add_argument(
+        "-dtype", nargs=1, default=["double"], choices=sorted(PRECISIONS), metavar="double|single",
+        help="Precision of matrices; single keeps values as float32 and counts as int32, default=double")
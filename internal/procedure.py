@@ -1,9 +1,25 @@
-from pymol import cmd
+from os import path
 from collections import Counter
+from sys import modules
+from time import monotonic, sleep
 from pandas import DataFrame
-from ..interface.pymol import bond_colors_from_array, bond_connections_from_array, select_clusters, color_selections, show_cluster
-from ..interface.wordom import read_pathway_edge_frequencies
+from ..interface.follow import FramesFollower
+from ..interface.files import dump_pyobject_atomic, file_fingerprint, load_pyobject
+from ..interface.pymol import bond_colors_from_array, color_by_values, bond_connections_from_array, load_structure, select_clusters, color_selections, show_cluster
+from ..interface.wordom import count_endpoint_edges, count_pathway_edges, edge_counts_to_dataframe, read_avg_normfactors, read_avg_residuemap, read_avg_strength, read_correlations, read_pathway_edge_counts_blocks, read_pathway_edge_frequencies, read_pathway_frames
+from .centrality import eigenvector_centrality, format_centrality, pathway_betweenness, weighted_degree
+from .dccm import dccm_from_file
+from .instrument import span
+from .pathstats import frequencies_per_pair, frequencies_per_path_frame
+from .perturbation import node_impacts, perturbation_scan
+from .psn import psn_from_pdb
 from .matrix import matrix_to_colorarray
+from .precision import accumulator_dtype, count_dtype, value_dtype
+from .registry import ResidueRegistry
+from .stack import ciacg_stack, correlation_stack, format_windows, stack_statistics, stack_top_edges
+from numpy import multiply
+from ..interface import pdb, wordom
+from . import dccm, matrix, precision, psn, registry
 
 '''
  Internal procedures
@@ -23,6 +39,142 @@ from .matrix import matrix_to_colorarray
 '''
 
 
+# Modules whose source determines computed ciACG tables, for cache keys
+COMPUTE_MODULES = [pdb, wordom, dccm, matrix, precision, psn, registry, modules[__name__]]
+
+
+def parse_avg(avg):
+    """Parse residue map and interaction strengths of a WORDOM avgpsn file
+
+    :param avg: filename of WORDOM avgpsn output
+    :return: tuple of OrderedDict of residue names to serials and dict
+             of interaction strengths, as from read_avg_strength
+    """
+    with span("parse avg", bytes = path.getsize(avg)) as record:
+        with open(avg, 'r') as infile:
+            residuemap = read_avg_residuemap(infile)
+            infile.seek(0)
+            interactions, frequencies = read_avg_strength(infile)
+        record["edges"] = sum(len(inter) for inter in interactions.values()) // 2
+    return residuemap, interactions
+
+
+def parse_cor(cor):
+    """Parse a WORDOM cross-correlation file
+
+    :param cor: filename of WORDOM cross-correlation output
+    :return: Pandas dataframe of correlations, indexed by WORDOM serials
+    """
+    with span("parse cor", bytes = path.getsize(cor)) as record:
+        with open(cor, 'r') as infile:
+            correlations = read_correlations(infile)
+        record["edges"] = correlations.size
+    return correlations
+
+
+def ciacg_from_tables(residuemap, interactions, correlations):
+    """Compute the ciACG from parsed interaction strengths and correlations
+
+    :param residuemap: OrderedDict of residue names to serials
+    :param interactions: dict of interaction strengths, as from
+                         read_avg_strength
+    :param correlations: Pandas dataframe of correlations, as from
+                         read_correlations
+    :return: ciACG as Pandas dataframe, indexed by WORDOM serials in
+             sequence order
+    """
+    registry = ResidueRegistry.from_residuemap(residuemap)
+    strength = registry.matrix_from_interactions(interactions)
+    correlation = registry.matrix_from_table(correlations)
+    with span("multiply", edges = strength.size):
+        return registry.table_from_matrix(multiply(strength, correlation, out = strength))
+
+
+def ciacg_windows(residuemap, interactions, cors, outfile = None, cutoff = 0.0, top = 0):
+    """Compute the ciACGs of trajectory windows as one stack, and print
+    statistics and top edges of every window
+
+    :param residuemap: OrderedDict of residue names to serials
+    :param interactions: dict of interaction strengths, as from
+                         read_avg_strength
+    :param cors: list of WORDOM cross-correlation files, one per window
+    :param outfile: if given, a .npy file to memory map the stack to
+    :param cutoff: absolute ciACG value for an edge to be counted
+    :param top: number of top edges to print per window
+    :return: numpy array or memmap of shape (windows, N, N)
+    """
+    registry = ResidueRegistry.from_residuemap(residuemap)
+    strength = registry.matrix_from_interactions(interactions)
+    with span("parse windows", bytes = sum(path.getsize(cor) for cor in cors)):
+        stack = correlation_stack(cors, registry, outfile)
+    with span("multiply windows", edges = stack.size):
+        ciacg_stack(strength, stack, out = stack)
+    with span("window statistics", edges = stack.size):
+        print("\n".join(format_windows(stack_statistics(stack, cutoff), stack_top_edges(stack, top), registry.labels)))
+    return stack
+
+
+def ciacg_from_files(avg, cor):
+    """Compute the ciACG from WORDOM avgpsn and cross-correlation files
+
+    :param avg: filename of WORDOM avgpsn output
+    :param cor: filename of WORDOM cross-correlation output
+    :return: tuple of ciACG as Pandas dataframe, indexed by WORDOM
+             serials in sequence order, and OrderedDict of residue
+             names to serials
+    """
+    residuemap, interactions = parse_avg(avg)
+    return ciacg_from_tables(residuemap, interactions, parse_cor(cor)), residuemap
+
+
+def parse_trajectory(trajectory, residuemap, chunk = 256, buffer = None):
+    """Compute the cross-correlation of a trajectory in-process, instead
+    of reading it from WORDOM output
+
+    :param trajectory: multi-model PDB file, or .npy array of residue
+                       positions of shape (frames, N, 3) in sequence order
+    :param residuemap: OrderedDict of residue names to serials
+    :param chunk: number of frames per covariance update
+    :param buffer: optional filename of a memory mapped chunk buffer, for
+                   PDB trajectories
+    :return: Pandas dataframe of correlations, as from read_correlations
+    """
+    with span("dccm", bytes = path.getsize(trajectory)) as record:
+        correlations, labels = dccm_from_file(trajectory, chunk, buffer)
+        record["edges"] = correlations.size
+    if len(correlations) != len(residuemap):
+        raise ValueError("{} has {} residues, the residue map {}".format(trajectory, len(correlations), len(residuemap)))
+    if labels is not None and labels != list(residuemap.keys()):
+        print("Warning: residue names of {} differ from the residue map, matching by sequence order".format(trajectory))
+    return correlations
+
+
+def parse_structures(avg, structures, cutoff = 4.5, imin = 0.0, neighbours = 1, workers = 1):
+    """Compute interaction strengths from the side chain contacts of
+    structures, instead of reading them from WORDOM output
+
+    :param avg: filename of WORDOM avgpsn output, for the residue map
+                and normalization factors of its Seq section
+    :param structures: multi-model PDB file
+    :param cutoff: atom distance cutoff
+    :param imin: interaction strength for an interaction to be present
+    :param neighbours: leave out pairs in a chain at most this far apart
+                       in sequence
+    :param workers: number of worker processes
+    :return: tuple of OrderedDict of residue names to serials and dict
+             of interaction strengths, as from read_avg_strength
+    """
+    with open(avg, 'r') as infile:
+        residuemap = read_avg_residuemap(infile)
+        infile.seek(0)
+        normfactors = read_avg_normfactors(infile)
+    with span("psn", bytes = path.getsize(structures)) as record:
+        interactions, frequencies = psn_from_pdb(structures, residuemap, normfactors, cutoff = cutoff, imin = imin,
+                                                 neighbours = neighbours, workers = workers)
+        record["edges"] = sum(len(inter) for inter in interactions.values()) // 2
+    return residuemap, interactions
+
+
 def draw_ciacg(cigraph, residuemap, pdb, cutoffs):
     """draw Correlated Interaction Allosteric Communication Graph (ciACG) in PyMOL
 
@@ -32,30 +184,109 @@ def draw_ciacg(cigraph, residuemap, pdb, cutoffs):
     :param cutoffs: list of floats with allosteric connection strength cutoffs
     :return: list of lists with residue nodes on different cutoff levels
     """
-    cmd.load(pdb)
-    cmd.hide("everything")
-    cmd.show("ribbon")
+    with span("draw") as record:
+        load_structure(pdb)
 
-    # Create bindings and selections, and color them
-    levels = []
-    for cutoff in cutoffs:
-        residues = bond_connections_from_array(cigraph, residuemap, cutoff=cutoff)
-        levels.append(residues)
-    selections = select_clusters(levels)
-    colors = color_selections(selections)
+        # Create bindings and selections, and color them
+        levels = []
+        for cutoff in cutoffs:
+            residues = bond_connections_from_array(cigraph, residuemap, cutoff=cutoff)
+            levels.append(residues)
+        selections = select_clusters(levels)
+        colors = color_selections(selections)
 
-    # Show clusters
-    show_cluster(levels)
+        # Show clusters
+        show_cluster(levels)
+        record["edges"] = sum(len(residues) for residues in levels) // 2
     
     return levels
 
 
 def highlight_pathways(pathways, residuemap, cutoff = 0.0):
-    rgb_matrix = matrix_to_colorarray(pathways)
-    colored, colors = bond_colors_from_array(rgb_matrix, residuemap, cutoff = cutoff)
+    with span("color", edges = pathways.size) as record:
+        rgb_matrix = matrix_to_colorarray(pathways)
+        colored, colors = bond_colors_from_array(rgb_matrix, residuemap, cutoff = cutoff)
+    return rgb_matrix, colored, colors
+
+
+def refresh_pathway_colors(pathways, residuemap, previous = None, colorprefix = "path_"):
+    """Recolor the bonds whose pathway frequency color has changed
+
+    :param pathways: numpy array of pathway frequencies, in residue map
+                     order
+    :param residuemap: OrderedDict of residue names to serials
+    :param previous: color array of the previous coloring, if None all
+                     bonds are colored
+    :param colorprefix: prefix of the PyMOL color names; use a new one
+                        per refresh to leave earlier colors untouched
+    :return: tuple of color array, colored residue pairs and colors
+    """
+    with span("color", edges = pathways.size) as record:
+        rgb_matrix = matrix_to_colorarray(pathways)
+        mask = None if previous is None else (rgb_matrix != previous).any(axis = 0)
+        colored, colors = bond_colors_from_array(rgb_matrix, residuemap, colorprefix = colorprefix, mask = mask)
     return rgb_matrix, colored, colors
 
 
+def residue_centrality(cigraph, counts = None, endpoints = None, scan = None, workers = 1):
+    """Centrality metrics of every residue
+
+    :param cigraph: ciACG, a symmetric numpy array in residue map order
+    :param counts: optional pathway edge counts, a numpy array in residue
+                   map order, to also compute betweenness
+    :param endpoints: number of pathways every residue is an endpoint
+                      of, see internal.centrality.endpoint_counts
+    :param scan: if not None, a PerturbationScan of the ciACG, from
+                 scan_ciacg, adding the impact of removing every residue
+    :param workers: number of worker processes of the scan
+    :return: list of tuples (name, numpy array of residue values)
+    """
+    with span("centrality", edges = cigraph.size):
+        metrics = [("degree", weighted_degree(cigraph)),
+                   ("eigenvector", eigenvector_centrality(cigraph))]
+        if counts is not None:
+            metrics.append(("betweenness", pathway_betweenness(counts, endpoints)))
+    if scan is not None:
+        with span("node impacts", edges = cigraph.size):
+            metrics.append(("impact", node_impacts(scan, workers = workers)))
+    return metrics
+
+
+def scan_ciacg(cigraph, cutoff = 0.0, workers = 1):
+    """Shortest paths of the ciACG, shared by the node and edge impacts
+    of a perturbation scan, see internal.perturbation
+
+    :param cigraph: ciACG, a symmetric numpy array in residue map order
+    :param cutoff: edges with absolute weight above cutoff are kept
+    :param workers: number of worker processes
+    :return: PerturbationScan
+    """
+    with span("perturbation scan", edges = cigraph.size):
+        return perturbation_scan(cigraph, cutoff = cutoff, workers = workers)
+
+
+def show_centrality(metrics, residuemap, name, palette = "blue_white_red", ctr = None, top = 0):
+    """Color residues by a centrality, and list the residues ranked by it
+
+    :param metrics: list of tuples (name, numpy array), as from
+                    residue_centrality
+    :param residuemap: OrderedDict of residue names to serials
+    :param name: metric to color and rank by, None to only write ctr
+    :param palette: PyMOL spectrum palette
+    :param ctr: if not None, filename to write all metrics to
+    :param top: number of top residues to print
+    """
+    residues = list(residuemap.keys())
+    if name is not None:
+        metrics = sorted(metrics, key = lambda metric: metric[0] != name)
+        color_by_values(metrics[0][1], residues, palette = palette)
+        if top > 0:
+            print("\n".join(format_centrality(residues, metrics, top)))
+    if ctr is not None:
+        with open(ctr, 'w') as outfile:
+            outfile.write("\n".join(format_centrality(residues, metrics)) + "\n")
+
+
 def normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames, pathways):
     # Normalize counts w.r.t. frames analyzed and pathways found
     # NOTE; currently counting all processed frames, while only
@@ -63,20 +294,175 @@ def normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames, pathway
     #       were found - not considering those for which none were
     unique_frames = len(frames)
     unique_pathways = len(pathways)
-    frequencies = counts.divide(unique_frames * unique_pathways)
+    frequencies = counts.astype(accumulator_dtype()).divide(unique_frames * unique_pathways).astype(value_dtype())
     return frequencies
 
-def process_framefiles(framefiles, residuemap):
+def normalize_pathway_counts(counts, frames, pathways, statistics = None, tensor = None, normalization = "frames"):
+    """Normalize edge counts in one of three ways
+
+    "frames" divides by all frames times all endpoint pairs found, see
+    normalize_pathway_counts_wrt_no_frames_and_endpoints. "path" divides
+    by the frame and endpoint pair combinations with a path, and "pair"
+    normalizes every endpoint pair by its frames with a path, averaging
+    over the pairs; both need the PathStatistics of the pass, and "pair"
+    the endpoint edge tensor.
+
+    :param counts: Pandas dataframe of raw edge counts
+    :param frames: Counter of frames processed
+    :param pathways: Counter of endpoint pairs processed
+    :param statistics: PathStatistics, for "path" and "pair"
+    :param tensor: dict of arrays, from internal.tensor.endpoint_edge_tensor,
+                   for "pair"
+    :param normalization: "frames", "path" or "pair"
+    :return: Pandas dataframe of edge frequencies
+    """
+    if normalization == "frames":
+        return normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, frames, pathways)
+    registry = statistics.registry
+    if normalization == "path":
+        matrix = frequencies_per_path_frame(registry.matrix_from_table(counts), statistics)
+    elif normalization == "pair":
+        matrix = frequencies_per_pair(tensor, statistics)
+    else:
+        raise ValueError("Unknown normalization '{}', use frames, path or pair".format(normalization))
+    return registry.table_from_matrix(matrix.astype(value_dtype()))
+
+
+def pathway_frequency_change(frequencies, previous, norm = "l1"):
+    """Relative change between two normalized edge frequency tables
+
+    :param frequencies: Pandas dataframe of current edge frequencies
+    :param previous: Pandas dataframe of edge frequencies at the
+                     previous checkpoint
+    :param norm: "l1" for the relative L1 distance, sum of absolute
+                 differences over the sum of current frequencies, or
+                 "linf" for the relative L-infinity distance, maximum
+                 absolute difference over the maximum frequency
+    :return: float, relative change; 0.0 if both tables are empty
+    """
+    difference = frequencies.subtract(previous, fill_value = 0.0).fillna(value = 0.0).abs().values
+    reference = frequencies.abs().values
+    if norm == "l1":
+        change = difference.sum(dtype = accumulator_dtype())
+        scale = reference.sum(dtype = accumulator_dtype())
+    elif norm == "linf":
+        change = difference.max() if difference.size > 0 else 0.0
+        scale = reference.max() if reference.size > 0 else 0.0
+    else:
+        raise ValueError("Unknown norm '{}', use 'l1' or 'linf'".format(norm))
+    if scale == 0.0:
+        return 0.0 if change == 0.0 else float("inf")
+    return float(change / scale)
+
+
+def process_framefiles_until_converged(framefiles, residuemap, check_every, tolerance = 1e-3, patience = 3, norm = "l1", endpoint_edges = None, statistics = None):
+    """Procedure to read edge counts in multiple .frames, stopping
+    when the normalized edge frequencies have converged
+
+    Every check_every frames the counts are normalized and compared
+    to the previous checkpoint with pathway_frequency_change. Reading
+    stops when the change has stayed below tolerance for patience
+    consecutive checkpoints.
+
+    :param framefiles: list of strings with filenames to WORDOM .frame
+                       files
+    :param residuemap: dict with residue names to integer mappings
+    :param check_every: number of frames between checkpoints
+    :param tolerance: relative change regarded as converged
+    :param patience: number of consecutive converged checkpoints
+                     needed to stop reading
+    :param norm: distance used, "l1" or "linf"
+    :param endpoint_edges: if not None, a dict in which to also count
+                           edges per endpoint pair
+    :param statistics: if not None, a PathStatistics to also count into
+    :return: Pandas dataframe of raw edge counts, 
+             Counter of unique files processed,
+             Counter of frames discovered and processed,
+             Counter of unique start and endpoints discovered & proc.
+    """
+    files_processed = Counter()
+    frames_processed = Counter()
+    pathways_processed = Counter()
+    counts = {}
+
+    numfiles = len(framefiles)
+    frames_read = 0
+    previous = None
+    converged = 0
+
+    for framefile in framefiles:
+        files_processed[framefile] += 1
+        print("({} of {}) Processing: {}".format(sum(files_processed.values()), numfiles, framefile))
+        current_frame = None
+        with open(framefile, 'r') as infile:
+            for frame, residues in read_pathway_frames(infile, residuemap):
+                if frame != current_frame:
+                    # Checkpoint before starting on a new frame
+                    if frames_read > 0 and frames_read % check_every == 0:
+                        frequencies = normalize_pathway_counts_wrt_no_frames_and_endpoints(edge_counts_to_dataframe(counts), frames_processed, pathways_processed)
+                        if previous is not None:
+                            change = pathway_frequency_change(frequencies, previous, norm = norm)
+                            converged = converged + 1 if change < tolerance else 0
+                            print("Checkpoint at {} frames: relative {} change {:.3e} ({} of {} below tolerance {})".format(frames_read, norm, change, converged, patience, tolerance))
+                        previous = frequencies
+                    if converged >= patience:
+                        break
+                    current_frame = frame
+                    frames_read += 1
+
+                # Count frame
+                frames_processed[frame] += 1
+                if statistics is not None:
+                    statistics.add(frame, residues)
+
+                if residues is not None:
+                    # Count endpoint tuples
+                    pathways_processed[(residues[0], residues[-1])] += 1
+
+                    # Count edges along pathway
+                    count_pathway_edges(residues, counts)
+                    if endpoint_edges is not None:
+                        count_endpoint_edges(residues, endpoint_edges)
+        if statistics is not None:
+            # Frame numbers restart in every file
+            statistics.flush()
+        if converged >= patience:
+            break
+
+    if converged >= patience:
+        print("Converged after {} frames from {} of {} files".format(frames_read, len(files_processed), numfiles))
+    else:
+        print("Not converged after {} frames from {} files".format(frames_read, len(files_processed)))
+
+    return edge_counts_to_dataframe(counts), files_processed, frames_processed, pathways_processed
+
+
+def process_framefiles(framefiles, residuemap, check_every = None, tolerance = 1e-3, patience = 3, norm = "l1", endpoint_edges = None, statistics = None):
     """Procedure to read and normalize edge counts in multiple .frames
 
     :param framefiles: list of strings with filenames to WORDOM .frame
                        files
     :param residuemap: dict with residue names to integer mappings
+    :param check_every: if not None, monitor convergence every
+                        check_every frames and stop reading early, see
+                        process_framefiles_until_converged
+    :param tolerance: relative change regarded as converged
+    :param patience: number of consecutive converged checkpoints
+    :param norm: convergence distance, "l1" or "linf"
+    :param endpoint_edges: if not None, a dict in which to also count
+                           edges per endpoint pair, see
+                           internal.tensor.endpoint_edge_tensor
+    :param statistics: if not None, a PathStatistics in which to also
+                       collect path lengths, endpoint pair and residue
+                       visit counts, see internal.pathstats
     :return: Pandas dataframe of normalized edge counts, 
              Counter of unique files processed,
              Counter of frames discovered and processed,
              Counter of unique start and endpoints discovered & proc.
     """
+    if check_every is not None:
+        return process_framefiles_until_converged(framefiles, residuemap, check_every, tolerance = tolerance, patience = patience, norm = norm, endpoint_edges = endpoint_edges, statistics = statistics)
+
     files_processed = Counter()
     frames_processed = Counter()
     pathways_processed = Counter()
@@ -87,14 +473,147 @@ def process_framefiles(framefiles, residuemap):
     for frame in framefiles:
         files_processed[frame] += 1
         print("({} of {}) Processing: {}".format(sum(files_processed.values()), numfiles, frame))
-        with open(frame, 'r') as infile:
-            new_frequencies, new_frames, new_pathways = read_pathway_edge_frequencies(infile, residuemap)
-            frequencies = frequencies.add(new_frequencies, fill_value = 0.0)
-            frames_processed += new_frames
-            pathways_processed += new_pathways
+        if endpoint_edges is None and statistics is None:
+            # Nothing to collect per line; read binary blocks
+            with open(frame, 'rb') as infile:
+                new_frequencies, new_frames, new_pathways = read_pathway_edge_counts_blocks(infile, residuemap)
+        else:
+            with open(frame, 'r') as infile:
+                new_frequencies, new_frames, new_pathways = read_pathway_edge_frequencies(infile, residuemap, endpoint_edges = endpoint_edges, statistics = statistics)
+            if statistics is not None:
+                # Frame numbers restart in every file
+                statistics.flush()
+        frequencies = frequencies.add(new_frequencies, fill_value = 0.0)
+        frames_processed += new_frames
+        pathways_processed += new_pathways
 
-    frequencies = frequencies.fillna(value = 0.0)
+    frequencies = frequencies.fillna(value = 0.0).astype(count_dtype())
 
     return frequencies, files_processed, frames_processed, pathways_processed
 
 
+def count_pathway_lines(lines, residuemap, counts, frames_processed, pathways_processed):
+    """Count the pathways of .frames lines into accumulators
+
+    :param lines: iterable of .frames lines
+    :param residuemap: dict with residue names to integer mappings
+    :param counts: dict of Counters of edge counts, modified in place
+    :param frames_processed: Counter of frames, modified in place
+    :param pathways_processed: Counter of endpoints, modified in place
+    """
+    for frame, residues in read_pathway_frames(lines, residuemap):
+        frames_processed[frame] += 1
+        if residues is not None:
+            pathways_processed[(residues[0], residues[-1])] += 1
+            count_pathway_edges(residues, counts)
+
+
+def follow_framefiles(sources, residuemap, refresh, interval = 10.0, poll = 1.0, timeout = None):
+    """Procedure to count edges in .frames files while WORDOM writes them
+
+    Only complete lines appended since the previous poll are read, and
+    counted one bounded block at a time, see
+    interface.follow.FramesFollower. Following stops when no new lines
+    have appeared for timeout seconds, or on keyboard interrupt.
+
+    :param sources: list of .frames filenames and directories of them
+    :param residuemap: dict with residue names to integer mappings
+    :param refresh: callable taking the edge counts dataframe, frames
+                    and endpoints Counters, called when new lines have
+                    been read, at most every interval seconds
+    :param interval: minimum number of seconds between refreshes
+    :param poll: number of seconds between polls
+    :param timeout: seconds without new lines before stopping, if None
+                    follow until interrupted
+    :return: Pandas dataframe of raw edge counts, 
+             Counter of unique files processed,
+             Counter of frames discovered and processed,
+             Counter of unique start and endpoints discovered & proc.
+    """
+    follower = FramesFollower(sources)
+    files_processed = Counter()
+    frames_processed = Counter()
+    pathways_processed = Counter()
+    counts = {}
+
+    pending = False
+    last_refresh = last_lines = monotonic()
+    try:
+        while True:
+            for framefile, lines in follower.poll():
+                if framefile not in files_processed:
+                    files_processed[framefile] += 1
+                    print("({}) Following: {}".format(len(files_processed), framefile))
+                count_pathway_lines(lines, residuemap, counts, frames_processed, pathways_processed)
+                pending = True
+                last_lines = monotonic()
+            now = monotonic()
+            if pending and now - last_refresh >= interval:
+                print("{} pathways found in {} frames from {} files".format(len(pathways_processed), len(frames_processed), len(files_processed)))
+                refresh(edge_counts_to_dataframe(counts), frames_processed, pathways_processed)
+                pending = False
+                last_refresh = now
+            if timeout is not None and now - last_lines >= timeout:
+                print("No new lines in {} s, stopped following".format(timeout))
+                break
+            sleep(poll)
+    except KeyboardInterrupt:
+        print("Interrupted, stopped following")
+
+    counts = edge_counts_to_dataframe(counts)
+    if pending:
+        refresh(counts, frames_processed, pathways_processed)
+
+    return counts, files_processed, frames_processed, pathways_processed
+
+
+def process_framefiles_incremental(framefiles, residuemap, checkpoint):
+    """Procedure to read edge counts in multiple .frames, merging them
+    into the results kept in a checkpoint file
+
+    Files are identified by a fingerprint of their content, and those
+    already in the checkpoint are skipped. The checkpoint is written
+    atomically after each completed file, so that an interrupted run
+    resumes from the last completed file.
+
+    :param framefiles: list of strings with filenames to WORDOM .frame
+                       files
+    :param residuemap: dict with residue names to integer mappings
+    :param checkpoint: filename of checkpoint, created if not present
+    :return: Pandas dataframe of raw edge counts, 
+             Counter of unique files processed,
+             Counter of frames discovered and processed,
+             Counter of unique start and endpoints discovered & proc.
+    """
+    residues = list(residuemap.items())
+    if path.isfile(checkpoint):
+        state = load_pyobject(checkpoint)
+        if state["residues"] != residues:
+            raise ValueError("Checkpoint {} was made with another residue map".format(checkpoint))
+        print("Resuming from {}, {} files already processed".format(checkpoint, len(state["fingerprints"])))
+    else:
+        state = {"residues": residues,
+                 "counts": DataFrame(),
+                 "files_processed": Counter(),
+                 "frames_processed": Counter(),
+                 "pathways_processed": Counter(),
+                 "fingerprints": {}}
+
+    numfiles = len(framefiles)
+
+    for number, framefile in enumerate(framefiles, 1):
+        fingerprint = file_fingerprint(framefile)
+        if fingerprint in state["fingerprints"]:
+            print("({} of {}) Skipping: {}, already processed as {}".format(number, numfiles, framefile, state["fingerprints"][fingerprint]))
+            continue
+        print("({} of {}) Processing: {}".format(number, numfiles, framefile))
+        with open(framefile, 'rb') as infile:
+            new_counts, new_frames, new_pathways = read_pathway_edge_counts_blocks(infile, residuemap)
+        state["counts"] = state["counts"].add(new_counts, fill_value = 0.0).fillna(value = 0.0).astype(count_dtype())
+        state["files_processed"][framefile] += 1
+        state["frames_processed"] += new_frames
+        state["pathways_processed"] += new_pathways
+        state["fingerprints"][fingerprint] = framefile
+        dump_pyobject_atomic(state, checkpoint)
+
+    return state["counts"], state["files_processed"], state["frames_processed"], state["pathways_processed"]
@@ -0,0 +1,281 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from numpy import (abs as absolute, arange, argsort, array, bincount,
+                   concatenate, cumsum, empty, float64, floor, int64, intp,
+                   maximum, minimum, repeat, searchsorted, sqrt, unique,
+                   zeros)
+from ..interface.pdb import is_side_chain_heavy_atom, read_pdb_models, residue_label
+from .registry import ResidueRegistry
+'''
+ Protein structure network (PSN) interaction strengths computed from
+ structures, as by WORDOM PSN
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Cell offsets of a half shell; with the own cell every neighbouring cell
+# pair is visited once
+HALF_SHELL = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+              if (dx, dy, dz) > (0, 0, 0)]
+
+
+def cell_pair_atoms(starts_a, counts_a, starts_b, counts_b, same):
+    """Positions of all atom pairs between pairs of cells, in the cell
+    sorted atom order
+
+    :param starts_a: first position of each first cell
+    :param counts_a: number of atoms of each first cell
+    :param starts_b: first position of each second cell
+    :param counts_b: number of atoms of each second cell
+    :param same: if True the cells are the same, keep pairs a < b only
+    :return: tuple of numpy arrays (a, b)
+    """
+    pairs = counts_a * counts_b
+    cell = repeat(arange(pairs.size), pairs)
+    local = arange(cell.size) - repeat(cumsum(pairs) - pairs, pairs)
+    a = starts_a[cell] + local // counts_b[cell]
+    b = starts_b[cell] + local % counts_b[cell]
+    if same:
+        keep = a < b
+        return a[keep], b[keep]
+    return a, b
+
+
+def contact_pairs(coordinates, cutoff):
+    """Atom pairs within a distance cutoff, found on a grid of cells with
+    the side of the cutoff, comparing atoms of neighbouring cells only
+
+    :param coordinates: numpy array of shape (atoms, 3)
+    :param cutoff: distance cutoff
+    :return: tuple of numpy arrays (i, j) of atom indices, i != j
+    """
+    if coordinates.shape[0] == 0:
+        return empty(0, dtype=intp), empty(0, dtype=intp)
+    cells = floor(coordinates / cutoff).astype(int64)
+    cells -= cells.min(axis=0) - 1
+    shape = cells.max(axis=0) + 2
+    keys = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+    order = argsort(keys, kind="stable")
+    keys = keys[order]
+    occupied, starts, counts = unique(keys, return_index=True, return_counts=True)
+
+    i = []
+    j = []
+    a, b = cell_pair_atoms(starts, counts, starts, counts, True)
+    i.append(a)
+    j.append(b)
+    for dx, dy, dz in HALF_SHELL:
+        neighbours = occupied + (dx * shape[1] + dy) * shape[2] + dz
+        found = searchsorted(occupied, neighbours)
+        found[found == occupied.size] = 0
+        match = occupied[found] == neighbours
+        a, b = cell_pair_atoms(starts[match], counts[match], starts[found[match]], counts[found[match]], False)
+        i.append(a)
+        j.append(b)
+    i = order[concatenate(i)]
+    j = order[concatenate(j)]
+    difference = coordinates[i] - coordinates[j]
+    within = (difference * difference).sum(axis=1) <= cutoff * cutoff
+    return i[within], j[within]
+
+
+def frame_interaction_strength(coordinates, atom_residues, normfactors, cutoff, excluded):
+    """Interaction strengths of residue pairs in one frame;
+    I_ij = 100 n_ij / sqrt(N_i N_j), with n_ij the number of atom pairs
+    of residues i and j within the cutoff and N the normalization factors
+
+    :param coordinates: numpy array of shape (atoms, 3)
+    :param atom_residues: numpy array of residue index of every atom
+    :param normfactors: numpy array of residue normalization factors
+    :param cutoff: distance cutoff
+    :param excluded: function of residue index arrays (a, b) returning a
+                     boolean array of pairs not to count
+    :return: tuple of numpy arrays (flat pair index a * N + b, with
+             a < b, and strength)
+    """
+    size = normfactors.size
+    i, j = contact_pairs(coordinates, cutoff)
+    a = atom_residues[i]
+    b = atom_residues[j]
+    a, b = minimum(a, b), maximum(a, b)
+    keep = (a != b) & ~excluded(a, b)
+    pairs, n = unique(a[keep] * size + b[keep], return_counts=True)
+    a = pairs // size
+    b = pairs % size
+    return pairs, 100.0 * n / sqrt(normfactors[a] * normfactors[b])
+
+
+class SequenceNeighbours(object):
+    def __init__(self, chains, resis, neighbours):
+        """Exclusion of residue pairs close in sequence; picklable, to
+        send to worker processes
+
+        :param chains: numpy array of residue chains
+        :param resis: numpy array of residue numbers
+        :param neighbours: exclude pairs in a chain at most this far apart
+                           in sequence; 0 excludes nothing
+        """
+        self.chains = chains
+        self.resis = resis
+        self.neighbours = neighbours
+
+    def __call__(self, a, b):
+        return (self.chains[a] == self.chains[b]) & (absolute(self.resis[a] - self.resis[b]) <= self.neighbours)
+
+
+def accumulate_frames(frames, atom_residues, normfactors, cutoff, imin, excluded):
+    """Sums of interaction strengths and counts of frames with each
+    interaction, over a chunk of frames
+
+    The interactions of all frames are gathered and reduced once per
+    chunk, over the pairs found only.
+
+    :param frames: list of numpy arrays of shape (atoms, 3)
+    :return: tuple of numpy arrays; flat pair indices, as from
+             frame_interaction_strength, strength sums and frame counts
+             of the interactions, I >= imin and I > 0
+    """
+    pairs = [empty(0, dtype=int64)]
+    values = [empty(0, dtype=float64)]
+    for coordinates in frames:
+        frame_pairs, frame_values = frame_interaction_strength(coordinates, atom_residues, normfactors, cutoff, excluded)
+        keep = frame_values >= imin
+        pairs.append(frame_pairs[keep])
+        values.append(frame_values[keep])
+    # Each pair occurs at most once per frame
+    found, inverse, present = unique(concatenate(pairs), return_inverse=True, return_counts=True)
+    strength = bincount(inverse, weights=concatenate(values), minlength=found.size)
+    return found, strength, present
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def psn_from_frames(frames, atom_residues, normfactors, cutoff=4.5, imin=0.0, excluded=None, chunk=64, workers=1):
+    """Averaged interaction strengths and frequencies over frames
+
+    Chunks of frames are processed in a pool of worker processes, and
+    their sums merged.
+
+    :param frames: iterable of numpy arrays of shape (atoms, 3)
+    :param atom_residues: numpy array of residue index of every atom
+    :param normfactors: numpy array of residue normalization factors
+    :param cutoff: atom distance cutoff
+    :param imin: interaction strength for an interaction to be present
+    :param excluded: exclusion of residue pairs, see SequenceNeighbours,
+                     default=exclude none
+    :param chunk: number of frames per task
+    :param workers: number of worker processes; 1 runs in this process
+    :return: tuple of numpy arrays of shape (N, N); strength averaged
+             over the frames with the interaction present, and the
+             fraction of frames with it present, both upper triangular
+    """
+    size = normfactors.size
+    if excluded is None:
+        excluded = SequenceNeighbours(zeros(size), zeros(size), -1)
+    strength = zeros(size * size, dtype=float64)
+    present = zeros(size * size, dtype=float64)
+    total = 0
+    arguments = (atom_residues, normfactors, cutoff, imin, excluded)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for frames_chunk in chunks(frames, chunk):
+                total += len(frames_chunk)
+                pending.append(executor.submit(accumulate_frames, frames_chunk, *arguments))
+                # Merge finished chunks, keeping few frames in flight
+                while len(pending) > 2 * workers or (pending and pending[0].done()):
+                    pairs, chunk_strength, chunk_present = pending.pop(0).result()
+                    strength[pairs] += chunk_strength
+                    present[pairs] += chunk_present
+            for future in pending:
+                pairs, chunk_strength, chunk_present = future.result()
+                strength[pairs] += chunk_strength
+                present[pairs] += chunk_present
+    else:
+        for frames_chunk in chunks(frames, chunk):
+            total += len(frames_chunk)
+            pairs, chunk_strength, chunk_present = accumulate_frames(frames_chunk, *arguments)
+            strength[pairs] += chunk_strength
+            present[pairs] += chunk_present
+    average = strength / present.clip(min=1.0)
+    frequency = present / max(total, 1)
+    return average.reshape(size, size), frequency.reshape(size, size)
+
+
+def interactions_from_matrices(strength, frequency, residuemap):
+    """Symmetric dicts of interaction strengths and frequencies, as from
+    read_avg_strength
+
+    :param strength: numpy array of averaged strengths, upper triangular
+    :param frequency: numpy array of fractions of frames, upper triangular
+    :param residuemap: OrderedDict of residue names to serials
+    :return: tuple of dicts (interactions, frequencies)
+    """
+    residues = list(residuemap.keys())
+    interactions = {}
+    frequencies = {}
+    for a, b in zip(*frequency.nonzero()):
+        resa = residues[a]
+        resb = residues[b]
+        interactions.setdefault(resa, {})
+        interactions.setdefault(resb, {})
+        frequencies.setdefault(resa, {})
+        frequencies.setdefault(resb, {})
+        interactions[resa][resb] = interactions[resb][resa] = float(strength[a, b])
+        frequencies[resa][resb] = frequencies[resb][resa] = float(frequency[a, b])
+    return interactions, frequencies
+
+
+def psn_from_pdb(filename, residuemap, normfactors, cutoff=4.5, imin=0.0, neighbours=1, chunk=64, workers=1):
+    """Interaction strengths and frequencies of the side chain contacts in
+    a multi-model PDB file
+
+    :param filename: PDB file
+    :param residuemap: OrderedDict of residue names to serials; atoms of
+                       other residues are left out
+    :param normfactors: dict of residue names to normalization factors,
+                        as from read_avg_normfactors
+    :param cutoff: atom distance cutoff
+    :param imin: interaction strength for an interaction to be present
+    :param neighbours: leave out pairs in a chain at most this far apart
+                       in sequence
+    :param chunk: number of frames per task
+    :param workers: number of worker processes
+    :return: tuple of dicts (interactions, frequencies), as from
+             read_avg_strength
+    """
+    registry = ResidueRegistry.from_residuemap(residuemap)
+    factors = array([normfactors[label] for label in registry.labels], dtype=float64)
+    with open(filename, 'r') as infile:
+        models = read_pdb_models(infile, select=is_side_chain_heavy_atom)
+        atoms, first = next(models)
+        labels = [residue_label(chain, resn, resi) for chain, resn, resi, name in atoms]
+        atom_residues = registry.ids_from_labels(labels)
+        known = atom_residues >= 0
+
+        def frames():
+            yield first[known]
+            for _, coordinates in models:
+                yield coordinates[known]
+
+        excluded = SequenceNeighbours(registry.chains, registry.resis, neighbours)
+        strength, frequency = psn_from_frames(frames(), atom_residues[known], factors, cutoff, imin,
+                                              excluded, chunk, workers)
+    return interactions_from_matrices(strength, frequency, residuemap)
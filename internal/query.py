@@ -0,0 +1,121 @@
+from numpy import (abs as absolute, arange, argpartition, argsort, asarray,
+                   concatenate, isin, load, ones)
+from ..interface.files import load_pyobject
+'''
+ Top-k edge and per-residue neighbourhood queries on ciACG, count and
+ frequency matrices
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def load_query_matrix(filename, registry):
+    """Load a matrix to query; .npy files are memory mapped and expected
+    in registry order, other files are unpickled tables (.frm)
+
+    :param filename: .npy or .frm file
+    :param registry: ResidueRegistry of the residues
+    :return: numpy array or memory map of shape (N, N)
+    """
+    if filename.endswith(".npy"):
+        return load(filename, mmap_mode='r')
+    return registry.matrix_from_table(load_pyobject(filename))
+
+
+def select_top(values, k, absolute_values=False):
+    """Positions of the k largest values, by partial sort
+
+    :param values: 1-D numpy array
+    :param k: number of values
+    :param absolute_values: if True, rank by absolute value
+    :return: numpy array of positions, in order of decreasing value
+    """
+    score = absolute(values) if absolute_values else values
+    k = min(k, score.size)
+    if k == 0:
+        return arange(0)
+    top = argpartition(-score, k - 1)[:k]
+    return top[argsort(-score[top], kind="stable")]
+
+
+def residue_filter(registry, chains=None):
+    """Boolean array of residues in the given chains, all if None"""
+    if chains is None:
+        return ones(len(registry), dtype=bool)
+    return isin(registry.chains, list(chains))
+
+
+def edge_filter(values, cutoff=None, absolute_values=False):
+    """Boolean array of values passing the cutoff, all if None"""
+    if cutoff is None:
+        return ones(values.shape, dtype=bool)
+    return (absolute(values) if absolute_values else values) > cutoff
+
+
+def top_edges(matrix, registry, k=50, cutoff=None, chains=None, absolute_values=False, chunk_rows=1024):
+    """The k strongest edges above the diagonal of a symmetric matrix
+
+    Rows are read a block at a time, keeping only the k best candidates
+    between blocks, so a memory mapped matrix is never loaded whole.
+
+    :param matrix: numpy array or memory map of shape (N, N)
+    :param registry: ResidueRegistry of the residues
+    :param k: number of edges
+    :param cutoff: only consider values above cutoff
+    :param chains: only consider edges touching these chains
+    :param absolute_values: rank by absolute value
+    :param chunk_rows: number of rows read at a time
+    :return: tuple of numpy arrays (i, j, value), i < j, strongest first
+    """
+    size = matrix.shape[0]
+    in_chains = residue_filter(registry, chains)
+    columns = arange(size)
+    best_i = best_j = best_values = arange(0)
+    for start in range(0, size, chunk_rows):
+        stop = min(size, start + chunk_rows)
+        block = asarray(matrix[start:stop])
+        rows = arange(start, stop)
+        keep = columns[None, :] > rows[:, None]
+        keep &= in_chains[None, :] | in_chains[rows][:, None]
+        keep &= edge_filter(block, cutoff, absolute_values)
+        i, j = keep.nonzero()
+        values = block[i, j]
+        top = select_top(values, k, absolute_values)
+        best_i = concatenate([best_i, i[top] + start])
+        best_j = concatenate([best_j, j[top]])
+        best_values = concatenate([best_values, values[top]])
+        top = select_top(best_values, k, absolute_values)
+        best_i, best_j, best_values = best_i[top], best_j[top], best_values[top]
+    return best_i, best_j, best_values
+
+
+def top_neighbours(matrix, registry, residue, k=10, cutoff=None, chains=None, absolute_values=False):
+    """The k strongest neighbours of a residue, reading only its row
+
+    :param matrix: numpy array or memory map of shape (N, N)
+    :param registry: ResidueRegistry of the residues
+    :param residue: residue name, on format C:AX
+    :param k: number of neighbours
+    :param cutoff: only consider values above cutoff
+    :param chains: only consider neighbours in these chains
+    :param absolute_values: rank by absolute value
+    :return: tuple of numpy arrays (j, value), strongest first
+    """
+    i = registry.ids[residue]
+    row = asarray(matrix[i])
+    keep = residue_filter(registry, chains) & edge_filter(row, cutoff, absolute_values)
+    keep[i] = False
+    j = keep.nonzero()[0]
+    top = select_top(row[j], k, absolute_values)
+    return j[top], row[j][top]
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from numpy import (arange, array, array_equal, asarray, full, int32, isnan,
+                   ix_)
+from pandas import DataFrame
+from .precision import value_dtype
+'''
+ Canonical registry of residues, with dense integer ids
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class ResidueRegistry(object):
+    def __init__(self, labels, serials):
+        """Residues in WORDOM Seq order, with dense ids 0..N-1. Chain,
+        residue letter, residue number and WORDOM serial are stored as
+        parallel numpy arrays indexed by id.
+
+        :param labels: residue names on format C:AX, with C & A char
+                       and X int, in WORDOM sequence order
+        :param serials: WORDOM serial integers of the residues
+        """
+        self.labels = list(labels)
+        self.chains = array([label.split(':')[0] for label in self.labels])
+        self.letters = array([label.split(':')[1][0] for label in self.labels])
+        self.resis = array([int(label.split(':')[1][1:]) for label in self.labels], dtype=int32)
+        self.serials = array(list(serials), dtype=int32)
+        self.ids = OrderedDict((label, i) for i, label in enumerate(self.labels))
+        # Dense lookup table from serial to id, -1 where unused
+        self.serial_ids = full(int(self.serials.max()) + 1 if len(self.serials) > 0 else 0, -1, dtype=int32)
+        self.serial_ids[self.serials] = arange(len(self.serials), dtype=int32)
+
+    @classmethod
+    def from_residuemap(cls, residuemap):
+        """Create a registry from a residue map
+
+        :param residuemap: OrderedDict mapping residue names to WORDOM
+                           serials, as from read_avg_residuemap
+        :return: ResidueRegistry
+        """
+        return cls(residuemap.keys(), residuemap.values())
+
+    def __len__(self):
+        return len(self.labels)
+
+    def residuemap(self):
+        """OrderedDict of residue names to WORDOM serials"""
+        return OrderedDict(zip(self.labels, self.serials.tolist()))
+
+    def ids_from_labels(self, labels):
+        """Dense ids of residue names, -1 for unknown residues"""
+        return array([self.ids.get(label, -1) for label in labels], dtype=int32)
+
+    def ids_from_serials(self, serials):
+        """Dense ids of WORDOM serials, -1 for unknown serials"""
+        serials = asarray(serials, dtype=int32)
+        known = (serials >= 0) & (serials < len(self.serial_ids))
+        ids = full(len(serials), -1, dtype=int32)
+        ids[known] = self.serial_ids.take(serials[known])
+        return ids
+
+    def ids_from_keys(self, keys, key="serial"):
+        """Dense ids of table keys, either WORDOM serials or names"""
+        if key == "serial":
+            return self.ids_from_serials(list(keys))
+        elif key == "label":
+            return self.ids_from_labels(keys)
+        raise ValueError("Unknown key '{}', use 'serial' or 'label'".format(key))
+
+    def matrix_from_table(self, table, key="serial", fill_value=0.0, dtype=None):
+        """Place a two-dimensional table on the registry ids
+
+        :param table: pandas DataFrame, indexed by serials or names
+        :param key: "serial" or "label", what the table is indexed by
+        :param fill_value: value of missing and NaN entries
+        :param dtype: numpy dtype of the matrix, default that of table
+        :return: numpy array of shape (N, N), row and column i holding
+                 the residue with id i; rows and columns of residues
+                 not in the registry are dropped
+        """
+        rows = self.ids_from_keys(table.index, key)
+        columns = self.ids_from_keys(table.columns, key)
+        values = table.values
+        if dtype is None:
+            dtype = values.dtype
+        complete = arange(len(self))
+        if array_equal(rows, complete) and array_equal(columns, complete):
+            # Already in registry order
+            matrix = values.astype(dtype, copy=True)
+        else:
+            keep_rows = rows >= 0
+            keep_columns = columns >= 0
+            matrix = full((len(self), len(self)), fill_value, dtype=dtype)
+            matrix[ix_(rows[keep_rows], columns[keep_columns])] = values[ix_(keep_rows, keep_columns)]
+        if matrix.dtype.kind == 'f':
+            matrix[isnan(matrix)] = fill_value
+        return matrix
+
+    def matrix_from_interactions(self, interactions, fill_value=0.0, dtype=None):
+        """Place a symmetric dict of dicts on the registry ids
+
+        :param interactions: dict of dicts keyed by residue names, as
+                             from read_avg_strength
+        :param fill_value: value of missing entries
+        :param dtype: numpy dtype of the matrix, default by the precision
+                      policy
+        :return: numpy array of shape (N, N)
+        """
+        if dtype is None:
+            dtype = value_dtype()
+        a = []
+        b = []
+        values = []
+        for resa, inter in interactions.items():
+            a.extend([resa] * len(inter))
+            b.extend(inter.keys())
+            values.extend(inter.values())
+        a = self.ids_from_labels(a)
+        b = self.ids_from_labels(b)
+        known = (a >= 0) & (b >= 0)
+        matrix = full((len(self), len(self)), fill_value, dtype=dtype)
+        matrix[a[known], b[known]] = array(values, dtype=dtype)[known]
+        return matrix
+
+    def table_from_matrix(self, matrix):
+        """Wrap a matrix in a pandas DataFrame indexed by WORDOM serials
+
+        :param matrix: numpy array of shape (N, N) on registry ids
+        :return: pandas DataFrame, not copying the matrix
+        """
+        return DataFrame(matrix, index=self.serials, columns=self.serials, copy=False)
@@ -0,0 +1,248 @@
+import asyncio
+import json
+from numpy import absolute, full, nonzero, sqrt, triu, zeros
+from ..interface.files import load_pyobject
+from ..interface.pymol import (bond_colors_from_array, bond_edges,
+                               color_selections, export_png, hide_residues,
+                               load_structure, new_session,
+                               residue_selections,
+                               select_clusters, show_cluster, unbond_edges,
+                               unset_bond_colors)
+from .matrix import matrix_to_colorarray
+from .registry import ResidueRegistry
+'''
+ Local render server, keeping parsed systems and a PyMOL session alive
+ between drawing commands
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+class System(object):
+    def __init__(self, name, pdb, acg, rmp, frq=None):
+        """A parsed system; ciACG and pathway frequencies as matrices in
+        residue map order
+
+        :param name: name of the system
+        :param pdb: pdb filename
+        :param acg: ciACG pandas dataframe file (.frm)
+        :param rmp: ResidueMap file (.rmp)
+        :param frq: optional pathway frequency dataframe file (.frm)
+        """
+        self.name = name
+        self.pdb = pdb
+        self.residuemap = load_pyobject(rmp)
+        self.registry = ResidueRegistry.from_residuemap(self.residuemap)
+        self.residues = self.registry.labels
+        self.selections = residue_selections(self.residues)
+        self.cigraph = self.registry.matrix_from_table(load_pyobject(acg))
+        self.pathways = None if frq is None else self.registry.matrix_from_table(load_pyobject(frq))
+        # Bond girth as in bond_connections_from_array
+        self.graph = sqrt(absolute(self.cigraph))
+        minimum = self.graph.min()
+        maximum = self.graph.max()
+        if maximum == minimum:
+            self.radii = full(self.graph.shape, 1.0)
+        else:
+            self.radii = 0.1 + 0.9 * ((self.graph - minimum) / (maximum - minimum))
+
+
+def read_server_config(filename):
+    """Read the systems of a server configuration
+
+    The configuration is a JSON file with a list of systems, each an
+    object with "name", "pdb", "acg", "rmp" and optionally "frq".
+
+    :param filename: JSON configuration file
+    :return: list of Systems
+    """
+    with open(filename, 'r') as infile:
+        config = json.load(infile)
+    return [System(s["name"], s["pdb"], s["acg"], s["rmp"], s.get("frq")) for s in config["systems"]]
+
+
+class RenderServer(object):
+    def __init__(self, systems, cutoffs):
+        """Hold parsed systems and draw them in the running PyMOL session,
+        redoing only the drawing work that a command changes
+
+        :param systems: list of Systems
+        :param cutoffs: initial list of ciACG cutoffs
+        """
+        self.systems = {system.name: system for system in systems}
+        self.system = None
+        self.cutoffs = [float(c) for c in cutoffs]
+        self.drawn = None
+        self.shown = set()
+        self.highlight_cutoff = None
+        self.highlight_scale = "linear"
+        self.colors = None
+        self.colored = None
+        self.generation = 0
+        self.stopped = None
+        self.switch(systems[0].name)
+
+    def levels(self, cutoffs):
+        """Residue nodes of every cutoff level, as in draw_ciacg"""
+        levels = []
+        for cutoff in cutoffs:
+            i, j = nonzero(triu(self.system.graph > cutoff))
+            residues = []
+            for a, b in zip(i, j):
+                residues.append(self.system.residues[a])
+                residues.append(self.system.residues[b])
+            levels.append(residues)
+        return levels
+
+    def edges(self, cutoff):
+        """Boolean upper triangle of the edges drawn at a cutoff"""
+        return triu(self.system.graph > cutoff)
+
+    def draw_levels(self, levels):
+        selections = select_clusters(levels)
+        color_selections(selections)
+        residues = set(r for level in levels for r in level)
+        hide_residues(sorted(self.shown - residues))
+        show_cluster([sorted(residues - self.shown)])
+        self.shown = residues
+
+    def switch(self, name):
+        """Make a system current, drawing it from scratch"""
+        system = self.systems[name]
+        new_session()
+        self.system = system
+        self.shown = set()
+        self.colors = None
+        self.colored = None
+        load_structure(system.pdb)
+        self.drawn = zeros(system.graph.shape, dtype=bool)
+        self.set_cutoffs(self.cutoffs)
+        return {"system": name, "edges": int(self.drawn.sum())}
+
+    def set_cutoffs(self, cutoffs):
+        """Bond the edges entering and unbond those leaving the lowest
+        cutoff, then update level selections"""
+        cutoffs = [float(c) for c in cutoffs]
+        drawn = self.edges(min(cutoffs)) if cutoffs else zeros(self.drawn.shape, dtype=bool)
+        removed = list(zip(*nonzero(self.drawn & ~drawn)))
+        added = list(zip(*nonzero(drawn & ~self.drawn)))
+        unbond_edges(removed, self.system.selections)
+        bond_edges(added, [self.system.radii[e] for e in added], self.system.selections)
+        self.drawn = drawn
+        self.cutoffs = cutoffs
+        self.draw_levels(self.levels(cutoffs))
+        if self.colored is not None:
+            self.colored &= drawn
+            self.recolor()
+        return {"added": len(added), "removed": len(removed), "edges": int(drawn.sum())}
+
+    def highlight(self, cutoff=0.0, scale="linear"):
+        """Color drawn edges by pathway frequency"""
+        if self.system.pathways is None:
+            raise ValueError("No pathway frequencies for system '{}'".format(self.system.name))
+        # A new color scale recolors every highlighted edge
+        refresh = scale != self.highlight_scale or self.colors is None
+        if refresh:
+            self.colors = matrix_to_colorarray(self.system.pathways, scale=scale)
+        if self.colored is None:
+            self.colored = zeros(self.drawn.shape, dtype=bool)
+        self.highlight_cutoff = float(cutoff)
+        self.highlight_scale = scale
+        return self.recolor(refresh)
+
+    def recolor(self, refresh=False):
+        """Color the drawn edges passing the highlight cutoff that are not
+        yet colored, and reset those no longer passing
+
+        :param refresh: if True, also recolor the already colored edges
+        """
+        target = self.drawn & (self.system.pathways > self.highlight_cutoff)
+        stale = list(zip(*nonzero(self.colored & ~target)))
+        unset_bond_colors(stale, self.system.selections)
+        # Fresh color names, so earlier bonds keep their colors
+        self.generation += 1
+        colored, colors = bond_colors_from_array(self.colors, self.system.residuemap,
+                                                 colorprefix="path{}_".format(self.generation),
+                                                 mask=target if refresh else target & ~self.colored, verbose=False)
+        self.colored = target
+        return {"colored": len(colored), "reset": len(stale), "colors": len(colors)}
+
+    def export(self, filename, width=0, height=0, dpi=-1, ray=0):
+        export_png(filename, width=width, height=height, dpi=dpi, ray=ray)
+        return {"png": filename}
+
+    def status(self):
+        return {"systems": sorted(self.systems), "system": self.system.name,
+                "cutoffs": self.cutoffs, "edges": int(self.drawn.sum()),
+                "highlight": self.highlight_cutoff}
+
+    def handle(self, request):
+        """Answer a command, a dict with a "command" key and its arguments
+
+        :param request: dict
+        :return: dict with "ok" and the result of the command, or "error"
+        """
+        try:
+            command = request["command"]
+            if command == "cutoffs":
+                result = self.set_cutoffs(request["cutoffs"])
+            elif command == "highlight":
+                result = self.highlight(request.get("cutoff", 0.0), request.get("scale", "linear"))
+            elif command == "system":
+                result = self.switch(request["name"])
+            elif command == "export":
+                result = self.export(request["png"], request.get("width", 0), request.get("height", 0),
+                                     request.get("dpi", -1), request.get("ray", 0))
+            elif command == "status":
+                result = self.status()
+            elif command == "shutdown":
+                self.stopped.set()
+                result = {}
+            else:
+                raise ValueError("Unknown command '{}'".format(command))
+        except Exception as error:
+            return {"ok": False, "error": "{}: {}".format(type(error).__name__, error)}
+        result["ok"] = True
+        return result
+
+    async def connection(self, reader, writer):
+        # One JSON request per line, answered by one JSON line
+        while not self.stopped.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = self.handle(json.loads(line))
+            except ValueError as error:
+                response = {"ok": False, "error": "Malformed request: {}".format(error)}
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+        writer.close()
+
+    async def serve(self, socket=None, port=None):
+        """Accept commands on a Unix socket, or on TCP loopback, until a
+        shutdown command
+
+        :param socket: Unix socket filename
+        :param port: TCP port on 127.0.0.1, if no socket
+        """
+        self.stopped = asyncio.Event()
+        if socket is not None:
+            server = await asyncio.start_unix_server(self.connection, path=socket)
+        else:
+            server = await asyncio.start_server(self.connection, host="127.0.0.1", port=port)
+        async with server:
+            print("Serving {} systems on {}".format(len(self.systems), socket if socket is not None else port))
+            await self.stopped.wait()
+
@@ -0,0 +1,122 @@
+from numpy import (abs as absolute, argpartition, concatenate, float32,
+                   float64, multiply, newaxis, sqrt, take_along_axis,
+                   triu_indices, zeros)
+from numpy.lib.format import open_memmap
+from ..interface.wordom import read_correlations
+'''
+ Stacks of correlation matrices and ciACGs over trajectory windows, as
+ arrays of shape (K, N, N)
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+
+def correlation_stack(filenames, registry, outfile=None):
+    """Read WORDOM cross-correlation files of K windows into one array
+
+    :param filenames: list of K cross-correlation files
+    :param registry: ResidueRegistry of the residues
+    :param outfile: if given, a .npy file to memory map the stack to
+    :return: float32 numpy array or memmap of shape (K, N, N), in
+             registry order
+    """
+    shape = (len(filenames), len(registry), len(registry))
+    if outfile is None:
+        stack = zeros(shape, dtype=float32)
+    else:
+        stack = open_memmap(outfile, mode="w+", dtype=float32, shape=shape)
+    for k, filename in enumerate(filenames):
+        with open(filename, 'r') as infile:
+            stack[k] = registry.matrix_from_table(read_correlations(infile), dtype=float32)
+    return stack
+
+
+def ciacg_stack(strength, stack, out=None):
+    """ciACGs of all windows, in one multiply broadcast over the stack
+
+    :param strength: numpy array of interaction strengths, (N, N)
+    :param stack: numpy array of correlations, (K, N, N)
+    :param out: array to write to; pass stack to multiply in place
+    :return: numpy array of shape (K, N, N)
+    """
+    return multiply(stack, strength.astype(stack.dtype)[newaxis], out=out)
+
+
+def upper_triangles(stack):
+    """Upper triangles of a stack, without the diagonal
+
+    :return: tuple of index arrays (i, j) and numpy array (K, M) of values
+    """
+    i, j = triu_indices(stack.shape[1], 1)
+    return i, j, stack[:, i, j]
+
+
+def stack_statistics(stack, cutoff=0.0):
+    """Summary statistics of every window of a stack
+
+    :param stack: numpy array of shape (K, N, N)
+    :param cutoff: absolute value for an edge to be counted
+    :return: dict of numpy arrays of length K; "edges" above cutoff,
+             "sum" and "max" of absolute values, "mean" value, and
+             "change", the Frobenius norm of the difference from the
+             previous window, 0 for the first
+    """
+    i, j, upper = upper_triangles(stack)
+    magnitude = absolute(upper)
+    difference = (upper[1:] - upper[:-1]).astype(float64)
+    change = sqrt(2.0 * (difference * difference).sum(axis=1))
+    return {"edges": (magnitude > cutoff).sum(axis=1),
+            "sum": magnitude.sum(axis=1, dtype=float64),
+            "mean": upper.mean(axis=1, dtype=float64) if upper.shape[1] > 0 else zeros(upper.shape[0]),
+            "max": magnitude.max(axis=1, initial=0.0),
+            "change": concatenate([zeros(min(1, upper.shape[0])), change])}
+
+
+def stack_top_edges(stack, k):
+    """Edges of largest absolute value in every window, by partial sort
+
+    :param stack: numpy array of shape (K, N, N)
+    :param k: number of edges per window
+    :return: tuple of numpy arrays of shape (K, k); i, j and values, in
+             order of decreasing absolute value
+    """
+    i, j, upper = upper_triangles(stack)
+    k = min(k, upper.shape[1])
+    if k == 0:
+        return i[:0].reshape(upper.shape[0], 0), j[:0].reshape(upper.shape[0], 0), upper[:, :0]
+    score = -absolute(upper)
+    top = argpartition(score, k - 1, axis=1)[:, :k]
+    top = take_along_axis(top, take_along_axis(score, top, axis=1).argsort(axis=1, kind="stable"), axis=1)
+    return i[top], j[top], take_along_axis(upper, top, axis=1)
+
+
+def format_windows(statistics, edges, labels):
+    """Lines of window statistics and top edges
+
+    :param statistics: dict from stack_statistics
+    :param edges: tuple from stack_top_edges
+    :param labels: residue names, indexed by registry id
+    :return: list of str, tab separated, with header lines
+    """
+    names = ["edges", "sum", "mean", "max", "change"]
+    lines = ["\t".join(["window"] + names)]
+    for window in range(len(statistics["edges"])):
+        lines.append("\t".join([str(window)] + ["{:.6g}".format(statistics[name][window]) for name in names]))
+    i, j, values = edges
+    if values.shape[1] > 0:
+        lines.append("\t".join(["window", "residue", "residue", "value"]))
+        for window in range(values.shape[0]):
+            for a, b, value in zip(i[window].tolist(), j[window].tolist(), values[window].tolist()):
+                lines.append("{}\t{}\t{}\t{:.6g}".format(window, labels[a], labels[b], value))
+    return lines
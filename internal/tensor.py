@@ -0,0 +1,138 @@
+from os import makedirs, path
+from numpy import (array, bincount, concatenate, cumsum, int32, int64, load,
+                   save, searchsorted, unique, zeros)
+
+'''
+ Endpoint pair resolved sparse edge count tensors
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Arrays making up a tensor, each stored as <name>.npy in a directory
+TENSOR_ARRAYS = ("pairs", "indptr", "i", "j", "count")
+
+
+def endpoint_edge_tensor(endpoint_edges):
+    """Build a sparse (endpoint_pair_id, i, j, count) tensor
+
+    The tensor is a dict of numpy arrays. Endpoint pairs are sorted,
+    "pairs" holding the (start, end) residue serials of pair id p in
+    row p. Edges are stored in COO form sorted on pair id, and the
+    edges of pair p are found in the slice indptr[p]:indptr[p + 1] of
+    "i", "j" and "count". Edges are stored once, with i <= j.
+
+    :param endpoint_edges: dict mapping (start, end) tuples to Counters
+                           of (i, j) edges, see
+                           interface.wordom.count_endpoint_edges
+    :return: dict of numpy arrays; pairs, indptr, i, j, count
+    """
+    pairs = sorted(endpoint_edges.keys())
+    lengths = [len(endpoint_edges[pair]) for pair in pairs]
+    indptr = zeros(len(pairs) + 1, dtype=int64)
+    cumsum(lengths, out=indptr[1:])
+    size = int(indptr[-1])
+    i = zeros(size, dtype=int32)
+    j = zeros(size, dtype=int32)
+    count = zeros(size, dtype=int32)
+    for p, pair in enumerate(pairs):
+        edges = endpoint_edges[pair]
+        if len(edges) == 0:
+            continue
+        start, end = indptr[p], indptr[p + 1]
+        i[start:end], j[start:end] = zip(*edges.keys())
+        count[start:end] = list(edges.values())
+    return {"pairs": array(pairs, dtype=int32).reshape((len(pairs), 2)),
+            "indptr": indptr, "i": i, "j": j, "count": count}
+
+
+def save_endpoint_edge_tensor(tensor, directory):
+    """Save a tensor as uncompressed .npy files, one per array
+
+    :param tensor: dict of arrays, from endpoint_edge_tensor
+    :param directory: directory to write into, created if not present
+    """
+    makedirs(directory, exist_ok=True)
+    for name in TENSOR_ARRAYS:
+        save(path.join(directory, "{}.npy".format(name)), tensor[name])
+
+
+def load_endpoint_edge_tensor(directory, mmap_mode='r'):
+    """Load a tensor saved by save_endpoint_edge_tensor
+
+    :param directory: directory holding the tensor arrays
+    :param mmap_mode: numpy.load memory mapping mode, None loads the
+                      arrays into memory; default 'r'
+    :return: dict of numpy arrays; pairs, indptr, i, j, count
+    """
+    return {name: load(path.join(directory, "{}.npy".format(name)), mmap_mode=mmap_mode)
+            for name in TENSOR_ARRAYS}
+
+
+def endpoint_pair_ids(tensor, pairs):
+    """Look up the ids of endpoint pairs
+
+    :param tensor: dict of arrays, from endpoint_edge_tensor
+    :param pairs: iterable of (start, end) residue serial tuples
+    :return: numpy array of pair ids, -1 for pairs not in tensor
+    """
+    stored = tensor["pairs"]
+    keys = (stored[:, 0].astype(int64) << 32) | stored[:, 1].astype(int64)
+    query = array(list(pairs), dtype=int64).reshape((-1, 2))
+    query = (query[:, 0] << 32) | query[:, 1]
+    ids = searchsorted(keys, query)
+    ids[ids >= len(keys)] = 0
+    found = (keys[ids] == query) if len(keys) > 0 else zeros(len(query), dtype=bool)
+    ids[~found] = -1
+    return ids
+
+
+def endpoint_edge_counts(tensor, pairs):
+    """Sum the edge counts of one or several endpoint pairs
+
+    :param tensor: dict of arrays, from endpoint_edge_tensor
+    :param pairs: iterable of (start, end) residue serial tuples, pairs
+                  not present in the tensor are ignored
+    :return: tuple of numpy arrays (i, j, count), edges with i <= j
+    """
+    ids = endpoint_pair_ids(tensor, pairs)
+    ids = ids[ids >= 0]
+    indptr = tensor["indptr"]
+    slices = [slice(indptr[p], indptr[p + 1]) for p in ids]
+    if len(slices) == 0:
+        return zeros(0, dtype=int32), zeros(0, dtype=int32), zeros(0, dtype=int64)
+    i = concatenate([tensor["i"][s] for s in slices])
+    j = concatenate([tensor["j"][s] for s in slices])
+    count = concatenate([tensor["count"][s] for s in slices]).astype(int64)
+    if len(slices) == 1:
+        return i, j, count
+    # Merge the edges shared between pairs
+    keys = (i.astype(int64) << 32) | j.astype(int64)
+    keys, inverse = unique(keys, return_inverse=True)
+    summed = bincount(inverse, weights=count, minlength=len(keys)).astype(int64)
+    return (keys >> 32).astype(int32), (keys & 0xffffffff).astype(int32), summed
+
+
+def endpoint_edge_matrix(tensor, pairs, size):
+    """Symmetric dense edge count matrix of one or several endpoint pairs
+
+    :param tensor: dict of arrays, from endpoint_edge_tensor
+    :param pairs: iterable of (start, end) residue serial tuples
+    :param size: matrix size; residue serial s is placed at s - 1
+    :return: numpy array of edge counts
+    """
+    i, j, count = endpoint_edge_counts(tensor, pairs)
+    matrix = zeros((size, size), dtype=int64)
+    matrix[i - 1, j - 1] = count
+    matrix[j - 1, i - 1] = count
+    return matrix
@@ -0,0 +1,124 @@
+from os import path
+from ..interface.files import dump_pyobject
+from ..interface.pymol import new_session, run_scripts, save_session
+from .instrument import span
+from .pipeline import Stage
+from .procedure import (ciacg_from_tables, draw_ciacg, highlight_pathways,
+                        normalize_pathway_counts_wrt_no_frames_and_endpoints,
+                        parse_avg, parse_cor, process_framefiles)
+from .registry import ResidueRegistry
+'''
+ Stages of the ciACG and pathway workflow of a system
+ Copyright (C) 2018  Robert Pilstål
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+'''
+
+# Output options of a system, with their file suffixes
+SYSTEM_OUTPUTS = {"acg": "frm", "rmp": "rmp", "cnt": "frm", "frq": "frm", "prc": "pyo"}
+
+
+def ingest_frames(residuemap, frames, check_every=None, tolerance=1e-3, patience=3, norm="l1"):
+    with span("frames ingest", bytes=sum(path.getsize(f) for f in frames)) as record:
+        counts, files_processed, frames_processed, pathways_processed = process_framefiles(
+            frames, residuemap, check_every=check_every, tolerance=tolerance, patience=patience, norm=norm)
+        record["lines"] = sum(frames_processed.values())
+    print("{} pathways found in {} frames from {} files".format(len(pathways_processed), len(frames_processed), len(files_processed)))
+    return counts, (frames_processed, pathways_processed)
+
+
+def normalize(counts, processed):
+    with span("normalize", edges=counts.size):
+        return normalize_pathway_counts_wrt_no_frames_and_endpoints(counts, *processed)
+
+
+def align(residuemap, cigraph_table, frequencies=None):
+    with span("align"):
+        registry = ResidueRegistry.from_residuemap(residuemap)
+        pathways = None if frequencies is None else registry.matrix_from_table(frequencies)
+        return registry.matrix_from_table(cigraph_table), pathways
+
+
+def save_outputs(files, **values):
+    for name, filename in files.items():
+        dump_pyobject(values[name], filename, suffix=SYSTEM_OUTPUTS[name])
+
+
+def render(cigraph, residuemap, pdb, cutoffs, pathways=None, pml=None, png=None, pse=None):
+    # Nothing left from systems rendered before
+    new_session()
+    draw_ciacg(cigraph, residuemap, pdb, cutoffs)
+    # Run scripts prior to coloring of bonds
+    if pml is not None:
+        run_scripts(pml)
+    if pathways is not None:
+        highlight_pathways(pathways, residuemap)
+    if png is not None or pse is not None:
+        save_session(png, pse)
+
+
+def add_system(pipeline, system, cutoffs, draw=True):
+    """Add the stages of a system to a pipeline; parse avg, parse cor,
+    ciACG, and if frames are given ingest frames and normalize, then
+    align, save and render
+
+    :param pipeline: Pipeline
+    :param system: dict with "name", "avg", "cor" and "pdb"; optionally
+                   "frames", a list of .frames files, with "conv",
+                   "tol", "pat" and "norm" as in allostery_pathway_pymol,
+                   "pml", a list of PyMOL scripts, "png", an image and
+                   "pse", a session to write, and output files "acg",
+                   "rmp", "cnt", "frq" and "prc"
+    :param cutoffs: list of ciACG cutoffs
+    :param draw: if False, skip the render stage
+    """
+    name = system["name"]
+
+    def value(key):
+        return "{}/{}".format(name, key)
+
+    def stage(key, function, inputs=None, outputs=(), **options):
+        return pipeline.add(Stage(
+            value(key), function, {argument: value(v) for argument, v in (inputs or {}).items()},
+            [value(v) for v in outputs], **options))
+
+    stage("parse avg", parse_avg, outputs=["residuemap", "interactions"],
+          parameters={"avg": system["avg"]}, files=[system["avg"]])
+    stage("parse cor", parse_cor, outputs=["correlations"],
+          parameters={"cor": system["cor"]}, files=[system["cor"]])
+    stage("ciacg", ciacg_from_tables, outputs=["cigraph_table"],
+          inputs={"residuemap": "residuemap", "interactions": "interactions", "correlations": "correlations"})
+    values = {"acg": "cigraph_table", "rmp": "residuemap"}
+    align_inputs = {"residuemap": "residuemap", "cigraph_table": "cigraph_table"}
+
+    frames = system.get("frames")
+    if frames:
+        parameters = {"frames": list(frames), "tolerance": float(system.get("tol", 1e-3)),
+                      "patience": int(system.get("pat", 3)), "norm": system.get("norm", "l1"),
+                      "check_every": None if system.get("conv") is None else int(system["conv"])}
+        stage("ingest frames", ingest_frames, inputs={"residuemap": "residuemap"}, outputs=["counts", "processed"],
+              parameters=parameters, files=frames)
+        stage("normalize", normalize, inputs={"counts": "counts", "processed": "processed"}, outputs=["frequencies"])
+        values.update({"cnt": "counts", "frq": "frequencies", "prc": "processed"})
+        align_inputs["frequencies"] = "frequencies"
+
+    files = {key: system[key] for key in values if system.get(key) is not None}
+    if files:
+        stage("save", save_outputs, inputs={key: values[key] for key in files},
+              parameters={"files": files}, cache=False)
+
+    if draw:
+        stage("align", align, inputs=align_inputs, outputs=["cigraph", "pathways"])
+        stage("render", render, inputs={"cigraph": "cigraph", "residuemap": "residuemap", "pathways": "pathways"},
+              parameters={"pdb": system["pdb"], "cutoffs": list(cutoffs), "pml": system.get("pml"), "png": system.get("png"), "pse": system.get("pse")},
+              serial=True, cache=False)